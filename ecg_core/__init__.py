@@ -0,0 +1,16 @@
+"""Shared acquisition and signal-processing core for the v1/v2/v3 ECG apps.
+
+Everything in this package is hardware-agnostic: the GPIO and SPI objects are
+passed in by the apps, so the same code runs on the Pi and off it.
+"""
+
+from ecg_core.acquisition import DrdyAcquisition
+from ecg_core.filters import SosFilterChain, StreamingFIR, design_sos
+from ecg_core.frames import FrameReader, decode_frames
+from ecg_core.hardware import load_backend
+from ecg_core.ring_buffer import RingBuffer
+
+__all__ = [
+    'DrdyAcquisition', 'FrameReader', 'RingBuffer', 'SosFilterChain',
+    'StreamingFIR', 'decode_frames', 'design_sos', 'load_backend'
+]
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+
+
+class DrdyAcquisition:
+    """Paces frame reads on the ADS1292R DRDY falling edge.
+
+    An edge callback (run by the GPIO library's event thread) counts edges and
+    wakes the acquisition thread, which then reads exactly one frame.  If more
+    than one edge arrived since the previous read, the ADC has overwritten
+    conversions we never read: those are counted as overruns.  A wait that
+    times out without any edge is counted as a missed edge.
+
+    Each read also gets the conversion index of the frame (sample_index,
+    counted from 0 at run(), overrun conversions included) and the time its
+    edge was seen (sample_ns), a consistent pair for SampleClock.
+
+    read_frame is typically FrameReader.read_block, so the handler receives
+    decoded blocks rather than single frames.
+    """
+
+    def __init__(self, gpio, drdy_pin, read_frame, sample_rate, timeout=None):
+        self.gpio = gpio
+        self.drdy_pin = drdy_pin
+        self.read_frame = read_frame
+        self.sample_rate = sample_rate
+        # Ten conversion periods without an edge means DRDY has stalled
+        self.timeout = timeout if timeout is not None else max(0.05, 10.0 / sample_rate)
+        self.running = False
+        self.thread_id = None  # native id of the thread inside run(), for per-thread CPU stats
+        self.edge_ns = 0  # time.monotonic_ns() of the latest DRDY edge, where latency is measured from
+        self.sample_index = -1  # conversion index of the frame being read
+        self.sample_ns = 0  # time.monotonic_ns() of that conversion's edge
+
+        self._edge = threading.Event()
+        self._edge_count = 0
+        self._last_edge = (0, 0)  # (edge count, time), assigned together
+        self._first_edge = 0
+        self._consumed = 0
+        self._armed = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.overruns = 0
+        self.missed_edges = 0
+        self._started_at = time.monotonic()
+
+    def _on_edge(self, channel):
+        # Runs in the GPIO event thread: keep it to a timestamp, a counter bump and a wakeup
+        now = time.monotonic_ns()
+        self._edge_count += 1
+        self._last_edge = (self._edge_count, now)
+        self.edge_ns = now
+        self._edge.set()
+
+    def _arm(self):
+        if not self._armed:
+            self.gpio.add_event_detect(self.drdy_pin, self.gpio.FALLING, callback=self._on_edge)
+            self._armed = True
+        self._edge.clear()
+        self._consumed = self._edge_count
+
+    def _disarm(self):
+        if self._armed:
+            self.gpio.remove_event_detect(self.drdy_pin)
+            self._armed = False
+
+    def wait(self):
+        """Block until the next DRDY edge. Returns False on timeout."""
+        if not self._edge.wait(self.timeout):
+            self.missed_edges += 1
+            return False
+        self._edge.clear()
+        edges = self._edge_count
+        # The frame read next is the latest conversion
+        count, self.sample_ns = self._last_edge
+        self.sample_index = count - self._first_edge - 1
+        pending = edges - self._consumed
+        self._consumed = edges
+        if pending > 1:
+            self.overruns += pending - 1
+        return True
+
+    def run(self, handler=None):
+        """Read one frame per conversion and pass it to handler until stopped."""
+        self.running = True
+        self.thread_id = threading.get_native_id()
+        self.reset_stats()
+        self._arm()
+        self._first_edge = self._consumed
+        self.sample_index = -1
+        try:
+            while self.running:
+                if not self.wait():
+                    if self.missed_edges % 100 == 1:
+                        logging.warning(f"DRDY timeout ({self.missed_edges} missed edges)")
+                    continue
+                if not self.running:
+                    break
+                frame = self.read_frame()
+                self.frames += 1
+                # read_frame may return None while a block is still filling
+                if handler is not None and frame is not None:
+                    handler(frame)
+        finally:
+            self._disarm()
+            self.running = False
+            self.thread_id = None
+
+    def stop(self):
+        self.running = False
+        self._edge.set()
+
+    def stats(self):
+        elapsed = time.monotonic() - self._started_at
+        return {
+            'frames': self.frames,
+            'overruns': self.overruns,
+            'missed_edges': self.missed_edges,
+            'measured_sps': self.frames / elapsed if elapsed > 0 else 0.0,
+            'target_sps': self.sample_rate
+        }
@@ -0,0 +1,168 @@
+"""Offline analysis of recordings: filtering, QRS detection and HRV, no hardware needed.
+
+Each recording is cut into segments that are analysed in parallel by a
+process pool.  A segment is filtered and searched for R-peaks starting
+--warmup seconds before its first sample, so the band-pass transient and
+the detector's learning period are over by the time its own samples come;
+it also runs a little past its end, for beats the detector only confirms
+later.  Only the peaks inside the segment proper are kept, and peaks the
+two sides of a seam both found are merged.  HRV is then computed over the
+whole file, and a JSON summary is written next to every recording.
+
+    python -m ecg_core.analysis recordings/ --jobs 8
+    python -m ecg_core.analysis a.ecg b.ecg --segment 600 --notch 50 --peaks
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ecg_core.filters import SosFilterChain, design_sos
+from ecg_core.hrv import HrvEngine
+from ecg_core.qrs import PanTompkinsDetector
+from ecg_core.recording import Recording
+
+DETECTION_TAIL = 2.0  # s analysed past a segment's end; the detector reports beats late
+
+
+def segments(frames, sample_rate, segment_seconds):
+    """[start, end) frame ranges of about segment_seconds covering a recording."""
+    size = max(1, int(segment_seconds * sample_rate))
+    return [(start, min(start + size, frames)) for start in range(0, frames, size)]
+
+
+def analyze_segment(path, start, end, warmup_seconds=10.0, channel=0, bandpass=(0.5, 40.0), notch=None):
+    """R-peaks (frame indices) in frames [start, end) of a recording, and the missing frame count."""
+    recording = Recording(path)
+    rate = recording.sample_rate
+    first = max(0, start - int(warmup_seconds * rate))
+    last = min(len(recording), end + int(DETECTION_TAIL * rate))
+    signal = recording.values(first, last)[:, channel]
+    filtered = SosFilterChain(design_sos(rate, bandpass=bandpass, notch=notch)).process(signal)
+    peaks = np.asarray(PanTompkinsDetector(int(round(rate))).process(filtered), dtype=np.int64) + first
+    return peaks[(peaks >= start) & (peaks < end)], int(recording.missing(start, end).sum())
+
+
+def merge_peaks(parts, sample_rate):
+    """Concatenate per-segment peaks, dropping seam duplicates within the refractory period."""
+    peaks = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+    peaks = np.sort(peaks)
+    if len(peaks) < 2:
+        return peaks
+    refractory = PanTompkinsDetector.REFRACTORY * sample_rate
+    keep = np.concatenate(([True], np.diff(peaks) >= refractory))
+    return peaks[keep]
+
+
+def summarize(recording, peaks, missing, elapsed):
+    rate = recording.sample_rate
+    rr = np.diff(peaks) / rate
+    hrv = HrvEngine(int(round(rate)), window=max(len(peaks), 2))
+    hrv.update(peaks.tolist())
+    instant = 60.0 / rr[(rr >= HrvEngine.MIN_RR) & (rr <= HrvEngine.MAX_RR)] if len(rr) else np.empty(0)
+    return {
+        'path': recording.path,
+        'start_time': datetime.datetime.fromtimestamp(recording.start_time / 1e9).isoformat(),
+        'sample_rate': rate,
+        'frames': len(recording),
+        'duration_s': recording.duration,
+        'missing_frames': missing,
+        'beats': len(peaks),
+        'heart_rate': {
+            'mean': float(60.0 / rr.mean()) if len(rr) else None,
+            'min': float(instant.min()) if len(instant) else None,
+            'max': float(instant.max()) if len(instant) else None
+        },
+        'hrv': hrv.metrics(),
+        'elapsed_s': elapsed
+    }
+
+
+def analyze_files(paths, jobs=None, segment_seconds=300.0, warmup_seconds=10.0, channel=0,
+                  bandpass=(0.5, 40.0), notch=None):
+    """Analyse recordings with a pool of jobs processes (inline with jobs=1).
+
+    Yields (path, summary, peaks) per file, in the order given, as soon as
+    all its segments are done; segments of every file share the pool.
+    """
+    options = {'warmup_seconds': warmup_seconds, 'channel': channel, 'bandpass': bandpass, 'notch': notch}
+    pool = ProcessPoolExecutor(max_workers=jobs) if jobs != 1 else None
+    try:
+        started = time.perf_counter()
+        pending = []
+        for path in paths:
+            recording = Recording(path)
+            tasks = segments(len(recording), recording.sample_rate, segment_seconds)
+            if pool is None:
+                results = [analyze_segment(path, start, end, **options) for start, end in tasks]
+            else:
+                results = [pool.submit(analyze_segment, path, start, end, **options) for start, end in tasks]
+            pending.append((recording, results))
+        for recording, results in pending:
+            if pool is not None:
+                results = [future.result() for future in results]
+            peaks = merge_peaks([peaks for peaks, _ in results], recording.sample_rate)
+            missing = sum(missing for _, missing in results)
+            summary = summarize(recording, peaks, missing, time.perf_counter() - started)
+            summary['segments'] = len(results)
+            yield recording.path, summary, peaks
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def find_recordings(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found.extend(sorted(glob.glob(os.path.join(path, '*.ecg'))))
+        else:
+            found.append(path)
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='recordings, or directories of .ecg recordings')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--segment', type=float, default=300.0, help='seconds of signal per task')
+    parser.add_argument('--warmup', type=float, default=10.0, help='seconds analysed before each segment')
+    parser.add_argument('--channel', type=int, default=1, choices=(1, 2))
+    parser.add_argument('--bandpass', type=float, nargs=2, default=(0.5, 40.0), metavar=('LOW', 'HIGH'))
+    parser.add_argument('--notch', type=float, help='mains frequency to remove, Hz')
+    parser.add_argument('--output-dir', help='write summaries here instead of next to each recording')
+    parser.add_argument('--peaks', action='store_true', help='also save the R-peak frame indices (.peaks.npy)')
+    args = parser.parse_args(argv)
+
+    paths = find_recordings(args.paths)
+    if not paths:
+        parser.error('no recordings found')
+    results = analyze_files(
+        paths, jobs=args.jobs, segment_seconds=args.segment, warmup_seconds=args.warmup,
+        channel=args.channel - 1, bandpass=tuple(args.bandpass), notch=args.notch
+    )
+    for path, summary, peaks in results:
+        base = path
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            base = os.path.join(args.output_dir, os.path.basename(path))
+        with open(base + '.summary.json', 'w') as f:
+            json.dump(summary, f, indent=2)
+            f.write('\n')
+        if args.peaks:
+            np.save(base + '.peaks.npy', peaks)
+        rate = summary['heart_rate']['mean']
+        print(f"{path}: {summary['duration_s']:.0f} s, {summary['beats']} beats, "
+              f"{rate if rate is None else round(rate, 1)} bpm, "
+              f"SDNN {summary['hrv']['sdnn_ms']} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,466 @@
+"""Hot-path benchmarks for the v1/v2/v3/altv3 acquisition and processing code.
+
+Runs every case over the same synthetic (or replayed) signal, fed in blocks
+exactly as the DRDY loop delivers them, against the simulated ADS1292R
+backend.  Results are printed as JSON so runs on different commits can be
+diffed or compared with --compare.
+
+    python -m ecg_core.bench --seconds 10 --output bench.json
+    python -m ecg_core.bench --only v3 --compare bench.json
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from ecg_core.compression import CODEC_NAMES, compress_chunk, decompress_chunk
+from ecg_core.frames import FrameReader, decode_frames, encode_frames
+from ecg_core.hrv import HrvEngine
+from ecg_core.latency import LatencyTracker
+from ecg_core.pipeline import Stage
+from ecg_core.pyramid import MinMaxPyramid
+from ecg_core.qrs import PanTompkinsDetector
+from ecg_core.recording import Recorder
+from ecg_core.ring_buffer import RingBuffer
+from ecg_core.simulator import ReplaySource, SyntheticECG
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPS = {
+    'v1': ('v1 app/js/v1.py', 'ecg_system'),
+    'v2': ('v2 app/v2.py', 'ecg_monitor'),
+    'v3': ('v3 app/v3.py', 'ECGMonitor'),
+    'altv3': ('v3 app/altv3.py', 'ECGSensor'),
+}
+
+CASES = []
+
+
+def case(name):
+    def register(setup):
+        CASES.append((name, setup))
+        return setup
+    return register
+
+
+class BenchContext:
+    def __init__(self, sample_rate, block_size, values):
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+        self.values = values
+        self.status = np.full(len(values), 0xC00000, dtype=np.uint32)
+        self._apps = {}
+
+    def app(self, name):
+        """Import an app module on the simulated backend and return its ECG object."""
+        if name not in self._apps:
+            os.environ['ECG_BACKEND'] = 'sim'
+            path, attr = APPS[name]
+            spec = importlib.util.spec_from_file_location(f'bench_{name}', os.path.join(ROOT, path))
+            module = importlib.util.module_from_spec(spec)
+            cwd = os.getcwd()
+            # Some apps log to a file in the working directory at import time
+            os.chdir(tempfile.mkdtemp(prefix='ecg-bench-'))
+            try:
+                spec.loader.exec_module(module)
+            finally:
+                os.chdir(cwd)
+            if getattr(module, 'socketio', None) is not None:
+                module.socketio.emit = serialize_emit
+            target = getattr(module, attr)
+            self._apps[name] = target() if isinstance(target, type) else target
+        return self._apps[name]
+
+
+def serialize_emit(event, data=None, **kwargs):
+    # Stand-in for SocketIO.emit: pay the JSON encoding cost, send nothing
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    return len(json.dumps(data, default=float))
+
+
+# -- cases --------------------------------------------------------------------
+
+class _ReplaySpi:
+    """Fake SPI device returning pre-encoded frames of the benchmark signal."""
+
+    def __init__(self, ctx):
+        counts = np.round(ctx.values * 6 * 0x7FFFFF / 2.42)
+        self.frames = encode_frames(0xC00000, counts).tolist()
+        self.pos = 0
+
+    def xfer2(self, tx):
+        self.pos += 1
+        return self.frames[self.pos % len(self.frames)]
+
+
+@case('decode.scalar_legacy')
+def _decode_scalar(ctx):
+    spi = _ReplaySpi(ctx)
+
+    def step(status, values):
+        for _ in range(len(values)):
+            # Per-sample path the apps used before FrameReader
+            data = spi.xfer2([0x00] * 9)
+            for i in (3, 6):
+                raw = (data[i] << 16) | (data[i + 1] << 8) | data[i + 2]
+                value = raw - (1 << 24) if (raw & (1 << 23)) else raw
+                (value * 2.42) / (0x7FFFFF * 6)
+    return step
+
+
+@case('decode.frame_reader')
+def _decode_block(ctx):
+    reader = FrameReader(_ReplaySpi(ctx), block_size=ctx.block_size, gain=6, vref=2.42)
+
+    def step(status, values):
+        for _ in range(len(values)):
+            reader.read_block()
+    return step
+
+
+@case('decode.vectorized')
+def _decode_vectorized(ctx):
+    frames = encode_frames(0xC00000, np.round(ctx.values * 6 * 0x7FFFFF / 2.42))
+    pos = [0]
+
+    def step(status, values):
+        start = pos[0] % (len(frames) - len(values))
+        decode_frames(frames[start:start + len(values)])
+        pos[0] += len(values)
+    return step
+
+
+@case('buffer.np_roll_legacy')
+def _buffer_roll(ctx):
+    state = {'buffer': np.zeros(2000)}
+
+    def step(status, values):
+        for v in values[:, 0].tolist():
+            state['buffer'] = np.roll(state['buffer'], -1)
+            state['buffer'][-1] = v
+    return step
+
+
+@case('buffer.ring_extend')
+def _buffer_ring(ctx):
+    ring = RingBuffer(2000)
+
+    def step(status, values):
+        ring.extend(values[:, 0])
+    return step
+
+
+@case('pipeline.put')
+def _pipeline_put(ctx):
+    # Cost left on the DRDY thread once processing is handed off
+    stage = Stage('bench', handler=None, maxsize=64)
+    return lambda status, values: stage.put((status, values))
+
+
+@case('v1.process_and_store_data')
+def _v1_process(ctx):
+    system = ctx.app('v1')
+    return lambda status, values: system._process_and_store_data(values)
+
+
+def _app_step(ctx, target, handlers, scale=1.0, stamped=False):
+    """Run an app's per-block handlers inline, plus its streamer at frame rate.
+
+    stamped blocks also carry the DRDY edge and decode times and the conversion
+    index of their last frame, as the v3 reader adds them.
+    """
+    streamer = target.streamer
+    period = ctx.sample_rate / streamer.frame_rate
+    streamer.reset()
+    pending = [0.0]
+    converted = [0]
+
+    def step(status, values):
+        item = (status, values * scale if scale != 1.0 else values)
+        converted[0] += len(values)
+        if stamped:
+            now = time.monotonic_ns()
+            item += (now, now, converted[0] - 1)
+        for handler in handlers:
+            item = handler(item)
+            if item is None:
+                break
+        pending[0] += len(values)
+        if pending[0] >= period:
+            pending[0] -= period
+            streamer.poll()
+    return step
+
+
+@case('v2.handle_block')
+def _v2_block(ctx):
+    monitor = ctx.app('v2')
+    return _app_step(ctx, monitor, [monitor._handle_block])
+
+
+@case('v3.process_ecg_data')
+def _v3_filter(ctx):
+    monitor = ctx.app('v3')
+    return lambda status, values: monitor._process_ecg_data(values[:, 0])
+
+
+@case('qrs.find_peaks_legacy')
+def _qrs_find_peaks(ctx):
+    from scipy.signal import find_peaks
+    window = ctx.values[:ctx.sample_rate * 10, 0] * 1000.0
+    pending = [0]
+
+    def step(status, values):
+        # Previous v3 heart rate: rescan a 10 s window once per second of signal
+        pending[0] += len(values)
+        if pending[0] >= ctx.sample_rate:
+            pending[0] -= ctx.sample_rate
+            peaks, _ = find_peaks(window, height=0.5, distance=int(ctx.sample_rate * 0.3))
+            if len(peaks) >= 2:
+                60 / np.mean(np.diff(peaks) / ctx.sample_rate)
+    return step
+
+
+@case('qrs.pan_tompkins')
+def _qrs_pan_tompkins(ctx):
+    detector = PanTompkinsDetector(ctx.sample_rate)
+    return lambda status, values: detector.process(values[:, 0])
+
+
+@case('hrv.update')
+def _hrv_update(ctx):
+    detector = PanTompkinsDetector(ctx.sample_rate)
+    engine = HrvEngine(ctx.sample_rate)
+    return lambda status, values: engine.update(detector.process(values[:, 0]))
+
+
+@case('pyramid.update')
+def _pyramid_update(ctx):
+    pyramid = MinMaxPyramid(channels=2, capacity=8192)
+    return lambda status, values: pyramid.update(values)
+
+
+@case('latency.record')
+def _latency_record(ctx):
+    # The v3 stage timestamps: one read per frame, six more per block
+    tracker = LatencyTracker()
+    histograms = [tracker.histogram(stage) for stage in ('read', 'decode', 'queue', 'filter', 'qrs', 'buffer')]
+    read = histograms[0]
+
+    def step(status, values):
+        for _ in range(len(values)):
+            start = time.monotonic_ns()
+            read.record(time.monotonic_ns() - start)
+        for histogram in histograms[1:]:
+            start = time.monotonic_ns()
+            histogram.record(time.monotonic_ns() - start)
+    return step
+
+
+@case('recording.write')
+def _recording_write(ctx):
+    # Acquisition-thread side only; the writer thread drains chunks to a temp file
+    path = os.path.join(tempfile.mkdtemp(prefix='ecg-bench-'), 'bench.ecg')
+    recorder = Recorder(path, ctx.sample_rate, 1e-6, chunk_frames=ctx.sample_rate)
+    recorder.start()
+    return recorder.write
+
+
+def _compression(codec):
+    def setup(ctx):
+        # Whole recorder chunks of int24 counts, as the writer thread compresses them
+        counts = np.round(ctx.values * 6 * 0x7FFFFF / 2.42).astype(np.int32)
+        chunk = 4096
+        totals = {'raw': 0, 'compressed': 0, 'time': 0.0}
+        blobs = []
+        pending = [0]
+
+        def step(status, values):
+            pending[0] += len(values)
+            if pending[0] < chunk:
+                return
+            pending[0] -= chunk
+            start = totals['raw'] // 12 % max(1, len(counts) - chunk)
+            began = time.perf_counter()
+            data = compress_chunk(ctx.status[start:start + chunk], counts[start:start + chunk], codec)
+            totals['time'] += time.perf_counter() - began
+            totals['raw'] += len(counts[start:start + chunk]) * 12  # uncompressed record size
+            totals['compressed'] += len(data)
+            blobs[:] = blobs[-7:] + [data]
+
+        def report():
+            began = time.perf_counter()
+            for data in blobs:
+                decompress_chunk(data)
+            decompress = time.perf_counter() - began
+            raw = len(blobs) * chunk * 12
+            return {
+                'ratio': round(totals['raw'] / totals['compressed'], 3) if totals['compressed'] else None,
+                'compress_mb_s': round(totals['raw'] / totals['time'] / 1e6, 2) if totals['time'] else None,
+                'decompress_mb_s': round(raw / decompress / 1e6, 2) if decompress else None,
+            }
+
+        step.report = report
+        return step
+    return setup
+
+
+for _name in ('zlib', 'bz2', 'lzma'):
+    case(f'compression.{_name}')(_compression(CODEC_NAMES[_name]))
+
+
+@case('v3.handle_block')
+def _v3_block(ctx):
+    # All pipeline stages and the streamer, run inline
+    monitor = ctx.app('v3')
+    return _app_step(ctx, monitor, [stage.handler for stage in monitor.pipeline.stages], scale=1000.0, stamped=True)
+
+
+@case('altv3.process_data')
+def _altv3_filter(ctx):
+    sensor = ctx.app('altv3')
+    return lambda status, values: sensor._process_data(values[:, 0])
+
+
+@case('altv3.handle_block')
+def _altv3_block(ctx):
+    sensor = ctx.app('altv3')
+    sensor._buffer_warned = False
+    return _app_step(ctx, sensor, [stage.handler for stage in sensor.pipeline.stages])
+
+
+# -- harness ------------------------------------------------------------------
+
+def _blocks(ctx):
+    for start in range(0, len(ctx.values) - ctx.block_size + 1, ctx.block_size):
+        end = start + ctx.block_size
+        yield ctx.status[start:end], ctx.values[start:end]
+
+
+def run_case(name, setup, ctx, repeat):
+    try:
+        step = setup(ctx)
+    except Exception as e:
+        return {'name': name, 'skipped': f"{type(e).__name__}: {e}"}
+
+    samples = len(ctx.values) - len(ctx.values) % ctx.block_size
+    best = float('inf')
+    gc.collect()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for status, values in _blocks(ctx):
+            step(status, values)
+        best = min(best, time.perf_counter() - start)
+
+    # Allocation profile on separate passes: tracemalloc distorts timings
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    for status, values in _blocks(ctx):
+        step(status, values)
+    gc.collect()
+    retained = sys.getallocatedblocks() - blocks_before
+
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    for status, values in _blocks(ctx):
+        step(status, values)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    us_per_sample = best / samples * 1e6
+    result = {
+        'name': name,
+        'samples': samples,
+        'us_per_sample': round(us_per_sample, 4),
+        'samples_per_second': round(samples / best, 1),
+        'headroom': round(1e6 / ctx.sample_rate / us_per_sample, 2),
+        'alloc_peak_bytes': peak - base,
+        'alloc_retained_blocks': retained,
+    }
+    # Cases can add their own figures (compression ratio, MB/s, ...)
+    if hasattr(step, 'report'):
+        result.update(step.report())
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r') as f:
+        baseline = {r['name']: r for r in json.load(f)['results'] if 'us_per_sample' in r}
+    lines = []
+    for r in results:
+        old = baseline.get(r['name'])
+        if old and 'us_per_sample' in r:
+            change = (r['us_per_sample'] / old['us_per_sample'] - 1) * 100
+            lines.append(f"{r['name']:32s} {old['us_per_sample']:10.3f} -> {r['us_per_sample']:10.3f} us/sample ({change:+.1f}%)")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=10.0, help='signal duration per pass')
+    parser.add_argument('--sample-rate', type=int, default=500)
+    parser.add_argument('--block', type=int, default=20, help='frames per DRDY block')
+    parser.add_argument('--repeat', type=int, default=3, help='timed passes, best is kept')
+    parser.add_argument('--replay', help='recording to use instead of the synthetic ECG')
+    parser.add_argument('--only', action='append', help='run cases whose name starts with this prefix')
+    parser.add_argument('--output', help='write JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='previous JSON results to compare against (printed to stderr)')
+    args = parser.parse_args(argv)
+
+    source = ReplaySource(args.replay) if args.replay else SyntheticECG()
+    n = int(args.seconds * args.sample_rate)
+    ctx = BenchContext(args.sample_rate, args.block, source.generate(0, n, args.sample_rate))
+
+    results = []
+    for name, setup in CASES:
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        results.append(run_case(name, setup, ctx, args.repeat))
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'sample_rate': args.sample_rate,
+            'block': args.block,
+            'seconds': args.seconds,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        print(compare(results, args.compare), file=sys.stderr)
+    # Simulator and app threads are daemons; don't wait for them
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+
+from ecg_core.pipeline import DROP_OLDEST, Stage
+from ecg_core.streaming import decimate_frame
+
+DROP = 'drop'
+DEGRADE = 'degrade'
+DISCONNECT = 'disconnect'
+LAGGARD_POLICIES = (DROP, DEGRADE, DISCONNECT)
+
+
+class _Message:
+    """One published message, shared by every client queue it goes on.
+
+    Decimated versions of a stream frame are made on first demand and kept,
+    so each is encoded once however many clients are at that level.
+    """
+
+    __slots__ = ('event', 'payload', 'decimate', 'encoded', 'published')
+
+    def __init__(self, event, payload, decimate):
+        self.event = event
+        self.payload = payload
+        self.decimate = decimate
+        self.encoded = {0: payload}
+        self.published = time.monotonic_ns()
+
+
+class _Client:
+
+    def __init__(self, client_id, stage, latency=None):
+        self.id = client_id
+        self.stage = stage
+        self.latency = latency
+        self.level = 0
+        self.level_changed = time.monotonic()
+        self.last_overflow = 0.0
+        self.connected = time.monotonic()
+        self.sent = 0
+        self.bytes = 0
+        self.overflows = 0
+        self.degraded = 0
+
+    def stats(self):
+        stats = self.stage.stats()
+        stats.update({
+            'level': self.level,
+            'decimation': 2 ** self.level,
+            'sent': self.sent,
+            'bytes': self.bytes,
+            'overflows': self.overflows,
+            'degraded': self.degraded,
+            'connected_s': time.monotonic() - self.connected
+        })
+        return stats
+
+
+class BroadcastHub:
+    """Fans published messages out to many clients without waiting on any of them.
+
+    publish() puts one shared message object on every subscriber's bounded
+    queue and returns; each client has its own sender thread (a pipeline
+    Stage) that calls send(event, payload, client_id).  A client on a slow
+    link therefore only backs up its own queue: neither the publisher nor
+    the other clients wait for it.
+
+    When a client's queue overflows, its oldest message is dropped and the
+    laggard policy applies:
+
+    - drop: nothing more; the client sees the gap in the frame indices
+    - degrade: stream frames (publish_frame) are sent to it decimated by 2,
+      then 4, ... up to 2**max_level, at most one step per DEGRADE_HOLD;
+      after RECOVER_AFTER seconds without overflow it steps back up
+    - disconnect: unsubscribe it and call disconnect(client_id)
+
+    The stream thread (publish_frame) and the status/warning publishers
+    call publish() from different threads; publishes are serialized, as
+    each client queue is a single-producer StageQueue.
+
+    stats() reports queue depth, drops, queue wait and send time per
+    client, which is how far each viewer lags behind the acquisition.  With
+    a LatencyTracker, the time from publish() to the end of each send goes
+    to its 'emit' stage.
+    """
+
+    DEGRADE_HOLD = 1.0  # s, lets a queue drain at the new level before the next step
+    RECOVER_AFTER = 5.0  # s without overflow before stepping back to a finer level
+
+    def __init__(self, send, queue_size=50, policy=DEGRADE, max_level=3, disconnect=None, latency=None):
+        if policy not in LAGGARD_POLICIES:
+            raise ValueError(f"Unknown laggard policy {policy!r} (expected one of {LAGGARD_POLICIES})")
+        self.send = send
+        self.queue_size = queue_size
+        self.policy = policy
+        self.max_level = max_level
+        self.disconnect = disconnect
+        self.latency = latency
+        # Replaced, never mutated, so publish() can iterate it without a lock
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()  # separate: an overflow may unsubscribe under it
+        self.published = 0
+        self.encodes = 0
+        self.disconnected = 0
+
+    def __len__(self):
+        return len(self._clients)
+
+    def subscribe(self, client_id):
+        stage = Stage(f'client-{client_id}', None, self.queue_size, DROP_OLDEST)
+        # Each sender thread records into its own histogram
+        client = _Client(client_id, stage, self.latency.histogram('emit') if self.latency is not None else None)
+        stage.handler = lambda message: self._deliver(client, message)
+        with self._lock:
+            previous = self._clients.get(client_id)
+            self._clients = {**self._clients, client_id: client}
+        if previous is not None:
+            previous.stage.stop(timeout=0)
+        stage.start()
+        return client
+
+    def unsubscribe(self, client_id):
+        with self._lock:
+            client = self._clients.get(client_id)
+            if client is None:
+                return False
+            self._clients = {key: value for key, value in self._clients.items() if key != client_id}
+        # Don't wait: the sender may be stuck in a send to this very client
+        client.stage.stop(timeout=0)
+        if client.latency is not None:
+            self.latency.release('emit', client.latency)
+        return True
+
+    def close(self):
+        for client_id in list(self._clients):
+            self.unsubscribe(client_id)
+
+    def publish(self, event, payload, decimate=False):
+        """Queue a message for every client. Never blocks on a client."""
+        message = _Message(event, payload, decimate)
+        # Held only for the drop-policy puts, which never wait on a client
+        with self._publish_lock:
+            self.published += 1
+            for client in self._clients.values():
+                queue = client.stage.queue
+                dropped = queue.dropped
+                client.stage.put(message)
+                if queue.dropped != dropped:
+                    self._overflow(client)
+
+    def publish_frame(self, event, frame):
+        """Publish a binary stream frame that laggards may receive decimated (FrameStreamer emit)."""
+        self.publish(event, frame, decimate=True)
+
+    def _overflow(self, client):
+        now = time.monotonic()
+        client.overflows += 1
+        client.last_overflow = now
+        if self.policy == DISCONNECT:
+            if self.unsubscribe(client.id):
+                self.disconnected += 1
+                logging.warning(f"Client {client.id} disconnected: send queue full")
+                if self.disconnect is not None:
+                    self.disconnect(client.id)
+        elif self.policy == DEGRADE and client.level < self.max_level \
+                and now - client.level_changed >= self.DEGRADE_HOLD:
+            client.level += 1
+            client.level_changed = now
+            client.degraded += 1
+            logging.info(f"Client {client.id} lagging, stream decimated by {2 ** client.level}")
+
+    def _deliver(self, client, message):
+        level = client.level if message.decimate else 0
+        payload = message.encoded.get(level)
+        if payload is None:
+            # Two senders may race here; both produce the same bytes
+            payload = message.encoded[level] = decimate_frame(message.payload, 2 ** level)
+            self.encodes += 1
+        self.send(message.event, payload, client.id)
+        if client.latency is not None:
+            client.latency.record(time.monotonic_ns() - message.published)
+        client.sent += 1
+        if isinstance(payload, (bytes, bytearray)):
+            client.bytes += len(payload)
+
+        if client.level and not len(client.stage.queue):
+            now = time.monotonic()
+            if now - max(client.level_changed, client.last_overflow) >= self.RECOVER_AFTER:
+                client.level -= 1
+                client.level_changed = now
+
+    def stats(self):
+        clients = self._clients
+        return {
+            'policy': self.policy,
+            'queue_size': self.queue_size,
+            'clients': len(clients),
+            'published': self.published,
+            'encodes': self.encodes,
+            'disconnected': self.disconnected,
+            'per_client': {str(client_id): client.stats() for client_id, client in clients.items()}
+        }
@@ -0,0 +1,140 @@
+import time
+
+import numpy as np
+
+from ecg_core.ring_buffer import RingBuffer
+
+
+class SampleClock:
+    """Linear model of the ADC sample clock against time.monotonic_ns().
+
+    observe() takes one (sample index, time) pair per block: typically the
+    conversion index of the block's last frame and the time its DRDY edge
+    was seen (DrdyAcquisition.sample_index and sample_ns).  Once every
+    interval seconds of samples the line time = origin_ns + (index -
+    origin_index) * period_ns is refitted over the pairs of the last window
+    seconds:
+
+    - a least-squares fit, then a second one without the pairs more than
+      OUTLIER robust sigmas (from the median absolute deviation) off the
+      first: an edge seen late (scheduling, garbage collection, a busy GPIO
+      thread) is dropped instead of bending the line
+    - the line is then moved down to the EARLIEST percentile of the
+      residuals: edges are only ever seen late, so the earliest sightings
+      are the closest to the conversions themselves
+    - period_ns is the measured conversion period, so drift_ppm is how far
+      the ADC's oscillator runs from the nominal rate, and jitter_us the
+      spread of the remaining edge times about the line
+
+    At most capacity pairs are kept, which bounds the window at high block
+    rates.  Until the first fit, the nominal period is used from the latest
+    pair.  times() and wall_times() then give the time of every sample of a
+    block in one vectorized step, rather than one clock call per sample;
+    wall_times() converts with the offset between the wall clock and the
+    monotonic clock taken at the last fit, so it follows NTP adjustments.
+    """
+
+    OUTLIER = 4.0
+    EARLIEST = 1.0  # percentile
+    MIN_PAIRS = 8
+
+    def __init__(self, sample_rate, window=60.0, interval=1.0, capacity=4096):
+        self.sample_rate = sample_rate
+        self.nominal_ns = 1e9 / sample_rate
+        self.window = int(window * sample_rate)
+        self.interval = max(1, int(interval * sample_rate))
+        self._pairs = RingBuffer(max(self.MIN_PAIRS, capacity), 2, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self._pairs.clear()
+        self._due = None
+        self.origin_index = 0
+        self.origin_ns = time.monotonic_ns()
+        self.period_ns = self.nominal_ns
+        self.wall_offset_ns = time.time_ns() - time.monotonic_ns()
+        self.jitter_ns = 0.0
+        self.fits = 0
+        self.outliers = 0
+        self.late = 0
+
+    def observe(self, index, t_ns):
+        """Add a (sample index, time.monotonic_ns()) pair. Returns True if the model was refitted."""
+        self._pairs.append((index, t_ns))
+        if self.fits == 0:
+            self.origin_index, self.origin_ns = index, t_ns
+        if self._due is None:
+            self._due = index + self.interval
+        if index < self._due:
+            return False
+        self._due = index + self.interval
+        return self.fit()
+
+    def fit(self):
+        pairs = self._pairs.latest()
+        pairs = pairs[pairs[:, 0] > pairs[-1, 0] - self.window]
+        if len(pairs) < self.MIN_PAIRS:
+            return False
+        index, t_ns = pairs[-1]
+        # Relative to the latest pair, so float64 keeps sub-ns resolution
+        x = (pairs[:, 0] - index).astype(np.float64)
+        y = (pairs[:, 1] - t_ns).astype(np.float64)
+        slope, intercept = _line(x, y)
+        residuals = y - (slope * x + intercept)
+        median = np.median(residuals)
+        sigma = 1.4826 * np.median(np.abs(residuals - median))
+        keep = np.abs(residuals - median) <= self.OUTLIER * max(sigma, 1000.0)  # never below 1 us
+        if keep.sum() >= self.MIN_PAIRS and not keep.all():
+            slope, intercept = _line(x[keep], y[keep])
+            residuals = y - (slope * x + intercept)
+        floor = float(np.percentile(residuals[keep], self.EARLIEST))
+
+        self.period_ns = slope
+        self.origin_index = int(index)
+        self.origin_ns = int(t_ns) + int(round(intercept + floor))
+        self.jitter_ns = float(np.std(residuals[keep]))
+        self.outliers = int(np.count_nonzero(~keep))
+        self.late = int(np.count_nonzero(~keep & (residuals > 0)))
+        self.wall_offset_ns = time.time_ns() - time.monotonic_ns()
+        self.fits += 1
+        return True
+
+    def time_ns(self, index):
+        """Monotonic time (ns) of sample index."""
+        return self.origin_ns + int(round((index - self.origin_index) * self.period_ns))
+
+    def wall_time_ns(self, index):
+        """Wall-clock time (Unix ns) of sample index."""
+        return self.time_ns(index) + self.wall_offset_ns
+
+    def times(self, first, n):
+        """Monotonic times (ns, int64) of the n samples from index first on."""
+        offsets = np.arange(first - self.origin_index, first - self.origin_index + n, dtype=np.float64)
+        return self.origin_ns + np.rint(offsets * self.period_ns).astype(np.int64)
+
+    def wall_times(self, first, n):
+        """Wall-clock times (Unix ns, int64) of the n samples from index first on."""
+        return self.times(first, n) + self.wall_offset_ns
+
+    @property
+    def drift_ppm(self):
+        return 1e6 * (self.nominal_ns / self.period_ns - 1.0)
+
+    def stats(self):
+        return {
+            'measured_sps': 1e9 / self.period_ns,
+            'drift_ppm': self.drift_ppm,
+            'jitter_us': self.jitter_ns / 1e3,
+            'outliers': self.outliers,
+            'late': self.late,
+            'pairs': len(self._pairs),
+            'fits': self.fits
+        }
+
+
+def _line(x, y):
+    """Least-squares slope and intercept of y against x."""
+    x_mean, y_mean = x.mean(), y.mean()
+    dx = x - x_mean
+    slope = float(np.dot(dx, y - y_mean) / np.dot(dx, dx))
+    return slope, float(y_mean - slope * x_mean)
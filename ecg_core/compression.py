@@ -0,0 +1,83 @@
+import bz2
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+# payload bytes, frames, codec, then the predictor order of the status
+# word and of each channel
+CHUNK_HEADER = struct.Struct('<IIB3B')
+
+NONE = 0
+ZLIB = 1
+BZ2 = 2
+LZMA = 3
+CODECS = {
+    ZLIB: (lambda data: zlib.compress(data, 6), zlib.decompress),
+    BZ2: (lambda data: bz2.compress(data, 9), bz2.decompress),
+    LZMA: (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+CODEC_NAMES = {'none': NONE, 'zlib': ZLIB, 'bz2': BZ2, 'lzma': LZMA}
+MAX_ORDER = 3
+
+
+def _difference(x, order):
+    # Fixed polynomial predictor: keeps the first `order` values, then residuals
+    for _ in range(order):
+        x = np.concatenate((x[:1], np.diff(x)))
+    return x
+
+
+def _integrate(r, order):
+    for _ in range(order):
+        r = np.cumsum(r)
+    return r
+
+
+def compress_chunk(status, counts, codec=ZLIB):
+    """Losslessly compress one chunk of status words (n,) and int24 counts (n, 2).
+
+    Each column goes through the fixed polynomial predictor (order 0-3,
+    as in FLAC) that leaves the smallest residuals, chosen per chunk; the
+    residuals are zigzag-mapped to unsigned, so small magnitudes of either
+    sign have mostly-zero high bytes, and byte-shuffled (all low bytes,
+    then all second bytes, ...) before the entropy coder sees them.  An
+    ECG between beats is smooth, so the residuals are a few bits of noise
+    and the shuffled high byte planes are nearly all zero.
+    """
+    columns = np.column_stack((np.asarray(status, dtype=np.int64), np.asarray(counts, dtype=np.int64)))
+    n = len(columns)
+    orders = []
+    zigzag = np.empty((columns.shape[1], n), dtype='<u4')
+    for column, row in zip(columns.T, zigzag):
+        candidates = [_difference(column, order) for order in range(MAX_ORDER + 1)]
+        order = int(np.argmin([np.abs(r[order:]).sum() for order, r in enumerate(candidates)]))
+        residuals = candidates[order]
+        row[:] = (residuals << 1) ^ (residuals >> 63)
+        orders.append(order)
+    shuffled = zigzag.view(np.uint8).reshape(columns.shape[1], n, 4).transpose(2, 0, 1)
+    payload = np.ascontiguousarray(shuffled).tobytes()
+    if codec != NONE:
+        payload = CODECS[codec][0](payload)
+    return CHUNK_HEADER.pack(len(payload), n, codec, *orders) + payload
+
+
+def chunk_size(data, offset=0):
+    """Total bytes (header and payload) of the compressed chunk at offset, and its frame count."""
+    length, frames = CHUNK_HEADER.unpack_from(data, offset)[:2]
+    return CHUNK_HEADER.size + length, frames
+
+
+def decompress_chunk(data, offset=0):
+    """Inverse of compress_chunk: returns (status (n,) uint32, counts (n, 2) int32)."""
+    length, n, codec, *orders = CHUNK_HEADER.unpack_from(data, offset)
+    start = offset + CHUNK_HEADER.size
+    payload = bytes(data[start:start + length])
+    if codec != NONE:
+        payload = CODECS[codec][1](payload)
+    planes = np.frombuffer(payload, dtype=np.uint8).reshape(4, len(orders), n)
+    zigzag = np.ascontiguousarray(planes.transpose(1, 2, 0)).view('<u4')[:, :, 0].astype(np.int64)
+    residuals = (zigzag >> 1) ^ -(zigzag & 1)
+    columns = [_integrate(r, order) for r, order in zip(residuals, orders)]
+    return columns[0].astype(np.uint32), np.column_stack(columns[1:]).astype(np.int32)
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+def design_decimator(factor, taps_per_phase=16, cutoff=0.8, beta=8.0):
+    """Kaiser-windowed sinc low-pass for decimating by factor, with factor * taps_per_phase taps.
+
+    cutoff is the -6 dB point as a fraction of the output Nyquist frequency;
+    beta 8 gives about 80 dB of stop-band attenuation.  Unity gain at DC.
+    """
+    n = factor * taps_per_phase
+    t = np.arange(n) - (n - 1) / 2.0
+    taps = np.sinc(cutoff * t / factor) * np.kaiser(n, beta)
+    return taps / taps.sum()
+
+
+class PolyphaseDecimator:
+    """Streaming FIR decimator: anti-alias low-pass, then every factor-th sample.
+
+    Only the samples that are kept are computed (the polyphase form of
+    filtering then dropping), so the cost is len(taps) multiply-adds per
+    output sample and channel rather than per input sample.  A delay line
+    is carried between blocks, so the output is the same however the
+    stream is cut into blocks.
+
+    Output k is the filtered input at index k * factor, counting from the
+    first sample fed in; positions() tells which samples of the next block
+    those are, e.g. to pick the matching status words.  The filter delays
+    the signal by delay input samples.  With factor 1 blocks pass through
+    unfiltered.
+    """
+
+    def __init__(self, factor, channels=1, taps=None):
+        if factor < 1 or int(factor) != factor:
+            raise ValueError(f"Decimation factor must be a positive integer, not {factor!r}")
+        self.factor = int(factor)
+        self.channels = channels
+        if taps is None:
+            taps = design_decimator(self.factor) if self.factor > 1 else [1.0]
+        # Reversed, so each output is one window of the input times the taps
+        self._reversed = np.asarray(taps, dtype=np.float64)[::-1].copy()
+        self.reset()
+
+    @property
+    def taps(self):
+        return self._reversed[::-1]
+
+    @property
+    def delay(self):
+        """Group delay in input samples (rounded down)."""
+        return (len(self._reversed) - 1) // 2
+
+    def reset(self):
+        self._delay = np.zeros((len(self._reversed) - 1, self.channels))
+        self.total = 0  # input samples fed in
+
+    def positions(self, n):
+        """Offsets within the next block of n samples of the samples that give an output."""
+        return np.arange(-self.total % self.factor, n, self.factor)
+
+    def process(self, block):
+        x = np.asarray(block, dtype=np.float64)
+        flat = x.ndim == 1
+        x = x.reshape(len(x), self.channels)
+        if self.factor == 1:
+            self.total += len(x)
+            return x[:, 0] if flat else x
+        kept = self.positions(len(x))
+        ext = np.concatenate((self._delay, x))
+        # Window j covers ext[j:j + len(taps)], which ends at sample j of the block
+        windows = np.lib.stride_tricks.sliding_window_view(ext, len(self._reversed), axis=0)[kept]
+        y = windows @ self._reversed
+        self._delay = ext[len(ext) - len(self._delay):].copy()
+        self.total += len(x)
+        return y[:, 0] if flat else y
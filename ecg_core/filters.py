@@ -0,0 +1,184 @@
+import hashlib
+import logging
+import os
+import re
+import sys
+
+import numpy as np
+
+
+def load_fir_coefficients(path, scale=32768.0):
+    """Load an integer FIR table (e.g. Q15 taps copied from the Arduino sketch).
+
+    Values may be separated by commas and/or whitespace; '#' and '//'
+    comments and C array braces are ignored, so a table can be pasted as is.
+    """
+    with open(path, 'r') as f:
+        text = f.read()
+    text = re.sub(r'(#|//).*', '', text)
+    body = re.search(r'\{([^}]*)\}', text)
+    if body:
+        text = body.group(1)
+    values = [int(v) for v in re.findall(r'-?\d+', text)]
+    if not values:
+        raise ValueError(f"No FIR coefficients found in {path}")
+    return np.array(values, dtype=np.float64) / scale
+
+
+class StreamingFIR:
+    """FIR filter that keeps a delay line per channel between blocks.
+
+    process() takes an (n, channels) block (or a 1-D block for one channel)
+    and returns the same shape, identical to filtering the whole stream in
+    one go: y[i] = sum(coeffs[k] * x[i - k]).
+    """
+
+    def __init__(self, coeffs, channels=1):
+        self.coeffs = np.asarray(coeffs, dtype=np.float64)
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        self._delay = np.zeros((len(self.coeffs) - 1, self.channels))
+
+    def process(self, block):
+        x = np.asarray(block, dtype=np.float64)
+        flat = x.ndim == 1
+        x = x.reshape(len(x), self.channels)
+        ext = np.concatenate((self._delay, x))
+        y = np.empty_like(x)
+        for ch in range(self.channels):
+            y[:, ch] = np.convolve(ext[:, ch], self.coeffs, mode='valid')
+        self._delay = ext[len(ext) - len(self._delay):].copy()
+        return y[:, 0] if flat else y
+
+
+def design_sos(sample_rate, bandpass=(0.5, 40.0), order=2, notch=None, notch_q=30.0, baseline=None,
+               cache_dir=None):
+    """Second-order sections for the ECG chain: [baseline high-pass] -> band-pass -> [notch].
+
+    baseline is an optional high-pass cutoff in Hz for baseline wander,
+    notch an optional mains frequency in Hz.
+
+    With cache_dir, the sections are saved there (one .npy per set of
+    parameters) the first time and loaded afterwards, so a restart gets its
+    coefficients without importing SciPy.
+    """
+    if cache_dir:
+        key = repr((float(sample_rate), tuple(map(float, bandpass)) if bandpass else None, order,
+                    float(notch) if notch else None, float(notch_q), float(baseline) if baseline else None))
+        path = os.path.join(cache_dir, f"sos-{hashlib.sha1(key.encode()).hexdigest()[:16]}.npy")
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            pass
+        sos = design_sos(sample_rate, bandpass, order, notch, notch_q, baseline)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp = f'{path}.{os.getpid()}.tmp'
+            with open(temp, 'wb') as f:
+                np.save(f, sos)
+            os.replace(temp, path)
+        except OSError as e:
+            logging.warning(f"Could not cache filter coefficients in {cache_dir}: {str(e)}")
+        return sos
+
+    from scipy.signal import butter, iirnotch, tf2sos
+
+    nyq = 0.5 * sample_rate
+    sections = []
+    if baseline:
+        sections.append(butter(order, baseline / nyq, btype='highpass', output='sos'))
+    if bandpass:
+        low, high = bandpass
+        sections.append(butter(order, [low / nyq, high / nyq], btype='band', output='sos'))
+    if notch:
+        b, a = iirnotch(notch / nyq, notch_q)
+        sections.append(tf2sos(b, a))
+    return np.vstack(sections)
+
+
+def sosfilt_python(sos, x, zi):
+    """scipy.signal.sosfilt along axis 0, in plain Python: returns (y, zf).
+
+    Transposed direct form II with SciPy's state layout, zi being
+    (sections, 2, channels), so a chain can move from one to the other
+    between blocks.  On blocks of a few samples it is no slower than the
+    SciPy call; on long signals it is far slower.
+    """
+    y = np.asarray(x, dtype=np.float64).T.tolist()
+    state = np.asarray(zi, dtype=np.float64).tolist()
+    for (b0, b1, b2, _, a1, a2), (z0s, z1s) in zip(np.asarray(sos).tolist(), state):
+        for channel, samples in enumerate(y):
+            z0, z1 = z0s[channel], z1s[channel]
+            for i, value in enumerate(samples):
+                out = b0 * value + z0
+                z0 = b1 * value - a1 * out + z1
+                z1 = b2 * value - a2 * out
+                samples[i] = out
+            z0s[channel], z1s[channel] = z0, z1
+    return np.array(y, dtype=np.float64).reshape(len(y), -1).T, np.array(state, dtype=np.float64)
+
+
+def lfilter_python(b, a, x, zi):
+    """scipy.signal.lfilter of a 1-D block, in plain Python: returns (y, zf).
+
+    Transposed direct form II with SciPy's zi layout (max(len(a), len(b)) - 1
+    values), for the same small-block use as sosfilt_python.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    n = max(len(a), len(np.asarray(b)))
+    b = (np.pad(np.asarray(b, dtype=np.float64), (0, n - len(b))) / a[0]).tolist()
+    a = (np.pad(a, (0, n - len(a))) / a[0]).tolist()
+    z = np.asarray(zi, dtype=np.float64).tolist() + [0.0]
+    y = np.asarray(x, dtype=np.float64).tolist()
+    taps = range(1, n)
+    for i, value in enumerate(y):
+        out = b[0] * value + z[0]
+        for k in taps:
+            z[k - 1] = b[k] * value - a[k] * out + z[k]
+        y[i] = out
+    return np.array(y, dtype=np.float64), np.array(z[:-1], dtype=np.float64)
+
+
+def imported_scipy(name):
+    """scipy.signal.<name> if something has already imported scipy.signal, else None (never imports it)."""
+    return getattr(sys.modules.get('scipy.signal'), name, None)
+
+
+class SosFilterChain:
+    """Cascade of second-order sections run over blocks, all channels at once.
+
+    State is kept per section and per channel, so filtering a stream block
+    by block gives the same result as filtering it sample by sample.
+
+    A lazy chain does not import SciPy: it filters with sosfilt_python until
+    scipy.signal has been imported elsewhere (by a background preload, say)
+    and switches to SciPy's sosfilt from the next block on.
+    """
+
+    def __init__(self, sos, channels=1, lazy=False):
+        if lazy:
+            self._sosfilt = imported_scipy('sosfilt')
+        else:
+            from scipy.signal import sosfilt
+
+            self._sosfilt = sosfilt
+        self.sos = np.atleast_2d(np.asarray(sos, dtype=np.float64))
+        self.channels = channels
+        self.reset()
+
+    def reset(self):
+        self._zi = np.zeros((len(self.sos), 2, self.channels))
+
+    def process(self, block):
+        x = np.asarray(block, dtype=np.float64)
+        flat = x.ndim == 1
+        x = x.reshape(len(x), self.channels)
+        if self._sosfilt is None:
+            self._sosfilt = imported_scipy('sosfilt')
+        if self._sosfilt is None:
+            y, self._zi = sosfilt_python(self.sos, x, self._zi)
+        else:
+            y, self._zi = self._sosfilt(self.sos, x, axis=0, zi=self._zi)
+        return y[:, 0] if flat else y
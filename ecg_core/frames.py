@@ -0,0 +1,123 @@
+from itertools import chain
+
+import numpy as np
+
+FRAME_BYTES = 9  # 24-bit status word + 2 x 24-bit channels
+RDATA = 0x12
+FULL_SCALE = 0x7FFFFF
+SMALL_BLOCK = 20  # frames; below this decoding in Python beats NumPy's fixed cost per call
+
+
+def decode_frames(raw):
+    """Decode an (n, 9) uint8 block into status words and signed channel counts.
+
+    Returns (status, counts): status is (n,) uint32, counts is (n, 2) int32.
+    """
+    words = raw.reshape(-1, 3, 3).astype(np.int32)
+    words = (words[:, :, 0] << 16) | (words[:, :, 1] << 8) | words[:, :, 2]
+    status = words[:, 0].astype(np.uint32)
+    # int24 sign extension
+    counts = (words[:, 1:] ^ 0x800000) - 0x800000
+    return status, counts
+
+
+def encode_frames(status, counts):
+    """Inverse of decode_frames: pack status words and (n, 2) counts into (n, 9) bytes."""
+    counts = np.asarray(counts, dtype=np.int64)
+    words = np.empty((len(counts), 3), dtype=np.int64)
+    words[:, 0] = status
+    words[:, 1:] = counts & 0xFFFFFF
+    frames = np.empty((len(counts), 3, 3), dtype=np.uint8)
+    frames[:, :, 0] = (words >> 16) & 0xFF
+    frames[:, :, 1] = (words >> 8) & 0xFF
+    frames[:, :, 2] = words & 0xFF
+    return frames.reshape(-1, FRAME_BYTES)
+
+
+def lsb_size(gain, vref, scale=1.0):
+    """Volts (times scale) per ADC count, per channel."""
+    gain = np.broadcast_to(np.asarray(gain, dtype=np.float64), (2,))
+    return scale * vref / (gain * FULL_SCALE)
+
+
+class FrameReader:
+    """Reads ADS1292R data frames and decodes them a block at a time.
+
+    The same transfer list is handed to spi.xfer2 on every read, and the
+    received bytes are only appended to a list, so the work per frame is
+    little more than the transfer itself.  Once block_size frames are
+    collected, read_block() returns the decoded (status, values) pair for
+    the whole block.
+
+    Blocks of SMALL_BLOCK frames or more are copied into a preallocated
+    array that pads every 24-bit word to 32 bits, low byte zero: read as
+    big-endian int32 the channels come out sign-extended and times 256, so
+    one multiply scales the whole block.  Smaller blocks are decoded with
+    integer shifts on the received lists and converted to arrays once, as
+    NumPy's fixed cost per call would dominate there.
+
+    In RDATAC mode (the ADS1292R default) a frame is clocked out directly;
+    with rdata=True each read is prefixed by the RDATA opcode instead.
+    """
+
+    def __init__(self, spi, block_size=10, gain=6, vref=2.42, scale=1.0, rdata=False):
+        self.spi = spi
+        self.block_size = block_size
+        self.vref = vref
+        self.scale = scale
+        self._tx = [RDATA] + [0x00] * FRAME_BYTES if rdata else [0x00] * FRAME_BYTES
+        self._skip = 1 if rdata else 0
+        self._rows = []
+        self._padded = np.zeros((block_size, 3, 4), dtype=np.uint8)
+        # Padded words as int32 (channels, sample times 256) and uint32 (status, times 256)
+        self._words = self._padded.view('>i4')[:, 1:, 0]
+        self._status = self._padded.view('>u4')[:, 0, 0]
+        self.set_gain(gain)
+
+    @property
+    def pending(self):
+        return len(self._rows)
+
+    def set_gain(self, gain):
+        self.lsb = lsb_size(gain, self.vref, self.scale)
+        self._lsb = self.lsb.tolist()
+        self._padded_lsb = self.lsb / 256
+
+    def read(self):
+        """Clock one frame into the block. Returns True once the block is full."""
+        rx = self.spi.xfer2(self._tx)
+        self._rows.append(rx[self._skip:] if self._skip else rx)
+        return len(self._rows) >= self.block_size
+
+    def drain(self):
+        """Decode the frames collected so far and start a new block."""
+        rows = self._rows
+        n = len(rows)
+        if n < SMALL_BLOCK:
+            block = self._decode_small(rows)
+        else:
+            data = np.frombuffer(bytes(chain.from_iterable(rows)), dtype=np.uint8)
+            self._padded[:n, :, :3] = data.reshape(n, 3, 3)
+            block = self._status[:n] >> 8, self._words[:n] * self._padded_lsb
+        rows.clear()
+        return block
+
+    def _decode_small(self, rows):
+        lsb1, lsb2 = self._lsb
+        status = [r[0] << 16 | r[1] << 8 | r[2] for r in rows]
+        values = []
+        for r in rows:
+            # int24 sign extension; a flat list converts faster than one of pairs
+            values.append((((r[3] << 16 | r[4] << 8 | r[5]) ^ 0x800000) - 0x800000) * lsb1)
+            values.append((((r[6] << 16 | r[7] << 8 | r[8]) ^ 0x800000) - 0x800000) * lsb2)
+        return np.array(status, dtype=np.uint32), np.array(values, dtype=np.float64).reshape(len(rows), 2)
+
+    def read_block(self):
+        """Read one frame; return the decoded block when it is complete, else None."""
+        # read() inlined: this runs once per conversion
+        rx = self.spi.xfer2(self._tx)
+        rows = self._rows
+        rows.append(rx[self._skip:] if self._skip else rx)
+        if len(rows) >= self.block_size:
+            return self.drain()
+        return None
@@ -0,0 +1,21 @@
+import os
+
+BACKENDS = ('rpi', 'sim')
+
+
+def load_backend(name=None):
+    """Return the (spidev, GPIO) pair for the selected hardware backend.
+
+    'rpi' (the default) imports the real spidev and RPi.GPIO modules;
+    'sim' returns the simulated ADS1292R from ecg_core.simulator.  The
+    backend can be selected with the ECG_BACKEND environment variable.
+    """
+    name = name or os.environ.get('ECG_BACKEND', 'rpi')
+    if name == 'rpi':
+        import spidev
+        import RPi.GPIO as GPIO
+        return spidev, GPIO
+    if name == 'sim':
+        from ecg_core.simulator import backend
+        return backend()
+    raise ValueError(f"Unknown hardware backend '{name}' (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,166 @@
+from collections import deque
+
+import numpy as np
+
+
+class HrvEngine:
+    """Heart rate variability over a sliding window of R-R intervals.
+
+    R-peak sample indices (as reported by PanTompkinsDetector) go in through
+    update().  The time-domain metrics are kept as running sums that are
+    adjusted as intervals enter and leave the window, so each beat costs
+    O(1) whatever the window length: mean R-R and SDNN from the sum and sum
+    of squares, RMSSD and pNN50 from the successive differences.  The sums
+    are rebuilt from the window once per window length of beats so rounding
+    cannot accumulate over a long session.
+
+    LF and HF power come from a Lomb-Scargle periodogram of the window,
+    recomputed every SPECTRUM_INTERVAL seconds of signal.  Lomb-Scargle
+    works directly on the unevenly spaced beat times, so the R-R series
+    does not have to be resampled first.
+
+    Intervals outside MIN_RR..MAX_RR or more than RR_TOLERANCE away from the
+    window mean (missed or extra beats, ectopics) are left out and break
+    the successive-difference chain.  After MAX_REJECTED rejections in a
+    row the rhythm itself has changed, and the window starts over.
+    """
+
+    MIN_RR = 0.3  # s, 200 bpm
+    MAX_RR = 2.0  # s, 30 bpm
+    RR_TOLERANCE = 0.3
+    MAX_REJECTED = 5
+    NN50 = 50.0  # ms
+    LF_BAND = (0.04, 0.15)  # Hz
+    HF_BAND = (0.15, 0.40)  # Hz
+    SPECTRUM_INTERVAL = 10.0  # s
+    SPECTRUM_MIN_SPAN = 60.0  # s, at least two periods of the slowest LF component
+
+    def __init__(self, sample_rate, window=300):
+        self.sample_rate = sample_rate
+        self.window = window
+        self._freqs = np.arange(self.LF_BAND[0], self.HF_BAND[1] + 1e-9, 0.0025)
+        self._omega = 2 * np.pi * self._freqs
+        self._lf = (self._freqs >= self.LF_BAND[0]) & (self._freqs < self.LF_BAND[1])
+        self._hf = (self._freqs >= self.HF_BAND[0]) & (self._freqs <= self.HF_BAND[1])
+        self.reset()
+
+    def reset(self):
+        self.last_peak = None
+        self.beats = 0
+        self.rejected = 0
+        self._clear_window()
+
+    def _clear_window(self):
+        self._rr = deque()  # ms
+        self._times = deque()  # sample index of the beat ending each interval
+        self._diffs = deque()  # successive differences, ms
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._diff_sumsq = 0.0
+        self._nn50 = 0
+        self._previous = None
+        self._rejected_run = 0
+        self._updates = 0
+        self._spectrum_at = None
+        self.lf = None
+        self.hf = None
+
+    def update(self, peaks):
+        """Add R-peak sample indices (ascending). Returns the number of intervals kept."""
+        added = 0
+        for peak in peaks:
+            if self.last_peak is not None:
+                added += self._add(peak, 1000.0 * (peak - self.last_peak) / self.sample_rate)
+            self.last_peak = peak
+            self.beats += 1
+        if added and self._spectrum_due():
+            self._update_spectrum()
+        return added
+
+    def _add(self, peak, rr):
+        count = len(self._rr)
+        if not 1000.0 * self.MIN_RR <= rr <= 1000.0 * self.MAX_RR or (
+                count >= 8 and abs(rr - self._sum / count) > self.RR_TOLERANCE * self._sum / count):
+            self.rejected += 1
+            self._rejected_run += 1
+            self._previous = None
+            if self._rejected_run >= self.MAX_REJECTED:
+                self._clear_window()
+            return 0
+        self._rejected_run = 0
+
+        if count == self.window:
+            old = self._rr.popleft()
+            self._times.popleft()
+            self._sum -= old
+            self._sumsq -= old * old
+        self._rr.append(rr)
+        self._times.append(peak)
+        self._sum += rr
+        self._sumsq += rr * rr
+
+        if self._previous is not None:
+            if len(self._diffs) == self.window - 1:
+                old = self._diffs.popleft()
+                self._diff_sumsq -= old * old
+                self._nn50 -= abs(old) > self.NN50
+            diff = rr - self._previous
+            self._diffs.append(diff)
+            self._diff_sumsq += diff * diff
+            self._nn50 += abs(diff) > self.NN50
+        self._previous = rr
+
+        self._updates += 1
+        if self._updates >= self.window:
+            self._resync()
+        return 1
+
+    def _resync(self):
+        rr = np.array(self._rr)
+        diffs = np.array(self._diffs)
+        self._sum = rr.sum()
+        self._sumsq = np.dot(rr, rr)
+        self._diff_sumsq = np.dot(diffs, diffs)
+        self._nn50 = int(np.count_nonzero(np.abs(diffs) > self.NN50))
+        self._updates = 0
+
+    def _spectrum_due(self):
+        return self._spectrum_at is None or \
+            self._times[-1] - self._spectrum_at >= self.SPECTRUM_INTERVAL * self.sample_rate
+
+    def _update_spectrum(self):
+        t = np.array(self._times, dtype=np.float64) / self.sample_rate
+        span = t[-1] - t[0]
+        if span < self.SPECTRUM_MIN_SPAN:
+            return
+        self._spectrum_at = self._times[-1]
+        rr = np.array(self._rr)
+        # Imported on the first spectrum (a minute of beats in), not on start-up
+        from scipy.signal import lombscargle
+        power = lombscargle(t, rr - rr.mean(), self._omega)
+        # Scale to a one-sided density in ms^2/Hz, so band powers sum to the variance
+        psd = power * 2.0 * span / len(rr)
+        step = self._freqs[1] - self._freqs[0]
+        self.lf = float(psd[self._lf].sum() * step)
+        self.hf = float(psd[self._hf].sum() * step)
+
+    def metrics(self):
+        """Current HRV metrics (ms, %, ms^2); None where there is not enough data yet."""
+        count = len(self._rr)
+        mean = float(self._sum / count) if count else None
+        sdnn = None
+        if count >= 2:
+            sdnn = float(np.sqrt(max(0.0, (self._sumsq - count * mean * mean) / (count - 1))))
+        diffs = len(self._diffs)
+        return {
+            'beats': self.beats,
+            'intervals': count,
+            'rejected': self.rejected,
+            'mean_rr_ms': mean,
+            'sdnn_ms': sdnn,
+            'rmssd_ms': float(np.sqrt(self._diff_sumsq / diffs)) if diffs else None,
+            'pnn50': 100.0 * self._nn50 / diffs if diffs else None,
+            'lf_ms2': self.lf,
+            'hf_ms2': self.hf,
+            'lf_hf': self.lf / self.hf if self.lf is not None and self.hf else None
+        }
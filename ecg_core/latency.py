@@ -0,0 +1,168 @@
+import threading
+
+SIGNIFICANT_BITS = 7  # 64 sub-buckets per power of two: values within 1/64 (1.6%)
+MAX_VALUE_BITS = 40  # ~18 minutes in ns; anything longer lands in the last bucket
+QUANTILES = (0.5, 0.99, 0.999)
+
+
+def _bucket(value):
+    if value < 0:
+        value = 0
+    bits = value.bit_length()
+    if bits <= SIGNIFICANT_BITS:
+        return value
+    shift = bits - SIGNIFICANT_BITS
+    return (shift << (SIGNIFICANT_BITS - 1)) + (value >> shift)
+
+
+BUCKETS = _bucket((1 << MAX_VALUE_BITS) - 1) + 1
+
+
+def bucket_high(index):
+    """Largest value that falls in bucket index."""
+    half = 1 << (SIGNIFICANT_BITS - 1)
+    if index < 2 * half:
+        return index
+    shift = index // half - 1
+    top = index - shift * half
+    return ((top + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Counts of nanosecond durations in log-linear buckets (the HDR histogram layout).
+
+    Values below 2**SIGNIFICANT_BITS get a bucket each; above that every
+    power of two is split into 2**(SIGNIFICANT_BITS - 1) buckets, so any
+    quantile is within 1.6% of the recorded value from 100 ns to minutes,
+    in a fixed 2.3k-entry table.  record() is a bit_length, a shift and an
+    increment: cheap enough to leave on for every block.
+
+    A histogram has a single writer thread and takes no lock; readers work
+    on copies (see LatencyTracker), which at worst miss the record in flight.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * BUCKETS
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns):
+        index = _bucket(ns)
+        if index >= BUCKETS:
+            index = BUCKETS - 1
+        self.counts[index] += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def merge(self, other):
+        counts = other.counts[:]
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile q (ns), capped at the maximum; 0 if empty."""
+        count = self.count
+        if not count:
+            return 0
+        target = max(1, int(q * count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return self.max if index == BUCKETS - 1 else min(bucket_high(index), self.max)
+        return self.max
+
+
+class LatencyTracker:
+    """Per-stage latency histograms of the acquisition-to-client path.
+
+    Each thread that times a stage asks histogram(stage) once for a
+    histogram of its own and records into it; stats() and prometheus()
+    merge the histograms of each stage, so several threads (one per
+    client sender, say) can report the same stage without sharing counters.
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage):
+        histogram = LatencyHistogram()
+        with self._lock:
+            self._stages.setdefault(stage, []).append(histogram)
+        return histogram
+
+    def release(self, stage, histogram):
+        """Stop tracking a writer's histogram; its counts stay in the stage totals."""
+        with self._lock:
+            histograms = self._stages.get(stage, [])
+            if histogram in histograms:
+                histograms.remove(histogram)
+                self._retired.setdefault(stage, LatencyHistogram()).merge(histogram)
+
+    def merged(self, stage):
+        with self._lock:
+            histograms = list(self._stages.get(stage, ()))
+            retired = self._retired.get(stage)
+        merged = LatencyHistogram()
+        for histogram in histograms + ([retired] if retired is not None else []):
+            merged.merge(histogram)
+        return merged
+
+    def stages(self):
+        with self._lock:
+            return list(self._stages)
+
+    def reset(self):
+        with self._lock:
+            self._retired.clear()
+            for histograms in self._stages.values():
+                for histogram in histograms:
+                    histogram.reset()
+
+    def stats(self):
+        """{stage: count, mean and quantiles in ms}."""
+        stats = {}
+        for stage in self.stages():
+            histogram = self.merged(stage)
+            count = histogram.count
+            stats[stage] = {
+                'count': count,
+                'mean_ms': histogram.total / count / 1e6 if count else 0.0,
+                'p50_ms': histogram.quantile(0.5) / 1e6,
+                'p99_ms': histogram.quantile(0.99) / 1e6,
+                'p999_ms': histogram.quantile(0.999) / 1e6,
+                'max_ms': histogram.max / 1e6
+            }
+        return stats
+
+    def prometheus(self, name='ecg_stage_latency_seconds'):
+        """The stage histograms as one Prometheus summary, in the text exposition format."""
+        samples = []
+        for stage in self.stages():
+            histogram = self.merged(stage)
+            for q in QUANTILES:
+                samples.append(({'stage': stage, 'quantile': q}, histogram.quantile(q) / 1e9))
+            samples.append(({'stage': stage}, histogram.total / 1e9, '_sum'))
+            samples.append(({'stage': stage}, histogram.count, '_count'))
+        return prometheus_metric(name, 'summary', 'Time spent in each stage from DRDY edge to client', samples)
+
+
+def prometheus_metric(name, kind, help_text, samples):
+    """Text exposition of one metric: samples are (labels, value) or (labels, value, suffix)."""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    for labels, value, *suffix in samples:
+        label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+        lines.append(f"{name}{suffix[0] if suffix else ''}{'{' + label_text + '}' if label_text else ''} {value}")
+    return '\n'.join(lines) + '\n'
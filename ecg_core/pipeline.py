@@ -0,0 +1,243 @@
+import logging
+import threading
+import time
+from collections import deque
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class StageQueue:
+    """Bounded single-producer/single-consumer queue between pipeline stages.
+
+    put() never takes a lock with the drop policies: items go into a deque
+    (append/popleft are atomic) and the consumer is only woken through the
+    event when it is actually waiting.  When the queue is full the overflow
+    policy decides what happens:
+
+    - drop_oldest: discard the oldest queued item (freshest data wins)
+    - drop_newest: discard the item being put
+    - block: wait for the consumer to make room (never use from the DRDY thread)
+
+    Every item is stamped on put, so the consumer side can report how long
+    items waited in the queue.  The counters are updated without a lock,
+    so several producers must serialize their puts (BroadcastHub does).
+    """
+
+    def __init__(self, maxsize, policy=DROP_OLDEST):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r} (expected one of {POLICIES})")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.closed = False
+        self._items = deque()
+        self._ready = threading.Event()
+        self._waiting = False
+        self._space = threading.Condition()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.puts = 0
+        self.gets = 0
+        self.dropped = 0
+        self.high_water = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.last_wait = 0.0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """Queue item. Returns False if the item itself was dropped."""
+        if len(self._items) >= self.maxsize:
+            if self.policy == DROP_NEWEST:
+                self.dropped += 1
+                return False
+            if self.policy == DROP_OLDEST:
+                try:
+                    self._items.popleft()
+                    self.dropped += 1
+                except IndexError:
+                    pass  # the consumer got there first
+            else:
+                with self._space:
+                    while len(self._items) >= self.maxsize and not self.closed:
+                        self._space.wait(0.1)
+        if self.closed:
+            return False
+        self._items.append((time.monotonic(), item))
+        self.puts += 1
+        depth = len(self._items)
+        if depth > self.high_water:
+            self.high_water = depth
+        if self._waiting:
+            self._ready.set()
+        return True
+
+    def get(self, timeout=None):
+        """Oldest queued item, or None on timeout or once closed and empty."""
+        while True:
+            try:
+                stamp, item = self._items.popleft()
+                break
+            except IndexError:
+                if self.closed:
+                    return None
+            self._ready.clear()
+            self._waiting = True
+            try:
+                # Re-check after announcing we wait: put() may have raced us
+                if not self._items and not self._ready.wait(timeout):
+                    return None
+            finally:
+                self._waiting = False
+
+        waited = time.monotonic() - stamp
+        self.last_wait = waited
+        self.gets += 1
+        self.wait_total += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+        if self.policy == BLOCK:
+            with self._space:
+                self._space.notify()
+        return item
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+        with self._space:
+            self._space.notify_all()
+
+    def open(self):
+        self.closed = False
+        self._items.clear()
+        self._ready.clear()
+
+    def stats(self):
+        return {
+            'depth': len(self._items),
+            'maxsize': self.maxsize,
+            'policy': self.policy,
+            'high_water': self.high_water,
+            'puts': self.puts,
+            'dropped': self.dropped,
+            'wait_ms_mean': 1000.0 * self.wait_total / self.gets if self.gets else 0.0,
+            'wait_ms_max': 1000.0 * self.wait_max
+        }
+
+
+class Stage:
+    """One pipeline stage: a thread draining its input queue into handler.
+
+    Whatever handler returns (unless None) is put on the next stage's queue.
+    Exceptions are logged and counted; the stage keeps running.  on_error,
+    if given, is called with the item and the exception, and what it
+    returns (unless None) goes downstream too, e.g. an error message for a
+    broadcast stage.
+    """
+
+    def __init__(self, name, handler, maxsize=64, policy=DROP_OLDEST, on_error=None):
+        self.name = name
+        self.handler = handler
+        self.on_error = on_error
+        self.queue = StageQueue(maxsize, policy)
+        self.downstream = None
+        self._thread = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.processed = 0
+        self.errors = 0
+        self.busy_total = 0.0
+        self.busy_max = 0.0
+        self.lag = 0.0
+        self.queue.reset_stats()
+
+    def put(self, item):
+        return self.queue.put(item)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.queue.open()
+        self.reset_stats()
+        self._thread = threading.Thread(target=self._run, name=f'ecg-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self.queue.close()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            item = self.queue.get(timeout=0.5)
+            if item is None:
+                if self.queue.closed:
+                    return
+                continue
+            started = time.monotonic()
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"Pipeline stage {self.name} failed: {str(e)}", exc_info=True)
+                result = self.on_error(item, e) if self.on_error is not None else None
+                if result is not None and self.downstream is not None:
+                    self.downstream.put(result)
+                continue
+            finally:
+                busy = time.monotonic() - started
+                self.busy_total += busy
+                if busy > self.busy_max:
+                    self.busy_max = busy
+            self.processed += 1
+            # Time from the item entering this stage's queue to leaving the stage
+            self.lag = self.queue.last_wait + busy
+            if result is not None and self.downstream is not None:
+                self.downstream.put(result)
+
+    def stats(self):
+        stats = self.queue.stats()
+        stats.update({
+            'processed': self.processed,
+            'errors': self.errors,
+            'busy_ms_mean': 1000.0 * self.busy_total / self.processed if self.processed else 0.0,
+            'busy_ms_max': 1000.0 * self.busy_max,
+            'lag_ms': 1000.0 * self.lag
+        })
+        return stats
+
+
+class Pipeline:
+    """A chain of stages fed by the acquisition thread through put().
+
+    The DRDY loop only decodes a block and hands it to the first stage, so
+    a slow filter or a slow SocketIO emit can no longer delay the next SPI
+    read: it fills (and eventually overflows) a queue instead.
+    """
+
+    def __init__(self, *stages):
+        self.stages = list(stages)
+        for upstream, downstream in zip(self.stages, self.stages[1:]):
+            upstream.downstream = downstream
+
+    def put(self, item):
+        return self.stages[0].put(item)
+
+    def start(self):
+        # Start consumers first so nothing is queued to a stage not yet running
+        for stage in reversed(self.stages):
+            stage.start()
+
+    def stop(self, timeout=1.0):
+        for stage in self.stages:
+            stage.stop(timeout)
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
@@ -0,0 +1,116 @@
+import math
+
+import numpy as np
+
+from ecg_core.ring_buffer import RingBuffer
+
+
+def choose_level(samples, width, factor, levels):
+    """Coarsest level (0 = raw samples) that still gives at least width buckets over samples."""
+    if samples <= width or levels == 0:
+        return 0
+    return min(int(math.log(samples / width, factor) + 1e-9), levels)
+
+
+def envelope(mins, maxs, width):
+    """Merge consecutive (n, channels) min/max buckets down to at most width.
+
+    Returns (group, mins, maxs): group is how many input buckets were merged
+    into each output bucket.  A partial last group is kept.
+    """
+    n = len(mins)
+    if n <= width:
+        return 1, mins, maxs
+    group = math.ceil(n / width)
+    starts = np.arange(0, n, group)
+    return group, np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts)
+
+
+class MinMaxPyramid:
+    """Incremental min/max envelopes of a signal at several decimation levels.
+
+    Level k holds, for every run of factor**k consecutive samples, the
+    minimum and the maximum of each channel: drawing those as a band keeps
+    every QRS spike visible however far the chart is zoomed out, which
+    averaging or plain decimation would not.  update() takes new samples as
+    they arrive and folds them in level by level, carrying incomplete
+    buckets to the next call, so each sample is touched once per level
+    reached.  Bucket i of level k covers samples [i * factor**k, (i + 1) *
+    factor**k) counted from the first sample passed in.
+
+    update() returns the buckets it completed; with a capacity, the most
+    recent capacity buckets of each level are also kept in ring buffers for
+    read().
+    """
+
+    def __init__(self, channels=1, factor=8, levels=4, capacity=None):
+        self.channels = channels
+        self.factor = factor
+        self.levels = levels
+        self.capacity = capacity
+        if capacity:
+            self._mins = [RingBuffer(capacity, channels) for _ in range(levels)]
+            self._maxs = [RingBuffer(capacity, channels) for _ in range(levels)]
+        self.reset()
+
+    def reset(self):
+        self.total = 0
+        empty = np.empty((0, self.channels))
+        self._pending = [(empty, empty)] * self.levels
+        if self.capacity:
+            for buffer in self._mins + self._maxs:
+                buffer.clear()
+
+    def bucket(self, level):
+        """Samples per bucket at a level."""
+        return self.factor ** level
+
+    def update(self, values):
+        """Fold in (n, channels) samples. Returns the new (mins, maxs) buckets, per level from 1."""
+        values = np.asarray(values, dtype=np.float64).reshape(-1, self.channels)
+        self.total += len(values)
+        mins = maxs = values
+        completed = []
+        for level in range(self.levels):
+            if len(mins) == 0:
+                completed.append((mins, maxs))  # nothing reaches the levels above either
+                continue
+            pending_mins, pending_maxs = self._pending[level]
+            if len(pending_mins):
+                mins = np.concatenate((pending_mins, mins))
+                maxs = np.concatenate((pending_maxs, maxs))
+            if len(mins) < self.factor:
+                # Still no complete bucket: carry everything, skip the reductions
+                self._pending[level] = (mins.copy(), maxs.copy()) if mins is values else (mins, maxs)
+                mins = maxs = mins[:0]
+                completed.append((mins, maxs))
+                continue
+            whole = len(mins) // self.factor * self.factor
+            self._pending[level] = (mins[whole:].copy(), maxs[whole:].copy())
+            mins = mins[:whole].reshape(-1, self.factor, self.channels).min(axis=1)
+            maxs = maxs[:whole].reshape(-1, self.factor, self.channels).max(axis=1)
+            completed.append((mins, maxs))
+            if self.capacity:
+                self._mins[level].extend(mins)
+                self._maxs[level].extend(maxs)
+        return completed
+
+    def choose_level(self, samples, width):
+        return choose_level(samples, width, self.factor, self.levels)
+
+    def read(self, level, start, stop):
+        """Buckets of a stored level (>= 1) overlapping samples [start, stop).
+
+        Returns (first, mins, maxs) with first the index of the first bucket,
+        which is later than asked for when older buckets were overwritten.
+        Only complete buckets are returned.
+        """
+        size = self.bucket(level)
+        mins, maxs = self._mins[level - 1], self._maxs[level - 1]
+        first = max(start // size, mins.oldest)
+        end = min(-(-stop // size), mins.total)
+        if end <= first:
+            return first, np.empty((0, self.channels)), np.empty((0, self.channels))
+        _, low = mins.since(first)
+        _, high = maxs.since(first)
+        return first, low[:end - first], high[:end - first]
@@ -0,0 +1,227 @@
+from collections import deque
+
+import numpy as np
+
+from ecg_core.filters import imported_scipy, lfilter_python
+from ecg_core.ring_buffer import RingBuffer
+
+
+def _bandpass(low, high, sample_rate):
+    # First-order Butterworth band-pass by the bilinear transform (as butter(1, ..., fs=sample_rate))
+    k = 2.0 * sample_rate
+    w1, w2 = (k * np.tan(np.pi * f / sample_rate) for f in (low, high))
+    bw, w0sq = w2 - w1, w1 * w2
+    a = np.array([k * k + bw * k + w0sq, 2.0 * (w0sq - k * k), k * k - bw * k + w0sq])
+    return bw * k * np.array([1.0, 0.0, -1.0]) / a[0], a / a[0]
+
+
+class PanTompkinsDetector:
+    """Streaming Pan-Tompkins QRS detector.
+
+    Each block goes once through a 5-15 Hz band-pass and the five-point
+    derivative (as one filter), squaring and a 150 ms moving-window integrator, all with
+    state carried between blocks.  Only the local maxima of the integrated
+    signal are then examined one by one against the adaptive signal/noise
+    thresholds (SPKI/NPKI), with a 200 ms refractory period, T-wave
+    rejection up to 360 ms, and a search-back at half threshold when no
+    beat was found for 166% of the average R-R interval.
+
+    A lazy detector does not import SciPy: it runs its filter in plain
+    Python until scipy.signal has been imported elsewhere.
+
+    Every sample fed in gets the next index of the detector's sample clock
+    (0 for the first sample, as in RingBuffer), and R-peaks are reported
+    as such indices.  All timing is derived from these indices and the
+    sample rate, never from the wall clock.
+    """
+
+    LEARNING_SECONDS = 2.0
+    REFRACTORY = 0.200
+    T_WAVE_WINDOW = 0.360
+    INTEGRATION_WINDOW = 0.150
+    SEARCH_BACK_RATIO = 1.66
+
+    def __init__(self, sample_rate, lazy=False):
+        self.sample_rate = sample_rate
+        self._window = max(1, int(round(self.INTEGRATION_WINDOW * sample_rate)))
+        self._refractory = int(self.REFRACTORY * sample_rate)
+        self._t_wave = int(self.T_WAVE_WINDOW * sample_rate)
+        self._learning = int(self.LEARNING_SECONDS * sample_rate)
+        # R lies before the end of the integrator window; allow for the band-pass delay too
+        self._search = self._window + int(0.075 * sample_rate)
+        # Largest block handled in one pass, so the history always covers a search window
+        self._chunk = max(self._search, sample_rate)
+        # Search-back may reach about 1.66 R-R intervals into the past
+        history = self._chunk + self._search + 3 * sample_rate
+        if lazy:
+            self._lfilter = imported_scipy('lfilter')
+        else:
+            from scipy.signal import lfilter
+            self._lfilter = lfilter
+        # Band-pass and five-point derivative folded into one filter: a single
+        # low-order section is well conditioned, and lfilter has far less
+        # per-call overhead than sosfilt on 10-sample blocks
+        b, a = _bandpass(5.0, 15.0, sample_rate)
+        self._b = np.convolve(b, [2.0, 1.0, 0.0, -1.0, -2.0]) * sample_rate / 8.0
+        self._a = a
+        self._kernel = np.full(self._window, 1.0 / self._window)
+        self._signal = RingBuffer(history)
+        self._slope = RingBuffer(history)
+        self.reset()
+
+    def reset(self):
+        self._zi = np.zeros(max(len(self._a), len(self._b)) - 1)
+        self._squared = np.zeros(self._window - 1)  # integrator delay line
+        self._signal.clear()
+        self._slope.clear()
+        self.total = 0
+        self.spki = 0.0
+        self.npki = 0.0
+        self._learn_max = 0.0
+        self._learn_sum = 0.0
+        self._tail = np.empty(0)
+        self._candidates = []  # below-threshold peaks since the last beat, for search-back
+        self.last_peak = None
+        self._integrated_peak = None
+        self._last_slope = 0.0
+        self.rr = deque(maxlen=8)  # recent R-R intervals, samples
+        self.peaks = []
+
+    @property
+    def threshold(self):
+        return self.npki + 0.25 * (self.spki - self.npki)
+
+    def process(self, block):
+        """Feed a block of samples. Returns the sample indices of the R-peaks found."""
+        block = np.asarray(block, dtype=np.float64)
+        if len(block) <= self._chunk:
+            return self._process_chunk(block)
+        found = []
+        for start in range(0, len(block), self._chunk):
+            found.extend(self._process_chunk(block[start:start + self._chunk]))
+        return found
+
+    def _process_chunk(self, x):
+        first = self.total
+        if self._lfilter is None:
+            self._lfilter = imported_scipy('lfilter')
+        if self._lfilter is None:
+            slope, self._zi = lfilter_python(self._b, self._a, x, self._zi)
+        else:
+            slope, self._zi = self._lfilter(self._b, self._a, x, zi=self._zi)
+        squared = np.concatenate((self._squared, slope * slope))
+        integrated = np.convolve(squared, self._kernel, 'valid')
+        self._squared = squared[len(squared) - len(self._squared):]
+        self._signal.extend(x)
+        self._slope.extend(np.abs(slope))
+        self.total += len(x)
+
+        if first < self._learning:
+            self._learn(integrated[:self._learning - first])
+
+        # Local maxima, using the previous two samples to see across the block edge
+        ext = np.concatenate((self._tail, integrated))
+        offset = first - len(self._tail)
+        self._tail = ext[-2:]
+        if len(ext) < 3:
+            return []
+        maxima = np.flatnonzero((ext[1:-1] > ext[:-2]) & (ext[1:-1] >= ext[2:])) + 1
+
+        found = []
+        for pos in maxima:
+            index = offset + int(pos)
+            if index < self._learning:
+                continue
+            found.extend(self._search_back(index))
+            found.extend(self._classify(index, ext[pos]))
+        found.extend(self._search_back(self.total))
+        return found
+
+    def _learn(self, integrated):
+        self._learn_max = max(self._learn_max, integrated.max(initial=0.0))
+        self._learn_sum += integrated.sum()
+        if self.total >= self._learning:
+            self.spki = 0.25 * self._learn_max
+            self.npki = 0.5 * self._learn_sum / self._learning
+
+    def _classify(self, index, value):
+        if self.last_peak is not None and index - self._integrated_peak < self._refractory:
+            return []
+        if value <= self.threshold:
+            self.npki = 0.125 * value + 0.875 * self.npki
+            self._candidates.append((index, value))
+            return []
+
+        peak = self._locate(index)
+        if peak is None:
+            self.npki = 0.125 * value + 0.875 * self.npki
+            return []
+        if self.last_peak is not None:
+            # A T wave has a much gentler slope than the QRS before it
+            if peak - self.last_peak < self._t_wave and self._slope_at(peak) < 0.5 * self._last_slope:
+                self.npki = 0.125 * value + 0.875 * self.npki
+                return []
+
+        self.spki = 0.125 * value + 0.875 * self.spki
+        return [self._accept(peak, index)]
+
+    def _search_back(self, now):
+        if self.last_peak is None or len(self.rr) < 2 or not self._candidates:
+            return []
+        if now - self._integrated_peak < self.SEARCH_BACK_RATIO * sum(self.rr) / len(self.rr):
+            return []
+        index, value = max(self._candidates, key=lambda c: c[1])
+        self._candidates = []
+        if value < 0.5 * self.threshold:
+            return []
+        peak = self._locate(index)
+        if peak is None:
+            return []
+        self.spki = 0.25 * value + 0.75 * self.spki
+        return [self._accept(peak, index)]
+
+    def _locate(self, index):
+        """The R peak: the signal maximum in the window leading up to the integrated peak.
+
+        Returns None when the signal was higher during the previous beat's
+        refractory period just before that maximum: the wave is the tail of
+        something (a T wave) that belongs to the previous beat.
+        """
+        start = max(index - self._search, self._signal.oldest)
+        floor = start
+        if self.last_peak is not None and self.last_peak + self._refractory > start:
+            start = self.last_peak + self._refractory
+            floor = max(self.last_peak + 1, self._signal.oldest)
+        _, window = self._signal.since(floor)
+        window = window[:max(0, index - floor + 1)]
+        if len(window) <= start - floor:
+            return None
+        peak = start + int(np.argmax(window[start - floor:]))
+        lookback = window[max(0, peak - self._refractory // 2 - floor):start - floor]
+        if len(lookback) and lookback.max() >= window[peak - floor]:
+            return None
+        return peak
+
+    def _slope_at(self, peak):
+        # Steepest band-passed slope around a located peak
+        half = self._window // 2
+        start = max(peak - half, self._slope.oldest)
+        _, slope = self._slope.since(start)
+        return slope[:max(0, peak + half - start + 1)].max(initial=0.0)
+
+    def _accept(self, peak, index):
+        if self.last_peak is not None:
+            self.rr.append(peak - self.last_peak)
+        self.last_peak = peak
+        self._integrated_peak = index
+        self._last_slope = self._slope_at(peak)
+        self._candidates = []
+        self.peaks.append(peak)
+        del self.peaks[:-64]
+        return peak
+
+    def heart_rate(self):
+        """Beats per minute over the recent R-R intervals, or None before two beats."""
+        if not self.rr:
+            return None
+        return 60.0 * self.sample_rate / np.mean(self.rr)
@@ -0,0 +1,164 @@
+import numpy as np
+
+from ecg_core.frames import FULL_SCALE
+from ecg_core.ring_buffer import RingBuffer
+
+# The ADS1292R status word is 1100 + LOFF_STAT[4:0] + GPIO[1:0] + 13 zero bits
+LOFF_SHIFT = 15
+ELECTRODES = ('in1p', 'in1n', 'in2p', 'in2n', 'rld')  # LOFF_STAT bit 0 upwards
+CHANNEL_ELECTRODES = (0b10011, 0b11100)  # electrodes (and RLD) each channel depends on
+
+
+def lead_off_bits(status):
+    """LOFF_STAT bits of each status word, as uint8."""
+    return ((np.asarray(status, dtype=np.uint32) >> LOFF_SHIFT) & 0x1F).astype(np.uint8)
+
+
+def electrode_names(bits):
+    return [name for bit, name in enumerate(ELECTRODES) if int(bits) >> bit & 1]
+
+
+def _penalty(value, good, bad):
+    """0 at or below good, 1 at or above bad, linear between."""
+    return np.clip((value - good) / (bad - good), 0.0, 1.0)
+
+
+class SignalQuality:
+    """Signal quality and lead-off state over the latest window, per channel.
+
+    update() takes decoded blocks (status words and (n, channels) values)
+    into a ring buffer and, once every interval seconds of signal, assesses
+    the last window seconds with whole-array NumPy operations:
+
+    - noise: robust sigma of the sample-to-sample differences (median
+      absolute deviation, so QRS slopes barely count)
+    - saturation: fraction of samples within 5% of the ADC full scale
+    - wander: peak-to-peak of the 200 ms segment medians (baseline drift)
+    - mains: amplitude at mains_hz, from one Hann-windowed DFT bin
+    - flat / weak: peak-to-peak too small for an ECG to be there at all
+
+    plus the LOFF_STAT bits that every status word carries.  Each channel
+    gets a 0-100 score and a label; the assessment is a small dict that
+    can be polled or pushed to clients as is.
+
+    Thresholds are in mV; unit_mv is mV per unit of the values (1000 for
+    volts), full_scale the value of a full-scale code per channel.
+    """
+
+    SATURATION = 0.95
+    FLAT_MV = 0.02
+    WEAK_MV = 0.2
+    NOISE_MV = (0.05, 0.3)  # good, bad
+    MAINS_MV = (0.05, 0.5)
+    WANDER_MV = (0.5, 3.0)
+    SATURATED = 0.05  # fraction of samples
+    MIN_WINDOW = 0.5  # s of signal before the first assessment
+
+    def __init__(self, sample_rate, full_scale, channels=2, window=2.0, interval=0.25, unit_mv=1.0,
+                 mains_hz=50.0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.full_scale = np.broadcast_to(np.asarray(full_scale, dtype=np.float64), (channels,))
+        self.unit_mv = unit_mv
+        self.mains_hz = mains_hz
+        self.interval = max(1, int(interval * sample_rate))
+        self._segment = max(1, int(0.2 * sample_rate))
+        self._values = RingBuffer(max(self._segment, int(window * sample_rate)), channels)
+        self._lead_off = RingBuffer(self._values.capacity, dtype=np.uint8)
+        self._phasors = {}
+        self.reset()
+
+    def reset(self):
+        self._values.clear()
+        self._lead_off.clear()
+        self._due = int(self.MIN_WINDOW * self.sample_rate)
+        self.latest = None
+
+    @classmethod
+    def for_reader(cls, reader, sample_rate, channels=2, **kwargs):
+        """Engine for a FrameReader's first channels: full scale from its LSB, units from its scale."""
+        return cls(sample_rate, reader.lsb[:channels] * FULL_SCALE, channels, unit_mv=1000.0 / reader.scale,
+                   **kwargs)
+
+    def update(self, status, values):
+        """Add a block. Returns a new assessment when one is due, else None."""
+        self._values.extend(np.asarray(values).reshape(-1, self.channels))
+        self._lead_off.extend(lead_off_bits(status))
+        if self._values.total < self._due:
+            return None
+        self._due = self._values.total + self.interval
+        self.latest = self.assess()
+        return self.latest
+
+    def _phasor(self, n):
+        # Hann-windowed complex exponential at the mains frequency, normalised to amplitude
+        phasor = self._phasors.get(n)
+        if phasor is None:
+            window = np.hanning(n)
+            phasor = 2.0 * window * np.exp(-2j * np.pi * self.mains_hz * np.arange(n) / self.sample_rate)
+            phasor /= window.sum()
+            self._phasors = {n: phasor}
+        return phasor
+
+    def metrics(self, x):
+        """Quality metrics of a (n, channels) window, in mV (saturation as a fraction)."""
+        n = len(x)
+        diffs = np.diff(x, axis=0)
+        mad = np.median(np.abs(diffs - np.median(diffs, axis=0)), axis=0)
+        usable = n // self._segment * self._segment
+        baseline = np.median(x[n - usable:].reshape(-1, self._segment, self.channels), axis=1)
+        mains = np.abs(self._phasor(n) @ (x - x.mean(axis=0))) if self.mains_hz < self.sample_rate / 2 \
+            else np.zeros(self.channels)
+        return {
+            # 1.4826 * MAD estimates sigma; differencing white noise multiplies it by sqrt(2)
+            'noise_mv': self.unit_mv * 1.4826 * mad / np.sqrt(2.0),
+            'saturation': np.mean(np.abs(x) >= self.SATURATION * self.full_scale, axis=0),
+            'wander_mv': self.unit_mv * np.ptp(baseline, axis=0),
+            'mains_mv': self.unit_mv * mains,
+            'ptp_mv': self.unit_mv * np.ptp(x, axis=0)
+        }
+
+    def assess(self):
+        """Assessment of the current window, or None with too little signal."""
+        n = len(self._values)
+        if n < max(self._segment, 2):
+            return None
+        metrics = self.metrics(self._values.latest(n))
+        bits = self._lead_off.latest(n)
+        current = int(bits[-1])
+
+        penalties = np.max([
+            _penalty(metrics['noise_mv'], *self.NOISE_MV),
+            _penalty(metrics['mains_mv'], *self.MAINS_MV),
+            _penalty(metrics['wander_mv'], *self.WANDER_MV),
+            _penalty(metrics['saturation'], 0.0, self.SATURATED)
+        ], axis=0)
+        scores = np.round(100.0 * (1.0 - penalties)).astype(int)
+
+        channels = []
+        for channel in range(self.channels):
+            score = int(scores[channel])
+            lead_off = electrode_names(current & CHANNEL_ELECTRODES[channel]) if channel < 2 else []
+            ptp = metrics['ptp_mv'][channel]
+            if lead_off:
+                label, score = 'lead_off', 0
+            elif metrics['saturation'][channel] >= self.SATURATED:
+                label, score = 'saturated', 0
+            elif ptp < self.FLAT_MV:
+                label, score = 'flat', 0
+            elif ptp < self.WEAK_MV:
+                label, score = 'weak', min(score, 40)
+            else:
+                label = 'good' if score >= 80 else 'fair' if score >= 50 else 'noisy'
+            entry = {'score': score, 'label': label, 'lead_off': lead_off}
+            entry.update({key: round(float(value[channel]), 4) for key, value in metrics.items()})
+            channels.append(entry)
+
+        worst = min(channels, key=lambda entry: entry['score'])
+        return {
+            'score': worst['score'],
+            'label': worst['label'],
+            'lead_off': electrode_names(current),
+            'lead_off_ratio': float(np.count_nonzero(bits) / n),
+            'channels': channels
+        }
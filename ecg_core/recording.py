@@ -0,0 +1,472 @@
+import logging
+import math
+import os
+import shutil
+import struct
+import threading
+import time
+
+import numpy as np
+
+from ecg_core.compression import CHUNK_HEADER, CODEC_NAMES, NONE, chunk_size, compress_chunk, decompress_chunk
+from ecg_core.pipeline import DROP_NEWEST, Stage
+from ecg_core.pyramid import MinMaxPyramid, choose_level, envelope
+
+# magic, version, header size, encoding, channels, sample rate, vref,
+# LSB per channel (app units per count), gain per channel, chunk frames,
+# start time (Unix ns), index of the first frame on the app's sample clock,
+# register snapshot (indexed by address), envelope pyramid factor and
+# levels, chunk compression codec (ecg_core.compression).  Little-endian,
+# padded to HEADER_SIZE so the frames that follow are aligned for
+# numpy.memmap.
+HEADER = struct.Struct('<8sHHHHdd2d2BIqQ16sBBB')
+HEADER_SIZE = 128
+MAGIC = b'ECGREC\r\n'
+VERSION = 1
+
+COUNTS = 0  # int24 ADC codes, sign-extended to int32
+FLOAT32 = 1  # values in the app's units
+ENCODINGS = {COUNTS: '<i4', FLOAT32: '<f4'}
+
+# Sparse index, one entry per chunk: first frame of the chunk, wall-clock
+# time (Unix ns) that frame was acquired at, and its byte offset in the file.
+INDEX_DTYPE = np.dtype([('frame', '<u8'), ('time_ns', '<i8'), ('offset', '<u8')])
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+def pyramid_path(path, level):
+    return path + f'.p{level}'
+
+
+def codec_id(compression):
+    if compression not in CODEC_NAMES and compression is not None:
+        raise ValueError(f"Unknown compression {compression!r} (expected one of {sorted(CODEC_NAMES)})")
+    return CODEC_NAMES.get(compression, NONE)
+
+
+def envelope_dtype(channels=2):
+    """One record per pyramid bucket: per-channel minimum and maximum, in the recorded units."""
+    return np.dtype([('min', '<f4', (channels,)), ('max', '<f4', (channels,))])
+
+
+def frame_dtype(encoding, channels=2):
+    """One record per conversion: the status word, then every channel."""
+    return np.dtype([('status', '<u4'), ('samples', ENCODINGS[encoding], (channels,))])
+
+
+class Recorder:
+    """Appends acquired frames to a binary recording without blocking acquisition.
+
+    write() runs on the acquisition thread and only copies the block into
+    a preallocated chunk of chunk_frames records.  Full chunks go through
+    a bounded queue to a writer thread, which does the file I/O (and a
+    periodic fsync) off the DRDY path.  If the SD card falls behind by
+    more than queue_chunks chunks, new chunks are dropped rather than
+    stalling acquisition; the writer fills the hole with records whose
+    status word is 0 (a real ADS1292R status word always starts 0b1100),
+    so a record's position in the file is still its sample index.
+
+    The file is a HEADER_SIZE header followed by fixed-size records; the
+    record count is the file size, so a file cut short by a crash or power
+    loss loses at most the chunks still queued.  Next to it, an .idx file
+    gets one INDEX_DTYPE entry per chunk written, so a wall-clock time is
+    mapped to a record without reading the recording itself, and .p1 ..
+    .pN files get the min/max envelope at each pyramid level, so a chart of
+    hours of signal reads a few thousand buckets instead of every frame.
+
+    With compression ('zlib', 'bz2' or 'lzma'), each chunk is stored as one
+    losslessly compressed block (ecg_core.compression) instead, on the
+    writer thread; the index then gives each block's byte offset, so any
+    frame is still reached by decompressing a single chunk.
+    """
+
+    SYNC_INTERVAL = 5.0  # s between fsyncs
+
+    def __init__(self, path, sample_rate, lsb, gain=(6, 6), vref=2.42, registers=(),
+                 encoding=COUNTS, chunk_frames=4096, queue_chunks=64, pyramid_factor=8, pyramid_levels=4,
+                 compression=None):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown recording encoding {encoding!r}")
+        self.compression = codec_id(compression)
+        if self.compression != NONE and encoding != COUNTS:
+            raise ValueError("Lossless compression needs the counts encoding")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.lsb = np.broadcast_to(np.asarray(lsb, dtype=np.float64), (2,)).copy()
+        self.gain = tuple(gain)
+        self.vref = vref
+        self.registers = bytes(registers)[:16]
+        self.encoding = encoding
+        self.chunk_frames = chunk_frames
+        self.dtype = frame_dtype(encoding)
+        self.pyramid_factor = pyramid_factor
+        self.pyramid_levels = pyramid_levels
+        self.running = False
+        self._lock = threading.Lock()
+        self._file = None
+        self._writer = Stage('record', self._write_chunk, queue_chunks, DROP_NEWEST)
+
+    def start(self, first_index=0):
+        """Create the file and start the writer. first_index: app sample index of the next frame."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.start_time = time.time_ns()
+        self.first_index = first_index
+        self.frames = 0
+        self.dropped = 0
+        self.written = 0
+        self.bytes = HEADER_SIZE
+        self._last_sync = time.monotonic()
+        self._file = open(self.path, 'wb')
+        self._file.write(self.header())
+        self._file.flush()
+        self._index = open(index_path(self.path), 'wb')
+        self._pyramid = MinMaxPyramid(2, self.pyramid_factor, self.pyramid_levels)
+        self._levels = [open(pyramid_path(self.path, level), 'wb') for level in range(1, self.pyramid_levels + 1)]
+        self._new_chunk()
+        self._writer.start()
+        self.running = True
+
+    def header(self):
+        header = HEADER.pack(
+            MAGIC, VERSION, HEADER_SIZE, self.encoding, 2, float(self.sample_rate), float(self.vref),
+            *self.lsb, *self.gain, self.chunk_frames, self.start_time, self.first_index, self.registers,
+            self.pyramid_factor, self.pyramid_levels, self.compression
+        )
+        return header.ljust(HEADER_SIZE, b'\0')
+
+    def _new_chunk(self):
+        self._chunk = np.empty(self.chunk_frames, dtype=self.dtype)
+        self._chunk_first = self.frames
+        self._chunk_time = None
+        self._fill = 0
+
+    def write(self, status, values, times=None):
+        """Append a decoded block: status words (n,) and values (n, 2) in the app's units.
+
+        times, the wall-clock times (Unix ns) of the block's frames (e.g.
+        SampleClock.wall_times), stamp the chunks; without them the time of
+        the call is taken as that of the block's last frame.
+        """
+        with self._lock:
+            if not self.running:
+                return
+            n = len(values)
+            done = 0
+            while done < n:
+                if self._chunk_time is None:
+                    # Acquisition time of the chunk's first frame
+                    if times is not None:
+                        self._chunk_time = int(times[done])
+                    else:
+                        self._chunk_time = time.time_ns() - int((n - 1 - done) * 1e9 / self.sample_rate)
+                take = min(n - done, self.chunk_frames - self._fill)
+                records = self._chunk[self._fill:self._fill + take]
+                records['status'] = status[done:done + take]
+                block = values[done:done + take]
+                if self.encoding == COUNTS:
+                    records['samples'] = np.rint(block / self.lsb)
+                else:
+                    records['samples'] = block
+                self._fill += take
+                self.frames += take
+                done += take
+                if self._fill == self.chunk_frames:
+                    self._submit()
+
+    def _submit(self):
+        if not self._writer.put((self._chunk_first, self._chunk_time, self._chunk)):
+            self.dropped += self._fill
+        self._new_chunk()
+
+    def _write_chunk(self, chunk):
+        first, stamp, records = chunk
+        if first > self.written:
+            gap = np.zeros(first - self.written, dtype=self.dtype)
+            self._append(self.written, stamp - int(len(gap) * 1e9 / self.sample_rate), gap)
+        self._append(first, stamp, records)
+        now = time.monotonic()
+        if now - self._last_sync >= self.SYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def _append(self, first, stamp, records):
+        if self.compression == NONE:
+            data = records.data
+        else:
+            data = compress_chunk(records['status'], records['samples'], self.compression)
+        self._file.write(data)
+        self._file.flush()
+        self._update_pyramid(records)
+        # The index entry goes in once the chunk is complete on disk
+        entry = np.array([(first, stamp, self.bytes)], dtype=INDEX_DTYPE)
+        self._index.write(entry.data)
+        self._index.flush()
+        self.written = first + len(records)
+        self.bytes += len(data) if self.compression != NONE else records.nbytes
+
+    def _update_pyramid(self, records):
+        values = records['samples'] * self.lsb if self.encoding == COUNTS else records['samples']
+        for f, (mins, maxs) in zip(self._levels, self._pyramid.update(values)):
+            if len(mins):
+                buckets = np.empty(len(mins), dtype=envelope_dtype())
+                buckets['min'] = mins
+                buckets['max'] = maxs
+                f.write(buckets.data)
+                f.flush()
+
+    def stop(self):
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+            if self._fill:
+                self._chunk = self._chunk[:self._fill]
+                self._submit()
+        self._writer.stop(timeout=10.0)
+        for f in [self._file, self._index] + self._levels:
+            try:
+                os.fsync(f.fileno())
+            except OSError as e:
+                logging.error(f"Recording sync failed: {str(e)}")
+            f.close()
+        self._file = None
+        self._index = None
+        self._levels = []
+
+    def stats(self):
+        writer = self._writer.stats()
+        return {
+            'path': self.path,
+            'running': self.running,
+            'frames': self.frames,
+            'written': self.written,
+            'dropped': self.dropped,
+            'bytes': self.bytes,
+            'queued_chunks': writer['depth'],
+            'write_ms_mean': writer['busy_ms_mean'],
+            'write_ms_max': writer['busy_ms_max']
+        }
+
+
+class Recording:
+    """A recording opened for playback: the frames are a read-only numpy.memmap.
+
+    status and samples are views into the file (no copy), samples in
+    counts or float32 depending on the encoding; values() scales a range
+    to the units the app recorded in.  refresh() picks up frames appended
+    since the file was opened, so a recording can be read while it grows.
+    A compressed recording has no frames memmap: records() decompresses
+    the chunks a range falls in (the last one is kept for the next read).
+
+    Wall-clock times map to frames through the sparse chunk index,
+    interpolating between chunks (and extrapolating at the nominal sample
+    rate past either end), so the clock of the recording machine is
+    followed even where it differs from the nominal rate.  envelope() reads
+    the pyramid level that matches the number of points wanted.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            raw = f.read(HEADER_SIZE)
+        if len(raw) < HEADER.size or raw[:8] != MAGIC:
+            raise ValueError(f"{path} is not an ECG recording")
+        self._fields = HEADER.unpack_from(raw)
+        (_, self.version, self.header_size, self.encoding, self.channels, self.sample_rate,
+         self.vref, lsb1, lsb2, gain1, gain2, self.chunk_frames, self.start_time,
+         self.first_index, registers, self.pyramid_factor, pyramid_levels, self.compression) = self._fields
+        self.lsb = np.array([lsb1, lsb2])
+        self.gain = (gain1, gain2)
+        self.registers = list(registers)
+        self.dtype = frame_dtype(self.encoding, self.channels)
+        self.pyramid_levels = pyramid_levels
+        self._cached = (None, None)
+        self.refresh()
+
+    def refresh(self):
+        try:
+            self.index = np.fromfile(index_path(self.path), dtype=INDEX_DTYPE)
+        except OSError:
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+        size = os.path.getsize(self.path)
+        self.frames = np.empty(0, dtype=self.dtype)
+        if self.compression == NONE:
+            self.count = (size - self.header_size) // self.dtype.itemsize
+            if self.count > 0:
+                self.frames = np.memmap(self.path, dtype=self.dtype, mode='r',
+                                        offset=self.header_size, shape=(self.count,))
+        else:
+            self._data = np.memmap(self.path, dtype=np.uint8, mode='r') if size > self.header_size else b''
+            if not len(self.index):
+                self._scan_chunks()
+            self.count = 0
+            if len(self.index):
+                last = self.index[-1]
+                self.count = int(last['frame']) + chunk_size(self._data, int(last['offset']))[1]
+        self.envelopes = []
+        dtype = envelope_dtype(self.channels)
+        for level in range(1, self.pyramid_levels + 1):
+            path = pyramid_path(self.path, level)
+            buckets = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+            self.envelopes.append(np.memmap(path, dtype=dtype, mode='r', shape=(buckets,))
+                                  if buckets else np.empty(0, dtype=dtype))
+        return self.count
+
+    def _scan_chunks(self):
+        # No .idx (an exported file on its own): chunks are self-delimiting, walk them
+        entries = []
+        offset, frame = self.header_size, 0
+        while offset + CHUNK_HEADER.size <= len(self._data):
+            size, frames = chunk_size(self._data, offset)
+            if offset + size > len(self._data):
+                break
+            entries.append((frame, self.start_time + int(frame * 1e9 / self.sample_rate), offset))
+            offset += size
+            frame += frames
+        self.index = np.array(entries, dtype=INDEX_DTYPE)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def duration(self):
+        return self.count / self.sample_rate
+
+    def records(self, start=0, stop=None):
+        """Records [start, stop): a memmap view, or decompressed chunks."""
+        start, stop, _ = slice(start, stop).indices(self.count)
+        if self.compression == NONE:
+            return self.frames[start:stop]
+        parts = []
+        chunk = max(int(np.searchsorted(self.index['frame'], start, 'right')) - 1, 0)
+        for entry in self.index[chunk:]:
+            first = int(entry['frame'])
+            if first >= stop:
+                break
+            records = self._chunk(int(entry['offset']))
+            parts.append(records[max(start - first, 0):stop - first])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=self.dtype)
+
+    def _chunk(self, offset):
+        cached_offset, records = self._cached
+        if cached_offset != offset:
+            status, counts = decompress_chunk(self._data, offset)
+            records = np.empty(len(status), dtype=self.dtype)
+            records['status'] = status
+            records['samples'] = counts
+            self._cached = (offset, records)
+        return records
+
+    @property
+    def status(self):
+        return self.records()['status']
+
+    @property
+    def samples(self):
+        return self.records()['samples']
+
+    def values(self, start=0, stop=None):
+        """Frames [start, stop) as float64 (n, channels) in the recorded units."""
+        samples = self.records(start, stop)['samples']
+        if self.encoding == COUNTS:
+            return samples * self.lsb
+        return samples.astype(np.float64)
+
+    def _clock(self):
+        if len(self.index):
+            # np.interp needs ascending times, which a wall-clock step back would break
+            times = np.maximum.accumulate(self.index['time_ns'].astype(np.float64))
+            return self.index['frame'].astype(np.float64), times
+        return np.zeros(1), np.array([float(self.start_time)])
+
+    def index_at(self, time_ns):
+        """Frame acquired at a wall-clock time (Unix ns), clipped to the recording."""
+        frames, times = self._clock()
+        if time_ns <= times[0]:
+            frame = frames[0] + (time_ns - times[0]) * self.sample_rate / 1e9
+        elif time_ns >= times[-1]:
+            frame = frames[-1] + (time_ns - times[-1]) * self.sample_rate / 1e9
+        else:
+            frame = np.interp(time_ns, times, frames)
+        return int(min(max(round(frame), 0), self.count))
+
+    def time_at(self, frame):
+        """Wall-clock time (Unix ns) frame was acquired at."""
+        frames, times = self._clock()
+        if frame <= frames[0] or frame >= frames[-1] or len(frames) == 1:
+            anchor = 0 if frame <= frames[0] else -1
+            return int(times[anchor] + (frame - frames[anchor]) * 1e9 / self.sample_rate)
+        return int(np.interp(frame, frames, times))
+
+    def read(self, start=0, stop=None, max_points=None):
+        """Frames [start, stop) as a (channels, n) float64 array in the recorded units.
+
+        With max_points, longer ranges are averaged over groups of step
+        consecutive frames, so at most max_points are returned.  Returns
+        (step, values).
+        """
+        values = self.values(start, stop)
+        step = 1
+        if max_points and len(values) > max_points:
+            step = math.ceil(len(values) / max_points)
+            whole = len(values) // step * step
+            values = values[:whole].reshape(-1, step, values.shape[1]).mean(axis=1)
+        return step, values.T
+
+    def envelope(self, start, stop, width):
+        """Min/max envelope of frames [start, stop) in at most width buckets.
+
+        Returns (first, step, mins, maxs): mins and maxs are (channels, n),
+        bucket i covers frames [first + i * step, first + (i + 1) * step).
+        Pyramid levels only hold complete buckets, so up to one bucket of
+        the most recent frames may be left out.
+        """
+        level = choose_level(stop - start, width, self.pyramid_factor, self.pyramid_levels)
+        if level == 0:
+            mins = maxs = self.values(start, stop)
+            size, first = 1, start
+        else:
+            size = self.pyramid_factor ** level
+            buckets = self.envelopes[level - 1][start // size:-(-stop // size)]
+            mins = buckets['min'].astype(np.float64)
+            maxs = buckets['max'].astype(np.float64)
+            first = start // size * size
+        group, mins, maxs = envelope(mins, maxs, width)
+        return first, size * group, mins.T, maxs.T
+
+    def missing(self, start=0, stop=None):
+        """Mask of frames dropped while recording (status word 0)."""
+        return self.records(start, stop)['status'] == 0
+
+
+def compress_recording(source, path, compression='zlib'):
+    """Write a losslessly compressed copy of a recording (with its index and pyramid) to path."""
+    recording = Recording(source)
+    codec = codec_id(compression)
+    if recording.encoding != COUNTS:
+        raise ValueError("Lossless compression needs the counts encoding")
+    fields = list(recording._fields)
+    fields[-1] = codec
+    entries = []
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(*fields).ljust(HEADER_SIZE, b'\0'))
+        offset = HEADER_SIZE
+        for start in range(0, len(recording), recording.chunk_frames):
+            records = recording.records(start, start + recording.chunk_frames)
+            if codec == NONE:
+                data = records.tobytes()
+            else:
+                data = compress_chunk(records['status'], records['samples'], codec)
+            f.write(data)
+            entries.append((start, recording.time_at(start), offset))
+            offset += len(data)
+    np.array(entries, dtype=INDEX_DTYPE).tofile(index_path(path))
+    for level in range(1, recording.pyramid_levels + 1):
+        if os.path.exists(pyramid_path(source, level)):
+            shutil.copyfile(pyramid_path(source, level), pyramid_path(path, level))
+    return path
@@ -0,0 +1,143 @@
+import threading
+import time
+from contextlib import contextmanager
+
+RDATAC = 0x10
+SDATAC = 0x11
+RREG = 0x20
+WREG = 0x40
+
+REGISTERS = [
+    'ID', 'CONFIG1', 'CONFIG2', 'LOFF', 'CH1SET', 'CH2SET',
+    'RLD_SENS', 'LOFF_SENS', 'LOFF_STAT', 'RESP1', 'RESP2', 'GPIO'
+]
+CONFIG1 = 0x01
+# Bits that hold what was written; the others read back as device state (ID, lead-off comparators, GPIO pins)
+WRITABLE = {0x00: 0x00, 0x08: 0x40, 0x0B: 0x0C}
+
+# CONFIG1 DR[2:0] -> conversions per second (fMOD = 128 kHz)
+DATA_RATES = {0: 125, 1: 250, 2: 500, 3: 1000, 4: 2000, 5: 4000, 6: 8000}
+SINGLE_SHOT = 0x80
+
+
+def data_rate_config(sample_rate, single_shot=False):
+    """CONFIG1 value for a data rate in SPS; ValueError for a rate the ADS1292R doesn't have."""
+    for bits, rate in DATA_RATES.items():
+        if rate == sample_rate:
+            return bits | (SINGLE_SHOT if single_shot else 0)
+    raise ValueError(f"Unsupported data rate {sample_rate} SPS (expected one of {sorted(DATA_RATES.values())})")
+
+
+class RegisterMap:
+    """Shadow copy of the ADS1292R registers, written and read in bursts.
+
+    RREG and WREG auto-increment the address, so a run of registers costs
+    one transfer.  write() sends one WREG burst over the span of the
+    registers it is given (those in between are rewritten with their
+    shadow values, read first if not known yet), reads the span back with
+    one RREG burst, and only writes again if a register did not take.  All
+    of it is one transaction: one hold of lock, and in continuous mode one
+    SDATAC/RDATAC pair around it, since the chip ignores register commands
+    in RDATAC.  No sleeps are needed between commands: the 4 tCLK the chip
+    asks for are shorter than a Python call.
+
+    Everything read or written lands in the shadow, so status pages and
+    recording headers read snapshot() without any SPI traffic; refresh()
+    rereads the whole map in one burst.  The frame read path should hold
+    lock around its SPI reads, so a transaction never splits a frame.
+    """
+
+    def __init__(self, spi, continuous=True, lock=None):
+        self.spi = spi
+        self.continuous = continuous  # chip in RDATAC mode
+        self.lock = lock if lock is not None else threading.Lock()
+        self.shadow = bytearray(len(REGISTERS))
+        self._known = [False] * len(REGISTERS)
+        self.transactions = 0
+        self.retries = 0
+        self.failures = 0
+        self.refreshed_at = None
+
+    @staticmethod
+    def address(register):
+        if isinstance(register, str):
+            if register.upper() not in REGISTERS:
+                raise ValueError(f"Unknown register {register!r} (expected one of {REGISTERS})")
+            return REGISTERS.index(register.upper())
+        return register
+
+    def __getitem__(self, register):
+        return self.shadow[self.address(register)]
+
+    def set_continuous(self, enabled):
+        """Send RDATAC (frames clocked out on every DRDY) or SDATAC."""
+        with self.lock:
+            self.spi.xfer2([RDATAC if enabled else SDATAC])
+            self.continuous = enabled
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            if self.continuous:
+                self.spi.xfer2([SDATAC])
+            try:
+                self.transactions += 1
+                yield
+            finally:
+                if self.continuous:
+                    self.spi.xfer2([RDATAC])
+
+    def _read(self, first, count):
+        values = self.spi.xfer2([RREG | first, count - 1] + [0x00] * count)[2:2 + count]
+        self.shadow[first:first + count] = bytes(values)
+        self._known[first:first + count] = [True] * count
+        return values
+
+    def _write(self, first, values):
+        self.spi.xfer2([WREG | first, len(values) - 1] + list(values))
+
+    def refresh(self):
+        """Read all registers into the shadow. Returns snapshot()."""
+        with self.transaction():
+            self._read(0, len(REGISTERS))
+        self.refreshed_at = time.time()
+        return self.snapshot()
+
+    def write(self, values, retries=2):
+        """Write {register (address or name): value} in one transaction. Returns the addresses that did not verify."""
+        values = {self.address(register): value & 0xFF for register, value in values.items()}
+        if not values:
+            return []
+        first, last = min(values), max(values)
+        count = last - first + 1
+        failed = []
+        with self.transaction():
+            if not all(self._known[first:last + 1]):
+                self._read(first, count)
+            burst = bytearray(self.shadow[first:last + 1])
+            for address, value in values.items():
+                burst[address - first] = value
+            for attempt in range(retries + 1):
+                if attempt:
+                    self.retries += 1
+                self._write(first, burst)
+                read_back = self._read(first, count)
+                failed = [address for address, value in values.items()
+                          if (read_back[address - first] ^ value) & WRITABLE.get(address, 0xFF)]
+                if not failed:
+                    break
+        if failed:
+            self.failures += 1
+        return failed
+
+    def snapshot(self):
+        """Shadow values of the registers read or written so far, by name."""
+        return {name: self.shadow[address] for address, name in enumerate(REGISTERS) if self._known[address]}
+
+    def stats(self):
+        return {
+            'transactions': self.transactions,
+            'retries': self.retries,
+            'failures': self.failures,
+            'refreshed_at': self.refreshed_at
+        }
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class RingBuffer:
+    """Fixed-capacity sample buffer backed by a preallocated NumPy array.
+
+    append() and extend() write in place, so nothing is reallocated or shifted
+    as samples arrive.  Every sample gets a monotonic index (0 for the first
+    sample ever written); `total` is the index the next sample will get.
+
+    latest() returns a view whenever the requested samples are contiguous in
+    memory and only copies when they wrap around the end of the array.
+    Callers that keep the result beyond the next write must copy it.
+    """
+
+    def __init__(self, capacity, channels=None, dtype=np.float64):
+        shape = (capacity,) if channels is None else (capacity, channels)
+        self._data = np.zeros(shape, dtype=dtype)
+        self.capacity = capacity
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    @property
+    def oldest(self):
+        """Index of the oldest sample still held."""
+        return self.total - len(self)
+
+    def clear(self):
+        self.total = 0
+
+    def append(self, value):
+        self._data[self.total % self.capacity] = value
+        self.total += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        n = len(values)
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the tail can survive; keep the indices consistent
+            self.total += n - self.capacity
+            values = values[-self.capacity:]
+            n = self.capacity
+        start = self.total % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = values[:first]
+        if first < n:
+            self._data[:n - first] = values[first:]
+        self.total += n
+
+    def latest(self, n=None):
+        """The last n samples (all held samples if n is None), oldest first."""
+        size = len(self)
+        n = size if n is None else min(n, size)
+        if n <= 0:
+            return self._data[:0]
+        end = self.total % self.capacity or self.capacity
+        start = end - n
+        if start >= 0:
+            return self._data[start:end]
+        return np.concatenate((self._data[start:], self._data[:end]))
+
+    def since(self, index):
+        """Samples with index >= `index`, as (first_index, samples).
+
+        If `index` is older than the oldest held sample, the returned block
+        starts at `oldest` instead; callers can compare first_index with what
+        they asked for to detect the gap.
+        """
+        first = min(max(index, self.oldest), self.total)
+        return first, self.latest(self.total - first)
@@ -0,0 +1,350 @@
+"""Simulated ADS1292R wired to a simulated Raspberry Pi GPIO header.
+
+backend() returns objects that stand in for the `spidev` module and
+`RPi.GPIO`, so the apps run unchanged on any Linux box.  The simulated
+chip implements the register map (ID 0x73, RREG/WREG with auto-increment),
+the SDATAC/RDATAC/RDATA/START/STOP/RESET commands, and a DRDY clock running
+at the rate selected in CONFIG1.  Frames come from a synthetic PQRST
+generator or from a replayed recording.
+"""
+
+import os
+import threading
+import time
+import types
+
+import numpy as np
+
+from ecg_core.frames import encode_frames
+from ecg_core.registers import DATA_RATES
+
+DEVICE_ID = 0x73
+REGISTER_COUNT = 12  # 0x00 ID .. 0x0B GPIO
+RESET_VALUES = [DEVICE_ID, 0x02, 0x80, 0x10, 0x00, 0x00, 0x00, 0x00, 0x00, 0x02, 0x07, 0x0C]
+READ_ONLY = {0x00, 0x08}  # ID, LOFF_STAT
+CHANNEL_GAINS = {0: 6, 1: 1, 2: 2, 3: 3, 4: 4, 5: 8, 6: 12}
+
+# Default wiring: v1 pins from Data.txt, then the v2/v3 pins
+DEFAULT_WIRING = {
+    'drdy': (17, 24),
+    'start': (22, 25),
+    'reset': (27, 23)
+}
+
+CHUNK = 256  # frames synthesised per vectorised batch
+
+
+class SyntheticECG:
+    """Sum-of-Gaussians PQRST waveform with optional noise and mains hum.
+
+    Channel 1 carries the ECG, channel 2 the same beat at half amplitude.
+    """
+
+    # (offset in beat fraction, width in beat fraction, amplitude in mV)
+    WAVES = ((0.12, 0.025, 0.12), (0.24, 0.008, -0.10), (0.27, 0.010, 1.0),
+             (0.30, 0.008, -0.20), (0.55, 0.040, 0.30))
+
+    def __init__(self, heart_rate=72.0, noise_mv=0.01, mains_mv=0.0, mains_hz=50.0, seed=0):
+        self.heart_rate = heart_rate
+        self.noise_mv = noise_mv
+        self.mains_mv = mains_mv
+        self.mains_hz = mains_hz
+        self._rng = np.random.default_rng(seed)
+
+    def generate(self, start, n, sample_rate):
+        t = (start + np.arange(n)) / sample_rate
+        phase = (t * self.heart_rate / 60.0) % 1.0
+        ecg = np.zeros(n)
+        for offset, width, amplitude in self.WAVES:
+            ecg += amplitude * np.exp(-0.5 * ((phase - offset) / width) ** 2)
+        if self.mains_mv:
+            ecg += self.mains_mv * np.sin(2 * np.pi * self.mains_hz * t)
+        if self.noise_mv:
+            ecg += self._rng.normal(scale=self.noise_mv, size=n)
+        return np.column_stack((ecg, 0.5 * ecg)) / 1000.0  # volts
+
+
+class ReplaySource:
+    """Loops over a recording (.npy, or text/CSV with one or two columns in mV).
+
+    The recording is assumed to have been made at the configured sample rate.
+    """
+
+    def __init__(self, path):
+        if path.endswith('.npy'):
+            data = np.load(path)
+        else:
+            data = np.loadtxt(path, delimiter=',' if path.endswith('.csv') else None, ndmin=2)
+        data = np.asarray(data, dtype=np.float64).reshape(len(data), -1)
+        if data.shape[1] == 1:
+            data = np.column_stack((data[:, 0], data[:, 0]))
+        self.data = data[:, :2] / 1000.0
+
+    def generate(self, start, n, sample_rate):
+        idx = (start + np.arange(n)) % len(self.data)
+        return self.data[idx]
+
+
+class SimulatedADS1292R:
+    """Register map, command decoder and conversion clock of an ADS1292R."""
+
+    def __init__(self, source=None, speed=1.0):
+        self.source = source or SyntheticECG()
+        self.speed = speed
+        self.lead_off = 0  # LOFF_STAT bits reported in the status word
+        self.drdy = 1
+        self.listeners = []  # called with the new DRDY level on every change
+        self._lock = threading.Lock()
+        self._clock = None
+        self._converting = False
+        self.reset()
+
+    # -- state -------------------------------------------------------------
+
+    def reset(self):
+        with self._lock:
+            self.registers = list(RESET_VALUES)
+            self.continuous = True  # RDATAC is the power-up mode
+            self.sample_index = 0
+            self._frames = []
+            self._chunk_start = 0
+            self._current = [0] * 9
+
+    @property
+    def sample_rate(self):
+        return DATA_RATES.get(self.registers[0x01] & 0x07, 8000)
+
+    @property
+    def vref(self):
+        return 4.033 if self.registers[0x02] & 0x10 else 2.42
+
+    def channel_gains(self):
+        return [CHANNEL_GAINS.get((self.registers[reg] >> 4) & 0x07, 6) for reg in (0x04, 0x05)]
+
+    # -- conversions -------------------------------------------------------
+
+    def _synthesise(self):
+        n = CHUNK
+        volts = self.source.generate(self.sample_index, n, self.sample_rate)
+        gains = np.array(self.channel_gains(), dtype=np.float64)
+        counts = np.round(volts * gains * 0x7FFFFF / self.vref)
+        counts = np.clip(counts, -0x800000, 0x7FFFFF).astype(np.int64)
+        for ch, reg in enumerate((0x04, 0x05)):
+            if self.registers[reg] & 0x80:  # channel powered down
+                counts[:, ch] = 0
+        status = 0xC00000 | ((self.lead_off & 0x1F) << 15)
+        self._chunk_start = self.sample_index
+        self._frames = encode_frames(status, counts).tolist()
+
+    def convert(self):
+        """Complete one conversion: latch the next frame and pull DRDY low."""
+        with self._lock:
+            offset = self.sample_index - self._chunk_start
+            if offset >= len(self._frames) or offset < 0:
+                self._synthesise()
+                offset = 0
+            self._current = self._frames[offset]
+            self.sample_index += 1
+        self._set_drdy(1)
+        self._set_drdy(0)
+
+    def _set_drdy(self, level):
+        if level != self.drdy:
+            self.drdy = level
+            for listener in self.listeners:
+                listener(level)
+
+    def start_conversions(self):
+        if self._converting:
+            return
+        self._converting = True
+        self._clock = threading.Thread(target=self._run_clock, name='ads1292r-sim-drdy', daemon=True)
+        self._clock.start()
+
+    def stop_conversions(self):
+        self._converting = False
+
+    def _run_clock(self):
+        next_tick = time.perf_counter()
+        while self._converting:
+            period = 1.0 / (self.sample_rate * self.speed)
+            next_tick += period
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -100 * period:
+                next_tick = time.perf_counter()  # fell far behind, resync
+            self.convert()
+
+    # -- SPI ---------------------------------------------------------------
+
+    def transfer(self, data):
+        """Handle one chip-select framed SPI transfer."""
+        if not data:
+            return []
+        op = data[0]
+        out = [0] * len(data)
+
+        if op == 0x00 and self.continuous:
+            # RDATAC: the frame is clocked out directly
+            frame = self._current
+            out[:min(9, len(out))] = frame[:len(out)]
+            self._set_drdy(1)
+        elif op == 0x12:  # RDATA
+            frame = self._current
+            out[1:1 + min(9, len(out) - 1)] = frame[:len(out) - 1]
+            self._set_drdy(1)
+        elif op & 0xE0 == 0x20 and len(data) >= 2:  # RREG
+            addr = op & 0x1F
+            count = min((data[1] & 0x1F) + 1, len(data) - 2)
+            for i in range(count):
+                reg = addr + i
+                out[2 + i] = self.registers[reg] if reg < REGISTER_COUNT else 0x00
+        elif op & 0xE0 == 0x40 and len(data) >= 2:  # WREG
+            addr = op & 0x1F
+            count = min((data[1] & 0x1F) + 1, len(data) - 2)
+            with self._lock:
+                for i in range(count):
+                    reg = addr + i
+                    if reg < REGISTER_COUNT and reg not in READ_ONLY:
+                        self.registers[reg] = data[2 + i] & 0xFF
+                # Conversions already synthesised used the old gain/rate
+                self._frames = []
+        elif op == 0x10:
+            self.continuous = True
+        elif op == 0x11:
+            self.continuous = False
+        elif op == 0x08:
+            self.start_conversions()
+        elif op == 0x0A:
+            self.stop_conversions()
+        elif op == 0x06:
+            self.stop_conversions()
+            self.reset()
+        return out
+
+
+class SimulatedSpiDev:
+    """Drop-in for spidev.SpiDev talking to a SimulatedADS1292R."""
+
+    def __init__(self, chip):
+        self.chip = chip
+        self.max_speed_hz = 0
+        self.mode = 0
+        self.bits_per_word = 8
+        self.no_cs = False
+        self.is_open = False
+
+    def open(self, bus, device):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def xfer2(self, data):
+        if not self.is_open:
+            raise OSError("SPI device not open")
+        return self.chip.transfer(list(data))
+
+    xfer = xfer2
+
+    def writebytes(self, data):
+        self.xfer2(data)
+
+    def readbytes(self, n):
+        return self.xfer2([0x00] * n)
+
+
+class SimulatedGPIO:
+    """The subset of RPi.GPIO used by the apps, wired to a SimulatedADS1292R."""
+
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    HIGH = 1
+    LOW = 0
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+
+    def __init__(self, chip, wiring=None):
+        self.chip = chip
+        self.wiring = wiring or DEFAULT_WIRING
+        self.levels = {}
+        self.modes = {}
+        self._callbacks = {}
+        self._edge = threading.Condition()
+        chip.listeners.append(self._on_drdy)
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        self.modes[pin] = direction
+        if initial is not None:
+            self.output(pin, initial)
+
+    def output(self, pin, value):
+        previous = self.levels.get(pin)
+        self.levels[pin] = 1 if value else 0
+        if pin in self.wiring['start']:
+            if value:
+                self.chip.start_conversions()
+            else:
+                self.chip.stop_conversions()
+        elif pin in self.wiring['reset'] and value and previous == 0:
+            self.chip.stop_conversions()
+            self.chip.reset()
+
+    def input(self, pin):
+        if pin in self.wiring['drdy']:
+            return self.chip.drdy
+        return self.levels.get(pin, 0)
+
+    def _on_drdy(self, level):
+        if level:
+            return
+        for pin, callback in list(self._callbacks.items()):
+            callback(pin)
+        with self._edge:
+            self._edge.notify_all()
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        if pin in self.wiring['drdy'] and callback is not None:
+            self._callbacks[pin] = callback
+
+    def remove_event_detect(self, pin):
+        self._callbacks.pop(pin, None)
+
+    def wait_for_edge(self, pin, edge, timeout=None):
+        with self._edge:
+            ok = self._edge.wait(None if timeout is None else timeout / 1000.0)
+        return pin if ok else None
+
+    def cleanup(self, pins=None):
+        self.chip.stop_conversions()
+        self._callbacks.clear()
+
+
+_backend = None
+
+
+def backend():
+    """Shared (spidev, GPIO) pair, configured from the ECG_SIM_* environment."""
+    global _backend
+    if _backend is None:
+        replay = os.environ.get('ECG_SIM_REPLAY')
+        source = ReplaySource(replay) if replay else SyntheticECG(
+            heart_rate=float(os.environ.get('ECG_SIM_HEART_RATE', 72))
+        )
+        chip = SimulatedADS1292R(source, speed=float(os.environ.get('ECG_SIM_SPEED', 1.0)))
+        spidev = types.SimpleNamespace(SpiDev=lambda: SimulatedSpiDev(chip))
+        _backend = (spidev, SimulatedGPIO(chip))
+    return _backend
@@ -0,0 +1,76 @@
+import importlib
+import logging
+import os
+import threading
+import time
+
+
+def process_age():
+    """Seconds since this process was started (from /proc), or None where /proc is missing."""
+    try:
+        with open('/proc/self/stat', 'rb') as f:
+            stat = f.read()
+        with open('/proc/uptime', 'rb') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError):
+        return None
+    # Fields follow the parenthesised command name from field 3 on; starttime (22) is in ticks since boot
+    start_ticks = int(stat[stat.rindex(b')') + 2:].split()[19])
+    return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+
+
+class StartupTimer:
+    """Milestones of a service start, in seconds since the process started.
+
+    The origin is the process start time from /proc, so interpreter start-up
+    and the imports that ran before the timer was made are counted (with the
+    10 ms resolution of the kernel clock ticks); without /proc it is the
+    creation of the timer.  mark() keeps the first time of each milestone,
+    so the acquisition path can call it on every block to catch the first
+    sample.
+    """
+
+    def __init__(self):
+        age = process_age()
+        self.origin = time.monotonic() - (age or 0.0)
+        self.marks = {}
+
+    def elapsed(self):
+        return time.monotonic() - self.origin
+
+    def mark(self, name):
+        """Record milestone name now, unless it already was. Returns its time."""
+        elapsed = self.marks.get(name)
+        if elapsed is None:
+            elapsed = self.marks[name] = self.elapsed()
+            logging.info(f"Startup: {name} after {elapsed:.3f} s")
+        return elapsed
+
+    def stats(self):
+        return {
+            'uptime_s': self.elapsed(),
+            'time_to_first_sample_s': self.marks.get('first_sample'),
+            'marks': dict(self.marks)
+        }
+
+
+def preload(modules, timer=None):
+    """Import modules one after another on a background thread, and return the thread.
+
+    Each import done is marked on timer as 'import <module>'.  A failed
+    import is only logged: the code that needs the module imports it
+    itself and reports the error there.
+    """
+    def run():
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                logging.warning(f"Preloading {module} failed: {str(e)}")
+                continue
+            if timer is not None:
+                timer.mark(f'import {module}')
+
+    thread = threading.Thread(target=run, name='ecg-preload', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,173 @@
+import logging
+import struct
+import threading
+import time
+
+import numpy as np
+
+# seq (uint32), first sample index (float64, exact to 2**53), sample rate
+# (float32), samples per channel (uint16), channels (uint16); little-endian.
+# 20 bytes, so the float32 payload that follows stays 4-byte aligned.
+FRAME_HEADER = struct.Struct('<IdfHH')
+MAX_FRAME_SAMPLES = 0xFFFF
+
+
+def pack_frame(seq, first_index, sample_rate, values):
+    """Pack a (channels, n) block into a binary stream frame.
+
+    Samples are float32, channel-major, so a browser can view each channel
+    as a Float32Array without copying.
+    """
+    values = np.asarray(values, dtype='<f4')
+    if values.ndim == 1:
+        values = values[np.newaxis]
+    channels, n = values.shape
+    header = FRAME_HEADER.pack(seq & 0xFFFFFFFF, float(first_index), sample_rate, n, channels)
+    return header + np.ascontiguousarray(values).tobytes()
+
+
+def unpack_frame(data):
+    """Inverse of pack_frame: returns (seq, first_index, sample_rate, values)."""
+    seq, first_index, sample_rate, n, channels = FRAME_HEADER.unpack_from(data)
+    values = np.frombuffer(data, dtype='<f4', count=n * channels, offset=FRAME_HEADER.size)
+    return seq, int(first_index), sample_rate, values.reshape(channels, n)
+
+
+def decimate_frame(frame, factor):
+    """Keep the samples of a stream frame whose index is a multiple of factor.
+
+    first_index and the sample rate in the header are divided by factor, so
+    frames decimated one after another stay contiguous for the client's gap
+    detection; the sequence number is kept.
+    """
+    if factor == 1:
+        return frame
+    seq, first_index, sample_rate, values = unpack_frame(frame)
+    offset = -first_index % factor
+    return pack_frame(seq, (first_index + offset) // factor, sample_rate / factor, values[:, offset::factor])
+
+
+def read_since(buffers, cursor, limit=MAX_FRAME_SAMPLES, dtype=np.float32):
+    """Copy samples with index >= cursor out of ring buffers filled in step.
+
+    Returns (first, values): values is a (len(buffers), n) copy, and first
+    is the index of its first sample.  first > cursor means samples were
+    overwritten before they were read.  Only indices every buffer has
+    reached are returned, so buffers written one after another stay aligned.
+    A cursor ahead of the buffers (left over from before a restart) reads
+    from the oldest held sample.
+    """
+    end = min(buffer.total for buffer in buffers)
+    if cursor > end:
+        cursor = 0
+    first = max([cursor] + [buffer.oldest for buffer in buffers])
+    end = min(end, first + limit)
+    values = np.empty((len(buffers), end - first), dtype=dtype)
+    for row, buffer in zip(values, buffers):
+        _, samples = buffer.since(first)
+        row[:] = samples[:end - first] if samples.ndim == 1 else samples[:end - first, 0]
+    return first, values
+
+
+class FrameStreamer:
+    """Sends the samples added to a set of ring buffers as binary frames.
+
+    A background thread wakes frame_rate times per second, packs whatever
+    arrived since the previous frame (one channel per buffer) and passes it
+    to emit(event, frame).  Message rate and per-message overhead therefore
+    stay fixed whatever the sample rate; only the payload grows with it.
+
+    Clients detect gaps (samples that fell out of the ring buffers before
+    they could be sent) by comparing first_index with the end of the
+    previous frame, and lost frames by the sequence number.
+    """
+
+    def __init__(self, emit, buffers, sample_rate, event='ecg_frame', frame_rate=25.0, latency=None):
+        self.emit = emit
+        self.buffers = list(buffers)
+        self.sample_rate = sample_rate
+        self.event = event
+        self.frame_rate = frame_rate
+        self.running = False
+        # Encode times go to a LatencyTracker's 'serialize' stage when given
+        self._serialize = latency.histogram('serialize') if latency is not None else None
+        self._thread = None
+        self.reset()
+
+    def reset(self):
+        """Start streaming from the current end of the buffers."""
+        self.seq = 0
+        self.cursor = min(buffer.total for buffer in self.buffers)
+        self.frames = 0
+        self.samples = 0
+        self.bytes = 0
+        self.gaps = 0
+        self.encode_time = 0.0
+
+    def encode(self):
+        """Pack the samples added since the last frame, or None if there are none."""
+        first, values = read_since(self.buffers, self.cursor)
+        if values.shape[1] == 0:
+            return None
+        if first > self.cursor:
+            self.gaps += first - self.cursor
+        end = first + values.shape[1]
+
+        frame = pack_frame(self.seq, first, self.sample_rate, values)
+        self.seq += 1
+        self.cursor = end
+        self.frames += 1
+        self.samples += end - first
+        self.bytes += len(frame)
+        return frame
+
+    def poll(self):
+        """Emit a frame if new samples are available. Returns the frame sent."""
+        started = time.monotonic_ns()
+        frame = self.encode()
+        encode_ns = time.monotonic_ns() - started
+        self.encode_time += encode_ns / 1e9
+        if frame is not None:
+            if self._serialize is not None:
+                self._serialize.record(encode_ns)
+            self.emit(self.event, frame)
+        return frame
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.reset()
+        self._thread = threading.Thread(target=self._run, name='ecg-stream', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        period = 1.0 / self.frame_rate
+        deadline = time.monotonic()
+        while self.running:
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()  # an emit ran long, don't try to catch up
+            try:
+                self.poll()
+            except Exception as e:
+                logging.error(f"Stream frame failed: {str(e)}")
+
+    def stats(self):
+        return {
+            'frame_rate': self.frame_rate,
+            'frames': self.frames,
+            'samples': self.samples,
+            'bytes': self.bytes,
+            'gaps': self.gaps,
+            'encode_ms_mean': 1000.0 * self.encode_time / self.frames if self.frames else 0.0
+        }
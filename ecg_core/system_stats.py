@@ -0,0 +1,141 @@
+import gc
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+THERMAL_ZONE = '/sys/class/thermal/thermal_zone0/temp'
+
+
+class SystemStatsSampler:
+    """Host and process resource usage, sampled on a background thread.
+
+    Every period seconds the thread reads CPU and memory usage, the SoC
+    temperature, and for this process its CPU share, RSS, thread count and
+    garbage collector counters, plus the CPU share of each watched thread
+    (threads maps a name to a callable returning the thread's native id,
+    e.g. DrdyAcquisition.thread_id, or None while it is not running).
+
+    The result is published as a new dict, so snapshot() is a plain
+    attribute read: request handlers and the acquisition path never make a
+    system call for it.  The last history_size samples are kept for charts.
+    """
+
+    def __init__(self, period=1.0, history_size=300, threads=None, thermal_zone=THERMAL_ZONE):
+        import psutil
+        self._psutil = psutil
+        self.period = period
+        self.threads = dict(threads or {})
+        self.thermal_zone = thermal_zone
+        self.running = False
+        self._thread = None
+        self._wake = threading.Event()
+        self._history = deque(maxlen=history_size)
+        self._history_lock = threading.Lock()
+        self._process = psutil.Process()
+        self._thermal = None
+        self._thread_times = {}
+        self._last_sample = None
+        self.started = time.time()
+        self.errors = 0
+        self.latest = None
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._wake.clear()
+        self.sample()  # primes the CPU counters and gives readers a first snapshot
+        self._thread = threading.Thread(target=self._run, name='ecg-system-stats', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+        if self._thermal is not None:
+            self._thermal.close()
+            self._thermal = None
+
+    def _run(self):
+        while not self._wake.wait(self.period):
+            try:
+                self.sample()
+            except Exception as e:
+                self.errors += 1
+                logging.error(f"System stats sample failed: {str(e)}")
+
+    def sample(self):
+        """Take one sample now, publish it and return it."""
+        psutil = self._psutil
+        now = time.monotonic()
+        memory = psutil.virtual_memory()
+        process = self._process
+        with process.oneshot():
+            rss = process.memory_info().rss
+            process_cpu = process.cpu_percent(None)
+            num_threads = process.num_threads()
+        snapshot = {
+            'time': time.time(),
+            'uptime_s': time.time() - self.started,
+            'cpu_percent': psutil.cpu_percent(None),
+            'memory_percent': memory.percent,
+            'memory_available_mb': memory.available / 2 ** 20,
+            'temperature_c': self._temperature(),
+            'process': {
+                'cpu_percent': process_cpu,
+                'rss_mb': rss / 2 ** 20,
+                'threads': num_threads,
+                'gc_pending': list(gc.get_count()),
+                'gc_collections': [generation['collections'] for generation in gc.get_stats()]
+            },
+            'threads': self._thread_cpu(now)
+        }
+        self._last_sample = now
+        self.latest = snapshot
+        with self._history_lock:
+            self._history.append(snapshot)
+        return snapshot
+
+    def _temperature(self):
+        # Kept open between samples: sysfs attributes are re-read from offset 0
+        try:
+            if self._thermal is None:
+                self._thermal = open(self.thermal_zone, 'rb', buffering=0)
+            self._thermal.seek(0)
+            return int(self._thermal.read()) / 1000.0
+        except (OSError, ValueError):
+            return None
+
+    def _thread_cpu(self, now):
+        if not self.threads:
+            return {}
+        times = {thread.id: thread.user_time + thread.system_time for thread in self._process.threads()}
+        elapsed = now - self._last_sample if self._last_sample is not None else None
+        usage = {}
+        for name, thread_id in self.threads.items():
+            native_id = thread_id()
+            used = times.get(native_id)
+            previous = self._thread_times.get(name)
+            self._thread_times[name] = (native_id, used)
+            if used is None or previous is None or previous[0] != native_id or not elapsed:
+                usage[name] = None  # not running, or no earlier sample of this thread yet
+            else:
+                usage[name] = 100.0 * (used - previous[1]) / elapsed
+        return usage
+
+    def snapshot(self):
+        """Latest sample (None before start), without touching the system."""
+        return self.latest
+
+    def history(self, seconds=None):
+        """Samples of the last seconds (all kept samples by default), oldest first."""
+        with self._history_lock:
+            samples = list(self._history)
+        if seconds is not None:
+            since = time.time() - seconds
+            samples = [sample for sample in samples if sample['time'] >= since]
+        return samples
@@ -0,0 +1,76 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from ecg_core.acquisition import DrdyAcquisition
+
+
+class FakeGPIO:
+    FALLING = 'falling'
+
+    def __init__(self):
+        self.callback = None
+
+    def add_event_detect(self, pin, edge, callback=None):
+        self.callback = callback
+
+    def remove_event_detect(self, pin):
+        self.callback = None
+
+    def edge(self, pin=17):
+        self.callback(pin)
+
+
+class TestDrdyAcquisition(unittest.TestCase):
+
+    def test_reads_one_frame_per_edge(self):
+        gpio = FakeGPIO()
+        read_frame = MagicMock(side_effect=range(1000))
+        acq = DrdyAcquisition(gpio, 17, read_frame, 500, timeout=0.5)
+        frames = []
+        indices = []
+
+        def handler(frame):
+            frames.append(frame)
+            indices.append(acq.sample_index)
+            self.assertEqual(acq.thread_id, threading.get_native_id())
+            if len(frames) == 3:
+                acq.stop()
+
+        worker = threading.Thread(target=acq.run, args=(handler,))
+        worker.start()
+        for _ in range(3):
+            while gpio.callback is None or acq._edge.is_set():
+                time.sleep(0.001)
+            gpio.edge()
+        worker.join(timeout=2)
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(frames, [0, 1, 2])
+        self.assertEqual(indices, [0, 1, 2])
+        self.assertEqual(acq.overruns, 0)
+        self.assertIsNone(gpio.callback)
+        self.assertIsNone(acq.thread_id)
+
+    def test_counts_overruns_and_missed_edges(self):
+        gpio = FakeGPIO()
+        acq = DrdyAcquisition(gpio, 17, MagicMock(), 500, timeout=0.01)
+        acq._arm()
+
+        self.assertFalse(acq.wait())
+        self.assertEqual(acq.missed_edges, 1)
+
+        # Three conversions completed while we were busy: two were lost
+        gpio.edge()
+        gpio.edge()
+        gpio.edge()
+        self.assertTrue(acq.wait())
+        self.assertEqual(acq.overruns, 2)
+        # The frame read is the third conversion, seen at the last edge
+        self.assertEqual(acq.sample_index, 2)
+        self.assertEqual(acq.sample_ns, acq.edge_ns)
+
+
+if __name__ == '__main__':
+    unittest.main()
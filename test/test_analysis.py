@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ecg_core.analysis import analyze_files, main, merge_peaks, segments
+from ecg_core.frames import lsb_size
+from ecg_core.recording import Recorder
+from ecg_core.simulator import SyntheticECG
+
+
+class TestAnalysis(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'test.ecg')
+        recorder = Recorder(self.path, 250, lsb_size(6, 2.42), queue_chunks=1000)
+        recorder.start()
+        values = SyntheticECG(heart_rate=75, noise_mv=0.02).generate(0, 250 * 120, 250)
+        recorder.write(np.full(len(values), 0xC00000, dtype=np.uint32), values)
+        recorder.stop()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_segments_cover_the_recording(self):
+        self.assertEqual(segments(1000, 100, 3), [(0, 300), (300, 600), (600, 900), (900, 1000)])
+
+    def test_merge_drops_seam_duplicates(self):
+        merged = merge_peaks([np.array([100, 300]), np.array([310, 500])], 250)
+        self.assertEqual(merged.tolist(), [100, 300, 500])
+
+    def test_segmented_analysis_matches_a_single_pass(self):
+        _, whole, peaks = next(analyze_files([self.path], jobs=1, segment_seconds=1000))
+        _, summary, parts = next(analyze_files([self.path], jobs=1, segment_seconds=7))
+
+        self.assertEqual((whole['segments'], summary['segments']), (1, 18))
+        np.testing.assert_array_equal(parts, peaks)
+        self.assertAlmostEqual(len(peaks), 150, delta=4)  # learning period, last beat
+        self.assertAlmostEqual(summary['heart_rate']['mean'], 75, delta=0.5)
+        self.assertEqual(summary['missing_frames'], 0)
+        self.assertIsNotNone(summary['hrv']['lf_ms2'])
+
+    def test_cli_writes_summaries_with_a_process_pool(self):
+        output = os.path.join(self.tmp.name, 'out')
+        main([self.tmp.name, '--jobs', '2', '--segment', '30', '--output-dir', output, '--peaks'])
+
+        with open(os.path.join(output, 'test.ecg.summary.json')) as f:
+            summary = json.load(f)
+        self.assertEqual((summary['frames'], summary['segments']), (250 * 120, 4))
+        self.assertEqual(len(np.load(os.path.join(output, 'test.ecg.peaks.npy'))), summary['beats'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+
+from ecg_core import bench
+from ecg_core.simulator import SyntheticECG
+
+
+class TestBench(unittest.TestCase):
+
+    def setUp(self):
+        values = SyntheticECG().generate(0, 500, 500)
+        self.ctx = bench.BenchContext(500, 10, values)
+
+    def test_core_cases_report_timings(self):
+        for name, setup in bench.CASES:
+            if name.startswith(('decode.', 'buffer.')):
+                result = bench.run_case(name, setup, self.ctx, repeat=1)
+                self.assertEqual(result['samples'], 500, name)
+                self.assertGreater(result['us_per_sample'], 0, name)
+                self.assertIn('alloc_peak_bytes', result)
+
+    def test_failing_setup_is_skipped(self):
+        def setup(ctx):
+            raise ImportError("no module named 'flask_cors'")
+        result = bench.run_case('broken', setup, self.ctx, repeat=1)
+        self.assertIn('ImportError', result['skipped'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from ecg_core.broadcast import DEGRADE, DISCONNECT, DROP, BroadcastHub
+from ecg_core.streaming import pack_frame, unpack_frame
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+class TestBroadcastHub(unittest.TestCase):
+
+    def setUp(self):
+        self.received = {}
+        self.release = threading.Event()
+        self.hub = BroadcastHub(self.send, queue_size=4)
+
+    def tearDown(self):
+        self.release.set()
+        self.hub.close()
+
+    def send(self, event, payload, client_id):
+        if client_id == 'slow':
+            self.release.wait()
+        self.received.setdefault(client_id, []).append((event, payload))
+
+    def frames(self, count, start=0, n=10):
+        for seq in range(start, start + count):
+            yield pack_frame(seq, seq * n, 500, np.arange(seq * n, (seq + 1) * n)[np.newaxis])
+
+    def stream(self, count):
+        # Paced like a real stream: the fast client keeps up, the slow one cannot
+        for seq, frame in enumerate(self.frames(count)):
+            self.hub.publish_frame('ecg_frame', frame)
+            self.assertTrue(wait_for(lambda: len(self.received.get('fast', ())) == seq + 1))
+
+    def test_every_client_gets_the_same_objects(self):
+        for client_id in 'abc':
+            self.hub.subscribe(client_id)
+        status = {'heart_rate': 60}
+        frames = list(self.frames(3))
+        for frame in frames:
+            self.hub.publish_frame('ecg_frame', frame)
+        self.hub.publish('system_status', status)
+
+        self.assertTrue(wait_for(lambda: all(len(self.received.get(c, ())) == 4 for c in 'abc')))
+        for client_id in 'abc':
+            payloads = [payload for _, payload in self.received[client_id]]
+            self.assertTrue(all(a is b for a, b in zip(payloads, frames + [status])))
+        self.assertEqual(self.hub.stats()['encodes'], 0)
+
+    def test_slow_client_only_delays_itself(self):
+        self.hub.policy = DEGRADE
+        self.hub.DEGRADE_HOLD = 0.0
+        self.hub.subscribe('fast')
+        self.hub.subscribe('slow')
+
+        self.stream(40)
+
+        stats = self.hub.stats()['per_client']
+        self.assertEqual(stats['fast']['dropped'], 0)
+        self.assertLessEqual(stats['slow']['depth'], 4)
+        self.assertGreater(stats['slow']['dropped'], 0)
+        self.assertEqual(stats['slow']['level'], self.hub.max_level)
+
+        # Once released, the laggard gets the newest frames decimated by 8,
+        # still contiguous in decimated sample indices
+        self.release.set()
+        self.assertTrue(wait_for(lambda: len(self.received.get('slow', ())) == 5))
+        decoded = [unpack_frame(payload) for _, payload in self.received['slow'][1:]]
+        self.assertEqual([rate for _, _, rate, _ in decoded], [62.5] * 4)
+        for (_, first, _, values), (_, following, _, _) in zip(decoded, decoded[1:]):
+            self.assertEqual(first + values.shape[1], following)
+        np.testing.assert_array_equal(decoded[0][3][0], 8 * (decoded[0][1] + np.arange(decoded[0][3].shape[1])))
+
+    def test_disconnect_policy(self):
+        disconnected = []
+        self.hub.policy = DISCONNECT
+        self.hub.disconnect = disconnected.append
+        self.hub.subscribe('fast')
+        self.hub.subscribe('slow')
+        self.stream(10)
+
+        self.assertEqual(disconnected, ['slow'])
+        self.assertEqual(len(self.hub), 1)
+        self.assertEqual(self.hub.stats()['disconnected'], 1)
+
+    def test_concurrent_publishers_account_for_every_message(self):
+        self.hub.policy = DROP
+        self.hub.subscribe('slow')
+        status = {'heart_rate': 60}
+
+        # Stream frames and status messages from two threads, as the apps do
+        def publish_frames():
+            for frame in self.frames(2000):
+                self.hub.publish_frame('ecg_frame', frame)
+        streamer = threading.Thread(target=publish_frames)
+        streamer.start()
+        for _ in range(2000):
+            self.hub.publish('system_status', status)
+        streamer.join()
+
+        queue = self.hub._clients['slow'].stage.queue
+        self.assertEqual(self.hub.stats()['published'], 4000)
+        self.assertEqual(queue.puts, 4000)
+        # Every put is either still queued, dropped, or taken by the (blocked) sender
+        self.assertEqual(len(queue) + queue.dropped + queue.gets, 4000)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            BroadcastHub(self.send, policy='ignore')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from ecg_core.clock import SampleClock
+
+
+def edges(sample_rate, seconds, block=10, drift_ppm=0.0, delay_us=30.0, late=0.0, seed=0):
+    """(index, time) pairs of each block's last frame, seen after a random callback delay."""
+    rng = np.random.default_rng(seed)
+    index = np.arange(block - 1, int(seconds * sample_rate), block)
+    period = 1e9 / sample_rate / (1.0 + drift_ppm * 1e-6)
+    delay = rng.exponential(delay_us * 1e3, len(index))
+    stalled = rng.random(len(index)) < late
+    delay[stalled] += rng.uniform(1e6, 20e6, stalled.sum())  # 1-20 ms behind
+    true = 10 ** 15 + index * period
+    return index, (true + delay).astype(np.int64), true, period
+
+
+class TestSampleClock(unittest.TestCase):
+
+    def run_clock(self, clock, index, seen):
+        for i, t in zip(index.tolist(), seen.tolist()):
+            clock.observe(i, t)
+        return clock
+
+    def test_measures_drift_despite_late_reads(self):
+        index, seen, true, period = edges(500, 120, drift_ppm=50.0, late=0.02)
+        clock = self.run_clock(SampleClock(500), index, seen)
+
+        self.assertAlmostEqual(clock.drift_ppm, 50.0, delta=0.5)
+        self.assertAlmostEqual(clock.period_ns, period, delta=0.5)
+        self.assertGreater(clock.late, 0)
+        self.assertLess(clock.jitter_ns, 40e3)  # the stalls are not in the jitter
+        # Times come out within a few us of the conversions, not of the callbacks
+        first = int(index[-1]) - 99
+        expected = 10 ** 15 + np.arange(first, first + 100) * period
+        np.testing.assert_allclose(clock.times(first, 100), expected, atol=5e3)
+        self.assertEqual(clock.time_ns(first), clock.times(first, 1)[0])
+
+    def test_nominal_period_before_first_fit(self):
+        clock = SampleClock(250)
+        self.assertFalse(clock.observe(9, 10 ** 12))
+        np.testing.assert_array_equal(clock.times(9, 3), 10 ** 12 + np.array([0, 4, 8]) * 10 ** 6)
+        self.assertEqual(clock.stats()['fits'], 0)
+
+    def test_wall_times_use_offset_at_fit(self):
+        index, seen, _, _ = edges(500, 3)
+        with mock.patch('ecg_core.clock.time.time_ns', lambda: 5 * 10 ** 18), \
+                mock.patch('ecg_core.clock.time.monotonic_ns', lambda: 10 ** 18):
+            clock = self.run_clock(SampleClock(500), index, seen)
+        self.assertGreater(clock.fits, 0)
+        np.testing.assert_array_equal(clock.wall_times(100, 5), clock.times(100, 5) + 4 * 10 ** 18)
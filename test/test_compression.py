@@ -0,0 +1,38 @@
+import unittest
+
+import numpy as np
+
+from ecg_core.compression import BZ2, CHUNK_HEADER, LZMA, NONE, ZLIB, compress_chunk, decompress_chunk
+
+
+class TestChunkCompression(unittest.TestCase):
+
+    def check_round_trip(self, status, counts, codec=ZLIB):
+        data = compress_chunk(status, counts, codec)
+        decoded_status, decoded_counts = decompress_chunk(b'xx' + data, offset=2)
+        np.testing.assert_array_equal(decoded_status, status)
+        np.testing.assert_array_equal(decoded_counts, counts)
+        return data
+
+    def test_round_trip_every_codec(self):
+        t = np.arange(4096) / 500
+        counts = np.column_stack((2e5 * np.sin(2 * np.pi * 1.2 * t), -3e4 * np.sin(2 * np.pi * 0.3 * t)))
+        counts = counts.astype(int) + np.random.default_rng(0).integers(-50, 50, size=(4096, 2))
+        status = np.full(4096, 0xC00000, dtype=np.uint32)
+        sizes = {codec: len(self.check_round_trip(status, counts, codec)) for codec in (NONE, ZLIB, BZ2, LZMA)}
+        self.assertEqual(sizes[NONE], CHUNK_HEADER.size + 4096 * 12)
+        self.assertLess(sizes[ZLIB], sizes[NONE] / 3)
+        # Smooth channels get a differencing predictor, the constant status word too
+        self.assertTrue(all(order >= 1 for order in CHUNK_HEADER.unpack_from(compress_chunk(status, counts))[3:]))
+
+    def test_extreme_and_tiny_chunks(self):
+        rng = np.random.default_rng(1)
+        counts = rng.choice([-0x800000, 0x7FFFFF], size=(300, 2))
+        status = rng.integers(0, 1 << 24, size=300).astype(np.uint32)
+        self.check_round_trip(status, counts)
+        self.check_round_trip(status[:1], counts[:1])
+        self.check_round_trip(status[:0], counts[:0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from ecg_core.decimation import PolyphaseDecimator, design_decimator
+
+RATE = 8000
+
+
+class TestPolyphaseDecimator(unittest.TestCase):
+
+    def test_matches_filtering_then_dropping(self):
+        x = np.random.default_rng(0).normal(size=(4000, 2))
+        decimator = PolyphaseDecimator(16, channels=2)
+        # Odd block sizes, so outputs fall at every offset within a block
+        y = np.concatenate([decimator.process(x[start:start + 37]) for start in range(0, len(x), 37)])
+
+        expected = np.stack([np.convolve(x[:, ch], decimator.taps)[:len(x)][::16] for ch in range(2)], axis=1)
+        np.testing.assert_allclose(y, expected, atol=1e-12)
+        self.assertEqual(decimator.total, 4000)
+
+    def test_positions_follow_the_stream(self):
+        decimator = PolyphaseDecimator(4)
+        self.assertEqual(decimator.positions(10).tolist(), [0, 4, 8])
+        self.assertEqual(len(decimator.process(np.zeros(10))), 3)
+        # Sample 12 of the stream is the next output: offset 2 of this block
+        self.assertEqual(decimator.positions(10).tolist(), [2, 6])
+
+    def test_passband_and_alias_rejection(self):
+        t = np.arange(2 * RATE) / RATE
+        decimator = PolyphaseDecimator(16)  # to 500 SPS
+
+        # 10 Hz comes through at unity gain, once the filter has filled
+        y = decimator.process(np.sin(2 * np.pi * 10 * t))[100:]
+        self.assertAlmostEqual(np.abs(y).max(), 1.0, delta=0.01)
+
+        # 480 Hz would alias to 20 Hz
+        decimator.reset()
+        y = decimator.process(np.sin(2 * np.pi * 480 * t))[100:]
+        self.assertLess(np.abs(y).max(), 1e-3)
+
+    def test_factor_one_passes_through(self):
+        decimator = PolyphaseDecimator(1)
+        x = np.arange(5.0)
+        np.testing.assert_array_equal(decimator.process(x), x)
+        self.assertEqual(decimator.delay, 0)
+        self.assertEqual(len(design_decimator(8)), 128)
+        with self.assertRaises(ValueError):
+            PolyphaseDecimator(2.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from scipy.signal import butter, iirnotch, lfilter, sosfilt
+
+from ecg_core.filters import SosFilterChain, StreamingFIR, design_sos, load_fir_coefficients, sosfilt_python
+
+
+class TestStreamingFIR(unittest.TestCase):
+
+    def test_matches_per_sample_convolution(self):
+        rng = np.random.default_rng(0)
+        coeffs = rng.normal(size=18)
+        x = rng.normal(size=(400, 2))
+
+        fir = StreamingFIR(coeffs, channels=2)
+        out = np.concatenate([fir.process(x[i:i + 7]) for i in range(0, len(x), 7)])
+
+        # Previous v1 behaviour: convolve the last 161 raw samples, keep the last output
+        for n in range(len(coeffs), len(x)):
+            for ch in range(2):
+                window = x[max(0, n - 160):n + 1, ch]
+                expected = np.convolve(window, coeffs, mode='valid')[-1]
+                self.assertAlmostEqual(out[n, ch], expected)
+
+    def test_one_dimensional_block(self):
+        fir = StreamingFIR([0.5, 0.5])
+        np.testing.assert_allclose(fir.process([2.0, 4.0]), [1.0, 3.0])
+        np.testing.assert_allclose(fir.process([6.0]), [5.0])
+
+
+class TestSosFilterChain(unittest.TestCase):
+
+    def test_matches_per_sample_lfilter(self):
+        fs = 500
+        rng = np.random.default_rng(1)
+        x = rng.normal(size=(600, 2))
+
+        # Previous altv3 behaviour: bandpass then notch, one lfilter call per sample
+        b, a = butter(2, [0.5 / 250, 40.0 / 250], btype='band')
+        nb, na = iirnotch(50.0 / 250, 30.0)
+        expected = np.empty_like(x)
+        for ch in range(2):
+            zi = np.zeros(len(a) - 1)
+            nzi = np.zeros(len(na) - 1)
+            for i, v in enumerate(x[:, ch]):
+                y, zi = lfilter(b, a, [v], zi=zi)
+                y, nzi = lfilter(nb, na, y, zi=nzi)
+                expected[i, ch] = y[0]
+
+        chain = SosFilterChain(design_sos(fs, bandpass=(0.5, 40.0), notch=50.0), channels=2)
+        out = np.concatenate([chain.process(x[i:i + 50]) for i in range(0, len(x), 50)])
+
+        np.testing.assert_allclose(out, expected, atol=1e-9)
+
+    def test_baseline_stage_adds_sections(self):
+        plain = design_sos(500, bandpass=(0.5, 40.0))
+        with_baseline = design_sos(500, bandpass=(0.5, 40.0), baseline=0.3)
+        self.assertEqual(len(with_baseline), len(plain) + 1)
+
+    def test_python_sosfilt_matches_scipy(self):
+        sos = design_sos(500, bandpass=(0.5, 40.0), notch=50.0, baseline=0.3)
+        rng = np.random.default_rng(2)
+        x = rng.normal(size=(300, 2))
+        zi = rng.normal(size=(len(sos), 2, 2))
+
+        y, zf = sosfilt_python(sos, x, zi)
+        expected_y, expected_zf = sosfilt(sos, x, axis=0, zi=zi)
+        np.testing.assert_allclose(y, expected_y, atol=1e-12)
+        np.testing.assert_allclose(zf, expected_zf, atol=1e-12)
+
+    def test_lazy_chain_switches_to_scipy_once_imported(self):
+        sos = design_sos(500, bandpass=(0.5, 40.0), notch=50.0)
+        x = np.random.default_rng(3).normal(size=(200, 2))
+        expected = SosFilterChain(sos, channels=2).process(x)
+
+        with mock.patch.dict(sys.modules, {'scipy.signal': None}):
+            chain = SosFilterChain(sos, channels=2, lazy=True)
+            head = chain.process(x[:100])
+            self.assertIsNone(chain._sosfilt)
+        tail = chain.process(x[100:])
+        self.assertIs(chain._sosfilt, sosfilt)
+        np.testing.assert_allclose(np.concatenate([head, tail]), expected, atol=1e-12)
+
+    def test_design_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sos = design_sos(250, bandpass=(0.5, 40.0), notch=50.0, cache_dir=tmp)
+            self.assertEqual(len(os.listdir(tmp)), 1)
+            # Cached: no SciPy needed the second time
+            with mock.patch.dict(sys.modules, {'scipy.signal': None}):
+                cached = design_sos(250.0, bandpass=[0.5, 40], notch=50.0, cache_dir=tmp)
+            np.testing.assert_array_equal(cached, sos)
+            np.testing.assert_array_equal(sos, design_sos(250, bandpass=(0.5, 40.0), notch=50.0))
+            design_sos(250, bandpass=(0.5, 40.0), cache_dir=tmp)
+            self.assertEqual(len(os.listdir(tmp)), 2)
+
+
+class TestLoadCoefficients(unittest.TestCase):
+
+    def test_parses_pasted_c_table(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'coeffs.txt')
+            with open(path, 'w') as f:
+                f.write("# header\nconst int16_t taps[] = {\n  -72, 122, // first\n  -31 };\n")
+            coeffs = load_fir_coefficients(path)
+        np.testing.assert_allclose(coeffs * 32768.0, [-72, 122, -31])
+
+
+if __name__ == '__main__':
+    unittest.main()
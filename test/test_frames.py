@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from ecg_core.frames import SMALL_BLOCK, FrameReader, decode_frames
+
+
+def to_int24(value):
+    # Reference scalar conversion, as previously done per sample in the apps
+    value &= 0xFFFFFF
+    return value - 0x1000000 if value & 0x800000 else value
+
+
+def encode(status, ch1, ch2):
+    out = []
+    for word in (status, ch1 & 0xFFFFFF, ch2 & 0xFFFFFF):
+        out += [(word >> 16) & 0xFF, (word >> 8) & 0xFF, word & 0xFF]
+    return out
+
+
+class TestDecodeFrames(unittest.TestCase):
+
+    def test_sign_extension_matches_scalar_conversion(self):
+        samples = [(0, 0), (1, -1), (0x7FFFFF, -0x800000), (123456, -654321)]
+        raw = np.array([encode(0xC00000, a, b) for a, b in samples], dtype=np.uint8)
+
+        status, counts = decode_frames(raw)
+
+        self.assertTrue(np.all(status == 0xC00000))
+        expected = [[to_int24(a), to_int24(b)] for a, b in samples]
+        np.testing.assert_array_equal(counts, expected)
+
+
+class TestFrameReader(unittest.TestCase):
+
+    def test_collects_block_and_scales(self):
+        spi = MagicMock()
+        spi.xfer2.side_effect = [[0xAA] + encode(0xC00000, i * 1000, -i * 1000) for i in range(4)]
+        reader = FrameReader(spi, block_size=2, gain=6, vref=4.5, rdata=True)
+
+        self.assertIsNone(reader.read_block())
+        status, values = reader.read_block()
+        self.assertEqual(values.shape, (2, 2))
+        np.testing.assert_allclose(values[1], [1000 * 4.5 / (6 * 0x7FFFFF), -1000 * 4.5 / (6 * 0x7FFFFF)])
+
+        self.assertIsNone(reader.read_block())
+        status, values = reader.read_block()
+        np.testing.assert_allclose(values[:, 0] * 6 * 0x7FFFFF / 4.5, [2000, 3000])
+
+        # The same transfer list is reused for every read
+        sent = {id(call.args[0]) for call in spi.xfer2.call_args_list}
+        self.assertEqual(len(sent), 1)
+
+    def test_small_and_large_blocks_decode_alike(self):
+        rng = np.random.default_rng(0)
+        counts = rng.integers(-0x800000, 0x800000, (40, 2))
+        counts[:2] = [[0x7FFFFF, -0x800000], [-1, 0]]
+        status = 0xC00000 | (rng.integers(0, 32, 40) << 15)
+        raw = np.array([encode(int(word), int(a), int(b)) for word, (a, b) in zip(status, counts)], dtype=np.uint8)
+        expected_status, expected_counts = decode_frames(raw)
+
+        # Either side of SMALL_BLOCK, and a partial block drained early
+        for block_size in (5, SMALL_BLOCK, 40):
+            spi = MagicMock()
+            spi.xfer2.side_effect = raw.tolist()
+            reader = FrameReader(spi, block_size=block_size, vref=2.42)
+            blocks = [reader.read_block() for _ in range(len(raw) - 3)]
+            blocks = [block for block in blocks if block is not None] + [reader.drain()]
+            for _ in range(3):
+                reader.read()
+            blocks.append(reader.drain())
+
+            np.testing.assert_array_equal(np.concatenate([block[0] for block in blocks]), expected_status)
+            values = np.concatenate([block[1] for block in blocks])
+            np.testing.assert_allclose(values / reader.lsb, expected_counts, atol=1e-6)
+            self.assertEqual(reader.pending, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+from ecg_core.hrv import HrvEngine
+
+
+def beats(rr_ms, sample_rate=500):
+    """R-peak sample indices for a series of R-R intervals."""
+    return list(np.round(np.concatenate(([0.0], np.cumsum(rr_ms))) * sample_rate / 1000.0).astype(int))
+
+
+class TestHrvEngine(unittest.TestCase):
+
+    def test_time_domain_matches_batch_computation(self):
+        rr = 800 + 40 * np.random.default_rng(1).standard_normal(700)
+        peaks = beats(rr, 1000)
+        engine = HrvEngine(1000, window=300)
+        for start in range(0, len(peaks), 3):
+            engine.update(peaks[start:start + 3])
+
+        window = np.diff(peaks)[-300:].astype(float)
+        diffs = np.diff(window)
+        metrics = engine.metrics()
+        self.assertEqual(metrics['intervals'], 300)
+        self.assertAlmostEqual(metrics['mean_rr_ms'], window.mean(), places=6)
+        self.assertAlmostEqual(metrics['sdnn_ms'], window.std(ddof=1), places=6)
+        self.assertAlmostEqual(metrics['rmssd_ms'], np.sqrt(np.mean(diffs ** 2)), places=6)
+        self.assertAlmostEqual(metrics['pnn50'], 100.0 * np.mean(np.abs(diffs) > 50), places=6)
+
+    def test_spectrum_separates_lf_and_hf(self):
+        t = np.cumsum(np.full(400, 0.8))
+        hf = HrvEngine(500)
+        hf.update(beats(800 + 30 * np.sin(2 * np.pi * 0.25 * t)))
+        lf = HrvEngine(500)
+        lf.update(beats(800 + 30 * np.sin(2 * np.pi * 0.1 * t)))
+
+        # A 30 ms sine has a variance of 450 ms^2
+        self.assertAlmostEqual(hf.metrics()['hf_ms2'], 450, delta=90)
+        self.assertLess(hf.metrics()['lf_hf'], 0.1)
+        self.assertAlmostEqual(lf.metrics()['lf_ms2'], 450, delta=90)
+        self.assertGreater(lf.metrics()['lf_hf'], 10)
+
+    def test_missed_beat_is_rejected(self):
+        engine = HrvEngine(500)
+        rr = [800] * 20 + [1600] + [800] * 20
+        engine.update(beats(rr))
+        metrics = engine.metrics()
+        self.assertEqual(metrics['rejected'], 1)
+        self.assertEqual(metrics['intervals'], 40)
+        self.assertEqual(metrics['sdnn_ms'], 0)
+        self.assertIsNone(metrics['lf_ms2'])
+
+    def test_window_restarts_after_rhythm_change(self):
+        engine = HrvEngine(500)
+        engine.update(beats([1000] * 20 + [500] * 10))
+        self.assertEqual(engine.metrics()['mean_rr_ms'], 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
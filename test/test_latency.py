@@ -0,0 +1,82 @@
+import time
+import unittest
+
+import numpy as np
+
+from ecg_core.broadcast import BroadcastHub
+from ecg_core.latency import BUCKETS, LatencyHistogram, LatencyTracker, _bucket, bucket_high
+from ecg_core.ring_buffer import RingBuffer
+from ecg_core.streaming import FrameStreamer
+
+
+class TestLatencyHistogram(unittest.TestCase):
+
+    def test_buckets_are_contiguous_and_tight(self):
+        values = np.unique(np.logspace(0, 12, 5000).astype(np.int64))
+        for value in values.tolist():
+            index = _bucket(value)
+            self.assertLessEqual(value, bucket_high(index))
+            self.assertGreater(value, bucket_high(index - 1) if index else -1)
+            self.assertLessEqual(bucket_high(index) - value, value / 64)
+        self.assertEqual(_bucket(bucket_high(BUCKETS - 2) + 1), BUCKETS - 1)
+
+    def test_quantiles_match_the_recorded_values(self):
+        values = np.random.default_rng(0).lognormal(11, 1, 50000).astype(np.int64)
+        histogram = LatencyHistogram()
+        for value in values.tolist():
+            histogram.record(value)
+
+        self.assertEqual(histogram.count, len(values))
+        self.assertEqual(histogram.max, values.max())
+        for q in (0.5, 0.99, 0.999):
+            self.assertAlmostEqual(histogram.quantile(q) / np.quantile(values, q), 1.0, delta=0.02)
+        self.assertEqual(LatencyHistogram().quantile(0.5), 0)
+        histogram.record(10 ** 15)  # beyond the table: counted, clamped to the last bucket
+        self.assertEqual(histogram.quantile(1.0), 10 ** 15)
+
+
+class TestLatencyTracker(unittest.TestCase):
+
+    def test_writers_merge_and_released_counts_stay(self):
+        tracker = LatencyTracker()
+        first, second = tracker.histogram('emit'), tracker.histogram('emit')
+        first.record(1000)
+        second.record(3000)
+        tracker.release('emit', second)
+        second.record(10 ** 9)  # no longer tracked
+
+        stats = tracker.stats()['emit']
+        self.assertEqual((stats['count'], stats['max_ms']), (2, 0.003))
+        self.assertAlmostEqual(stats['mean_ms'], 0.002)
+
+    def test_prometheus_summary(self):
+        tracker = LatencyTracker()
+        tracker.histogram('filter').record(2000)
+        lines = tracker.prometheus().splitlines()
+        self.assertEqual(lines[:2], [
+            '# HELP ecg_stage_latency_seconds Time spent in each stage from DRDY edge to client',
+            '# TYPE ecg_stage_latency_seconds summary'
+        ])
+        self.assertIn('ecg_stage_latency_seconds{stage="filter",quantile="0.99"} 2e-06', lines)
+        self.assertIn('ecg_stage_latency_seconds_count{stage="filter"} 1', lines)
+
+    def test_streamer_and_hub_stages(self):
+        tracker = LatencyTracker()
+        sent = []
+        hub = BroadcastHub(lambda event, payload, client_id: sent.append(payload), latency=tracker)
+        hub.subscribe('a')
+        buffer = RingBuffer(100)
+        streamer = FrameStreamer(hub.publish_frame, [buffer], 500, latency=tracker)
+        buffer.extend(np.arange(10))
+        streamer.poll()
+        deadline = time.monotonic() + 2.0
+        while tracker.merged('emit').count == 0 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        hub.close()
+
+        stats = tracker.stats()
+        self.assertEqual((stats['serialize']['count'], stats['emit']['count']), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import threading
+import time
+import unittest
+
+from ecg_core.pipeline import BLOCK, DROP_NEWEST, DROP_OLDEST, Pipeline, Stage, StageQueue
+
+
+class TestStageQueue(unittest.TestCase):
+
+    def test_overflow_policies(self):
+        oldest = StageQueue(3, DROP_OLDEST)
+        newest = StageQueue(3, DROP_NEWEST)
+        for i in range(5):
+            oldest.put(i)
+            newest.put(i)
+
+        self.assertEqual([oldest.get(0) for _ in range(3)], [2, 3, 4])
+        self.assertEqual([newest.get(0) for _ in range(3)], [0, 1, 2])
+        self.assertEqual(oldest.stats()['dropped'], 2)
+        self.assertEqual(newest.stats()['dropped'], 2)
+        self.assertEqual(oldest.stats()['high_water'], 3)
+
+    def test_block_policy_waits_for_consumer(self):
+        queue = StageQueue(1, BLOCK)
+        queue.put('a')
+        done = threading.Event()
+        producer = threading.Thread(target=lambda: (queue.put('b'), done.set()))
+        producer.start()
+        self.assertFalse(done.wait(0.1))
+        self.assertEqual(queue.get(0), 'a')
+        self.assertTrue(done.wait(1.0))
+        self.assertEqual(queue.get(0), 'b')
+        self.assertEqual(queue.stats()['dropped'], 0)
+
+    def test_get_times_out_and_wakes_on_put(self):
+        queue = StageQueue(4)
+        self.assertIsNone(queue.get(timeout=0.01))
+        threading.Timer(0.05, queue.put, args=('x',)).start()
+        self.assertEqual(queue.get(timeout=1.0), 'x')
+        self.assertGreater(queue.stats()['wait_ms_max'], -1)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            StageQueue(4, 'drop_everything')
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_items_flow_through_stages(self):
+        received = []
+        finished = threading.Event()
+
+        def collect(item):
+            received.append(item)
+            if len(received) == 50:
+                finished.set()
+
+        pipeline = Pipeline(
+            Stage('double', lambda x: 2 * x, maxsize=100),
+            Stage('collect', collect, maxsize=100)
+        )
+        pipeline.start()
+        for i in range(50):
+            pipeline.put(i)
+        self.assertTrue(finished.wait(2.0))
+        pipeline.stop()
+
+        self.assertEqual(received, [2 * i for i in range(50)])
+        stats = pipeline.stats()
+        self.assertEqual(stats['double']['processed'], 50)
+        self.assertEqual(stats['collect']['dropped'], 0)
+
+    def test_slow_stage_drops_instead_of_blocking_producer(self):
+        release = threading.Event()
+        stage = Stage('slow', lambda x: release.wait(), maxsize=5, policy=DROP_OLDEST)
+        stage.start()
+        started = time.monotonic()
+        for i in range(100):
+            stage.put(i)
+        self.assertLess(time.monotonic() - started, 0.5)
+        release.set()
+        stage.stop()
+        self.assertGreaterEqual(stage.stats()['dropped'], 90)
+
+    def test_handler_errors_are_counted(self):
+        done = threading.Event()
+
+        def handler(x):
+            if x == 0:
+                raise ValueError("bad block")
+            done.set()
+
+        stage = Stage('flaky', handler)
+        stage.start()
+        stage.put(0)
+        stage.put(1)
+        self.assertTrue(done.wait(1.0))
+        stage.stop()
+        self.assertEqual(stage.stats()['errors'], 1)
+        self.assertEqual(stage.stats()['processed'], 1)
+
+    def test_errors_can_be_reported_downstream(self):
+        received = []
+        done = threading.Event()
+
+        def collect(item):
+            received.append(item)
+            if len(received) == 2:
+                done.set()
+
+        def check(x):
+            if x < 0:
+                raise ValueError("out of range")
+            return x
+
+        pipeline = Pipeline(
+            Stage('check', check, on_error=lambda item, e: ('error', item, str(e))),
+            Stage('collect', collect)
+        )
+        pipeline.start()
+        pipeline.put(-1)
+        pipeline.put(1)
+        self.assertTrue(done.wait(1.0))
+        pipeline.stop()
+        self.assertEqual(received, [('error', -1, 'out of range'), 1])
+        self.assertEqual(pipeline.stats()['check']['errors'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
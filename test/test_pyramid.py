@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from ecg_core.pyramid import MinMaxPyramid, envelope
+
+
+class TestMinMaxPyramid(unittest.TestCase):
+
+    def setUp(self):
+        self.values = np.random.default_rng(0).standard_normal((5000, 2))
+
+    def test_incremental_matches_batch(self):
+        pyramid = MinMaxPyramid(channels=2, factor=4, levels=3, capacity=1000)
+        rng = np.random.default_rng(1)
+        start = 0
+        while start < len(self.values):
+            n = int(rng.integers(1, 40))
+            pyramid.update(self.values[start:start + n])
+            start += n
+
+        for level in (1, 2, 3):
+            size = 4 ** level
+            whole = len(self.values) // size * size
+            groups = self.values[:whole].reshape(-1, size, 2)
+            first, mins, maxs = pyramid.read(level, 0, len(self.values))
+            np.testing.assert_array_equal(mins, groups.min(axis=1)[first:])
+            np.testing.assert_array_equal(maxs, groups.max(axis=1)[first:])
+        # Level 1 holds 1250 buckets, the ring buffer only the last 1000
+        self.assertEqual(pyramid.read(1, 0, 5000)[0], 250)
+
+    def test_choose_level_and_envelope(self):
+        pyramid = MinMaxPyramid(factor=8, levels=4)
+        self.assertEqual(pyramid.choose_level(500, 1000), 0)
+        self.assertEqual(pyramid.choose_level(64000, 1000), 2)
+        self.assertEqual(pyramid.choose_level(1800000, 1000), 3)
+        self.assertEqual(pyramid.choose_level(10 ** 9, 1000), 4)
+
+        mins, maxs = self.values[:, :1], self.values[:, :1]
+        group, low, high = envelope(mins, maxs, 300)
+        self.assertEqual((group, len(low)), (17, 295))
+        self.assertEqual(low.min(), mins.min())
+        self.assertEqual(high.max(), maxs.max())
+
+
+if __name__ == '__main__':
+    unittest.main()
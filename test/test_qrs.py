@@ -0,0 +1,82 @@
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from ecg_core.filters import SosFilterChain, design_sos
+from ecg_core.qrs import PanTompkinsDetector
+from ecg_core.simulator import SyntheticECG
+
+
+def synthetic(sample_rate, heart_rate, seconds=30, noise_mv=0.02, wander_mv=0.0):
+    n = sample_rate * seconds
+    ecg = SyntheticECG(heart_rate=heart_rate, noise_mv=noise_mv).generate(0, n, sample_rate)[:, 0] * 1000.0
+    ecg += wander_mv * np.sin(2 * np.pi * 0.3 * np.arange(n) / sample_rate)
+    # Same front end as the apps
+    ecg = SosFilterChain(design_sos(sample_rate, bandpass=(0.5, 40.0))).process(ecg)
+    beat = sample_rate * 60.0 / heart_rate
+    r_peaks = np.round((np.arange(n / beat) + 0.27) * beat).astype(int)  # R wave phase in SyntheticECG
+    return ecg, r_peaks[r_peaks < n]
+
+
+class TestPanTompkinsDetector(unittest.TestCase):
+
+    def check_detection(self, sample_rate, heart_rate, **kwargs):
+        ecg, expected = synthetic(sample_rate, heart_rate, **kwargs)
+        detector = PanTompkinsDetector(sample_rate)
+        peaks = []
+        for start in range(0, len(ecg), 10):
+            peaks.extend(detector.process(ecg[start:start + 10]))
+
+        # Every beat after the 2 s learning period, nothing else, within 15 ms
+        expected = expected[(expected > 2.5 * sample_rate) & (expected < len(ecg) - sample_rate)]
+        found = [p for p in peaks if expected[0] - sample_rate // 10 <= p <= expected[-1] + sample_rate // 10]
+        self.assertEqual(len(found), len(expected))
+        np.testing.assert_allclose(found, expected, atol=0.015 * sample_rate)
+        self.assertAlmostEqual(detector.heart_rate(), heart_rate, delta=1.0)
+
+    def test_detects_beats_at_apps_sample_rates(self):
+        self.check_detection(500, 72)
+        self.check_detection(125, 72)
+
+    def test_fast_and_slow_rhythms_with_baseline_wander(self):
+        self.check_detection(500, 150, noise_mv=0.05, wander_mv=0.3)
+        self.check_detection(250, 45, wander_mv=0.5)
+
+    def test_block_size_does_not_change_result(self):
+        ecg, _ = synthetic(500, 80, seconds=10)
+        whole = PanTompkinsDetector(500).process(ecg)
+        detector = PanTompkinsDetector(500)
+        blocked = []
+        for start in range(0, len(ecg), 7):
+            blocked.extend(detector.process(ecg[start:start + 7]))
+        self.assertEqual(whole, blocked)
+        self.assertTrue(all(isinstance(p, int) for p in whole))
+
+    def test_lazy_detector_without_scipy(self):
+        ecg, _ = synthetic(500, 80, seconds=10)
+        expected = PanTompkinsDetector(500).process(ecg)
+        with mock.patch.dict(sys.modules, {'scipy.signal': None}):
+            detector = PanTompkinsDetector(500, lazy=True)
+            peaks = []
+            for start in range(0, len(ecg) // 2, 10):
+                peaks.extend(detector.process(ecg[start:start + 10]))
+            self.assertIsNone(detector._lfilter)
+        # scipy.signal is back: the rest goes through SciPy's lfilter
+        peaks.extend(detector.process(ecg[len(ecg) // 2:]))
+        self.assertIsNotNone(detector._lfilter)
+        self.assertEqual(peaks, expected)
+
+    def test_search_back_finds_weak_beat(self):
+        ecg, expected = synthetic(500, 60, seconds=20, noise_mv=0.01)
+        # Integrated energy ~0.16 x SPKI: under the threshold, above half of it
+        ecg[12 * 500:13 * 500] *= 0.4
+        detector = PanTompkinsDetector(500)
+        peaks = detector.process(ecg)
+        weak = expected[12]
+        self.assertTrue(any(abs(p - weak) <= 8 for p in peaks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+
+from ecg_core.frames import FULL_SCALE, FrameReader, decode_frames, encode_frames
+from ecg_core.quality import SignalQuality, electrode_names, lead_off_bits
+
+RATE = 500
+
+
+def ecg_like(seconds, rate=RATE, mv=1.0):
+    # 1 mV narrow pulses at 72 bpm on a flat baseline
+    t = np.arange(int(seconds * rate)) / rate
+    return mv * np.exp(-((t % (60 / 72) - 0.3) / 0.015) ** 2)
+
+
+class TestLeadOff(unittest.TestCase):
+
+    def test_status_bits_decode(self):
+        counts = np.zeros((4, 2), dtype=np.int32)
+        status = 0xC00000 | (np.array([0, 0b00001, 0b10000, 0b01100]) << 15)
+        frames = np.concatenate([encode_frames(word, counts[:1]) for word in status])
+        decoded_status, _ = decode_frames(frames.reshape(-1))
+
+        self.assertEqual(lead_off_bits(decoded_status).tolist(), [0, 1, 16, 12])
+        self.assertEqual(electrode_names(0b01100), ['in2p', 'in2n'])
+        self.assertEqual(electrode_names(0), [])
+
+    def test_lead_off_is_per_channel(self):
+        quality = SignalQuality(RATE, 1000.0, channels=2)
+        x = ecg_like(1.0)
+        values = np.stack([x, x], axis=1)
+        status = np.full(len(x), 0xC00000 | (0b01000 << 15))
+        assessment = quality.update(status, values)
+
+        self.assertEqual(assessment['lead_off'], ['in2n'])
+        self.assertEqual(assessment['label'], 'lead_off')
+        self.assertEqual(assessment['score'], 0)
+        self.assertEqual([channel['label'] for channel in assessment['channels']], ['good', 'lead_off'])
+        self.assertEqual(assessment['lead_off_ratio'], 1.0)
+
+
+class TestSignalQuality(unittest.TestCase):
+
+    def assess(self, x, **kwargs):
+        quality = SignalQuality(RATE, kwargs.pop('full_scale', 1000.0), channels=1, **kwargs)
+        status = np.full(len(x), 0xC00000)
+        assessment = None
+        for start in range(0, len(x), 50):
+            assessment = quality.update(status[start:start + 50], x[start:start + 50, None]) or assessment
+        return assessment['channels'][0]
+
+    def test_clean_signal_is_good(self):
+        channel = self.assess(ecg_like(3.0))
+        self.assertEqual(channel['label'], 'good')
+        self.assertEqual(channel['score'], 100)
+        self.assertAlmostEqual(channel['ptp_mv'], 1.0, delta=0.05)
+
+    def test_mains_and_noise_are_measured(self):
+        t = np.arange(3 * RATE) / RATE
+        channel = self.assess(ecg_like(3.0) + 0.3 * np.sin(2 * np.pi * 50 * t))
+        self.assertAlmostEqual(channel['mains_mv'], 0.3, delta=0.01)
+        self.assertEqual(channel['label'], 'noisy')
+
+        noise = np.random.default_rng(0).normal(0, 0.15, 3 * RATE)
+        channel = self.assess(ecg_like(3.0) + noise)
+        self.assertAlmostEqual(channel['noise_mv'], 0.15, delta=0.02)
+        self.assertEqual(channel['label'], 'fair')
+
+    def test_flat_weak_and_saturated(self):
+        self.assertEqual(self.assess(np.zeros(3 * RATE))['label'], 'flat')
+        self.assertEqual(self.assess(ecg_like(3.0, mv=0.1))['label'], 'weak')
+        t = np.arange(3 * RATE) / RATE
+        # Baseline swinging past the rails of a 2 mV input range
+        channel = self.assess(np.clip(3.0 * np.sin(2 * np.pi * 0.5 * t) + ecg_like(3.0), -2.0, 2.0), full_scale=2.0)
+        self.assertEqual(channel['label'], 'saturated')
+        self.assertGreater(channel['saturation'], 0.05)
+
+    def test_for_reader_uses_the_reader_scale(self):
+        reader = FrameReader(None, gain=6, vref=4.5, scale=1000.0)
+        quality = SignalQuality.for_reader(reader, RATE, channels=1)
+        self.assertAlmostEqual(quality.full_scale[0], reader.lsb[0] * FULL_SCALE)
+        self.assertEqual(quality.unit_mv, 1.0)
+        self.assertIsNone(quality.update(np.zeros(10), np.zeros((10, 1))))
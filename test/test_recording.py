@@ -0,0 +1,159 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from ecg_core.frames import lsb_size
+from ecg_core.recording import FLOAT32, HEADER_SIZE, Recorder, Recording, compress_recording
+
+
+class TestRecording(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'session', 'test.ecg')
+        self.lsb = lsb_size(6, 2.42)
+        rng = np.random.default_rng(0)
+        self.counts = rng.integers(-0x800000, 0x800000, size=(1000, 2))
+        self.status = np.full(1000, 0xC00000, dtype=np.uint32)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self, **kwargs):
+        recorder = Recorder(self.path, 500, self.lsb, registers=[0x73, 0x02], chunk_frames=64, **kwargs)
+        recorder.start(first_index=1234)
+        now = [0]
+        with mock.patch('ecg_core.recording.time.time_ns', lambda: now[0]):
+            for start in range(0, 1000, 7):
+                now[0] = 10 ** 18 + (start + 6) * 2 * 10 ** 6  # last frame of the block just converted
+                recorder.write(self.status[start:start + 7], self.counts[start:start + 7] * self.lsb)
+        recorder.stop()
+        return recorder
+
+    def test_counts_round_trip_through_memmap(self):
+        recorder = self.record()
+        self.assertEqual(recorder.stats()['written'], 1000)
+        self.assertEqual(os.path.getsize(self.path), HEADER_SIZE + 1000 * 12)
+
+        recording = Recording(self.path)
+        self.assertIsInstance(recording.frames, np.memmap)
+        self.assertEqual((recording.sample_rate, recording.first_index, recording.chunk_frames), (500, 1234, 64))
+        self.assertEqual(recording.registers[:3], [0x73, 0x02, 0x00])
+        np.testing.assert_array_equal(recording.samples, self.counts)
+        np.testing.assert_array_equal(recording.status, self.status)
+        np.testing.assert_allclose(recording.values(100, 200), self.counts[100:200] * self.lsb)
+        self.assertFalse(recording.missing().any())
+
+    def test_time_index_and_range_reads(self):
+        self.record()
+        recording = Recording(self.path)
+        self.assertEqual(list(recording.index['frame']), list(range(0, 1000, 64)))
+        self.assertEqual(recording.index['offset'][1], HEADER_SIZE + 64 * 12)
+
+        # Chunk times follow the acquisition clock; frames in between are interpolated
+        self.assertEqual(recording.time_at(500) - recording.time_at(0), 10 ** 9)
+        self.assertEqual(recording.index_at(recording.time_at(500)), 500)
+        self.assertEqual(recording.index_at(recording.time_at(0) - 10 ** 9), 0)
+        self.assertEqual(recording.index_at(recording.time_at(999) + 10 ** 9), 1000)
+
+        step, values = recording.read(0, 1000, max_points=300)
+        self.assertEqual((step, values.shape), (4, (2, 250)))
+        np.testing.assert_allclose(values[0, 1], self.counts[4:8, 0].mean() * self.lsb[0])
+        step, values = recording.read(10, 20)
+        self.assertEqual((step, values.shape), (1, (2, 10)))
+
+    def test_frame_times_stamp_chunks(self):
+        recorder = Recorder(self.path, 500, self.lsb, chunk_frames=64)
+        recorder.start()
+        times = 10 ** 18 + np.arange(1000, dtype=np.int64) * 1999900  # ADC 50 ppm fast
+        for start in range(0, 1000, 7):
+            recorder.write(self.status[start:start + 7], self.counts[start:start + 7] * self.lsb,
+                           times[start:start + 7])
+        recorder.stop()
+        np.testing.assert_array_equal(Recording(self.path).index['time_ns'], times[::64])
+
+    def test_envelope_reads_matching_pyramid_level(self):
+        self.record()
+        recording = Recording(self.path)
+        self.assertEqual([len(level) for level in recording.envelopes], [125, 15, 1, 0])
+
+        values = self.counts * self.lsb
+        first, step, mins, maxs = recording.envelope(0, 1000, 100)
+        self.assertEqual((first, step, mins.shape), (0, 16, (2, 63)))
+        np.testing.assert_allclose(maxs[:, 3], values[48:64].max(axis=0), rtol=1e-6)
+        np.testing.assert_allclose(mins[:, 3], values[48:64].min(axis=0), rtol=1e-6)
+
+        first, step, mins, maxs = recording.envelope(10, 60, 100)
+        self.assertEqual((first, step, mins.shape), (10, 1, (2, 50)))
+
+    def test_compressed_recordings_read_back_losslessly(self):
+        # A smooth signal, as between beats, with a few counts of noise
+        t = np.arange(1000) / 500
+        self.counts = np.column_stack((1e5 * np.sin(2 * np.pi * t), 5e4 * np.cos(2 * np.pi * t))).astype(int)
+        self.counts += np.random.default_rng(1).integers(-20, 20, size=self.counts.shape)
+        self.record(compression='zlib')
+        compressed = Recording(self.path)
+        self.assertLess(os.path.getsize(self.path), HEADER_SIZE + 1000 * 12 / 2.5)
+        self.assertEqual(len(compressed), 1000)
+        np.testing.assert_array_equal(compressed.samples, self.counts)
+        np.testing.assert_array_equal(compressed.records(100, 300)['samples'], self.counts[100:300])
+        self.assertEqual(compressed.index_at(compressed.time_at(700)), 700)
+
+        # Export of an uncompressed recording, readable without its .idx too
+        raw = self.path.replace('.ecg', '-raw.ecg')
+        self.path = raw
+        self.record()
+        compress_recording(raw, raw + 'z', 'lzma')
+        os.remove(raw + 'z.idx')
+        exported = Recording(raw + 'z')
+        np.testing.assert_array_equal(exported.values(500, 1000), Recording(raw).values(500, 1000))
+        self.assertEqual(len(exported.index), 16)
+        self.assertEqual(len(exported.envelopes[0]), 125)
+
+    def test_float32_encoding(self):
+        self.record(encoding=FLOAT32)
+        recording = Recording(self.path)
+        self.assertEqual(recording.samples.dtype, np.float32)
+        np.testing.assert_allclose(recording.values(), self.counts * self.lsb, rtol=1e-6)
+
+    def test_dropped_chunks_keep_sample_positions(self):
+        recorder = Recorder(self.path, 500, self.lsb, chunk_frames=100, queue_chunks=1)
+        writing, release = threading.Event(), threading.Event()
+        write_chunk = recorder._writer.handler
+
+        def slow_card(chunk):
+            writing.set()
+            release.wait(2.0)
+            write_chunk(chunk)
+
+        recorder._writer.handler = slow_card
+        recorder.start()
+        recorder.write(self.status[:100], self.counts[:100] * self.lsb)
+        self.assertTrue(writing.wait(1.0))
+        # One chunk queued behind the one being written, the next one dropped
+        recorder.write(self.status[100:350], self.counts[100:350] * self.lsb)
+        self.assertEqual(recorder.dropped, 100)
+        release.set()
+        while recorder.stats()['queued_chunks']:
+            time.sleep(0.01)
+        recorder.stop()
+
+        recording = Recording(self.path)
+        self.assertEqual(len(recording), 350)
+        np.testing.assert_array_equal(np.flatnonzero(recording.missing()), np.arange(200, 300))
+        np.testing.assert_array_equal(recording.samples[300:], self.counts[300:350])
+
+    def test_rejects_other_files(self):
+        with open(self.path.replace('session/', ''), 'wb') as f:
+            f.write(b'not a recording' * 10)
+        with self.assertRaises(ValueError):
+            Recording(self.path.replace('session/', ''))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+
+from ecg_core.registers import DATA_RATES, RDATAC, SDATAC, RegisterMap, data_rate_config
+from ecg_core.simulator import SimulatedADS1292R, SimulatedSpiDev
+
+
+class CountingSpi(SimulatedSpiDev):
+
+    def __init__(self, chip):
+        super().__init__(chip)
+        self.transfers = []
+
+    def xfer2(self, data):
+        self.transfers.append(list(data))
+        return super().xfer2(data)
+
+
+class TestDataRates(unittest.TestCase):
+
+    def test_config1_for_each_rate(self):
+        self.assertEqual(data_rate_config(125), 0x00)
+        self.assertEqual(data_rate_config(500), 0x02)
+        self.assertEqual(data_rate_config(8000), 0x06)
+        self.assertEqual(data_rate_config(500, single_shot=True), 0x82)
+        with self.assertRaises(ValueError):
+            data_rate_config(600)
+
+    def test_simulator_runs_at_the_written_rate(self):
+        chip = SimulatedADS1292R()
+        spi = SimulatedSpiDev(chip)
+        spi.open(0, 0)
+        for rate in DATA_RATES.values():
+            spi.xfer2([0x41, 0x00, data_rate_config(rate)])
+            self.assertEqual(chip.sample_rate, rate)
+
+
+class TestRegisterMap(unittest.TestCase):
+
+    def setUp(self):
+        self.chip = SimulatedADS1292R()
+        self.spi = CountingSpi(self.chip)
+        self.spi.open(0, 0)
+        self.registers = RegisterMap(self.spi, continuous=False)
+
+    def test_write_is_one_burst_and_one_read_back(self):
+        failed = self.registers.write({'CONFIG1': 0x03, 0x04: 0x60, 0x05: 0x60, 'RLD_SENS': 0x2C})
+
+        self.assertEqual(failed, [])
+        self.assertEqual(self.chip.registers[0x01:0x07], [0x03, 0x80, 0x10, 0x60, 0x60, 0x2C])
+        # Read the span (CONFIG2, LOFF unknown), write it whole, read it back
+        self.assertEqual([transfer[:2] for transfer in self.spi.transfers],
+                         [[0x21, 0x05], [0x41, 0x05], [0x21, 0x05]])
+        self.assertEqual(self.registers['CH1SET'], 0x60)
+
+        # Known registers in between are rewritten from the shadow, without a read first
+        self.spi.transfers.clear()
+        self.registers.write({'CONFIG1': 0x02, 'RLD_SENS': 0x04})
+        self.assertEqual([transfer[0] for transfer in self.spi.transfers], [0x41, 0x21])
+        self.assertEqual(self.chip.registers[0x01:0x07], [0x02, 0x80, 0x10, 0x60, 0x60, 0x04])
+
+    def test_reports_registers_that_do_not_take(self):
+        # The simulated LOFF_STAT ignores writes, CLK_DIV included: retried, then reported
+        failed = self.registers.write({'CONFIG1': 0x01, 'LOFF_STAT': 0x40}, retries=1)
+        self.assertEqual(failed, [0x08])
+        self.assertEqual(self.registers['LOFF_STAT'], 0x00)
+        self.assertEqual(self.chip.registers[0x01], 0x01)
+        self.assertEqual(self.registers.stats()['retries'], 1)
+        self.assertEqual(self.registers.stats()['failures'], 1)
+
+        # Only the bits that hold what was written are compared: not the ID, nor the GPIO pin levels
+        self.assertEqual(self.registers.write({'ID': 0x00, 'GPIO': 0x0C | 0x03}), [])
+        self.assertEqual(self.registers['ID'], 0x73)
+
+    def test_refresh_and_continuous_mode(self):
+        self.registers.set_continuous(True)
+        self.spi.transfers.clear()
+        snapshot = self.registers.refresh()
+
+        self.assertEqual(len(snapshot), 12)
+        self.assertEqual(snapshot['ID'], 0x73)
+        # SDATAC, one RREG of the whole map, RDATAC
+        self.assertEqual(self.spi.transfers[0], [SDATAC])
+        self.assertEqual(self.spi.transfers[1][:2], [0x20, 0x0B])
+        self.assertEqual(self.spi.transfers[2], [RDATAC])
+        self.assertTrue(self.chip.continuous)
+        self.assertIsNotNone(self.registers.refreshed_at)
+        with self.assertRaises(ValueError):
+            self.registers['CONFIG3']
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+
+from ecg_core.ring_buffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_append_and_latest(self):
+        buf = RingBuffer(4)
+        for i in range(6):
+            buf.append(i)
+
+        self.assertEqual(len(buf), 4)
+        self.assertEqual(buf.total, 6)
+        self.assertEqual(buf.oldest, 2)
+        np.testing.assert_array_equal(buf.latest(), [2, 3, 4, 5])
+        np.testing.assert_array_equal(buf.latest(2), [4, 5])
+
+    def test_latest_is_a_view_when_contiguous(self):
+        buf = RingBuffer(8)
+        buf.extend(np.arange(5))
+        self.assertTrue(np.shares_memory(buf.latest(3), buf._data))
+
+    def test_extend_wraps_and_truncates(self):
+        buf = RingBuffer(5, channels=2)
+        buf.extend(np.arange(6).reshape(3, 2))
+        buf.extend(np.arange(6, 14).reshape(4, 2))
+        np.testing.assert_array_equal(buf.latest()[:, 0], [4, 6, 8, 10, 12])
+
+        buf.extend(np.arange(100, 140).reshape(20, 2))
+        self.assertEqual(buf.total, 27)
+        np.testing.assert_array_equal(buf.latest()[:, 0], [130, 132, 134, 136, 138])
+
+    def test_since(self):
+        buf = RingBuffer(4)
+        buf.extend([10, 11, 12, 13, 14, 15])
+
+        first, samples = buf.since(4)
+        self.assertEqual(first, 4)
+        np.testing.assert_array_equal(samples, [14, 15])
+
+        # Cursor fell behind the buffer: returns from the oldest held sample
+        first, samples = buf.since(0)
+        self.assertEqual(first, 2)
+        self.assertEqual(len(samples), 4)
+
+        first, samples = buf.since(6)
+        self.assertEqual((first, len(samples)), (6, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
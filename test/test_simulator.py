@@ -0,0 +1,67 @@
+import threading
+import unittest
+
+import numpy as np
+
+from ecg_core.acquisition import DrdyAcquisition
+from ecg_core.frames import FrameReader
+from ecg_core.simulator import SimulatedADS1292R, SimulatedGPIO, SimulatedSpiDev, SyntheticECG
+
+
+class TestSimulatedADS1292R(unittest.TestCase):
+
+    def setUp(self):
+        self.chip = SimulatedADS1292R(SyntheticECG(noise_mv=0.0))
+        self.spi = SimulatedSpiDev(self.chip)
+        self.spi.open(0, 0)
+
+    def test_register_map(self):
+        self.assertEqual(self.spi.xfer2([0x20, 0x00, 0x00])[2], 0x73)
+
+        # Burst write CONFIG1..CH2SET, then burst read them back
+        self.spi.xfer2([0x41, 0x04, 0x03, 0xA0, 0x10, 0x60, 0x60])
+        self.assertEqual(self.spi.xfer2([0x21, 0x04] + [0] * 5)[2:], [0x03, 0xA0, 0x10, 0x60, 0x60])
+        self.assertEqual(self.chip.sample_rate, 1000)
+
+        # ID is read-only
+        self.spi.xfer2([0x40, 0x00, 0x00])
+        self.assertEqual(self.spi.xfer2([0x20, 0x00, 0x00])[2], 0x73)
+
+    def test_frames_decode_to_synthetic_signal(self):
+        self.spi.xfer2([0x44, 0x01, 0x60, 0x60])  # gain 12 on both channels
+        reader = FrameReader(self.spi, block_size=500, gain=12, vref=self.chip.vref)
+        block = None
+        while block is None:
+            self.chip.convert()
+            block = reader.read_block()
+
+        status, values = block
+        self.assertTrue(np.all(status >> 20 == 0xC))
+        expected = SyntheticECG(noise_mv=0.0).generate(0, 500, 500)
+        np.testing.assert_allclose(values, expected, atol=1e-6)
+
+    def test_drdy_clock_drives_acquisition(self):
+        self.chip.speed = 10.0  # 5000 edges/s
+        gpio = SimulatedGPIO(self.chip)
+        reader = FrameReader(self.spi, block_size=50)
+        acq = DrdyAcquisition(gpio, 17, reader.read_block, 500, timeout=1.0)
+        blocks = []
+
+        def handler(block):
+            blocks.append(block)
+            if len(blocks) == 4:
+                acq.stop()
+
+        worker = threading.Thread(target=acq.run, args=(handler,))
+        worker.start()
+        gpio.output(22, gpio.HIGH)  # START
+        worker.join(timeout=5)
+        gpio.output(22, gpio.LOW)
+
+        self.assertFalse(worker.is_alive())
+        self.assertEqual(len(blocks), 4)
+        self.assertEqual(acq.missed_edges, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import sys
+import time
+import unittest
+
+from ecg_core.startup import StartupTimer, preload, process_age
+
+
+class TestStartupTimer(unittest.TestCase):
+
+    def test_marks_count_from_process_start(self):
+        age = process_age()
+        if sys.platform.startswith('linux'):
+            self.assertGreater(age, 0.0)
+        timer = StartupTimer()
+        first = timer.mark('first_sample')
+        time.sleep(0.02)
+        self.assertEqual(timer.mark('first_sample'), first)
+        self.assertGreaterEqual(first, (age or 0.0) - 0.02)
+        stats = timer.stats()
+        self.assertEqual(stats['time_to_first_sample_s'], first)
+        self.assertGreater(stats['uptime_s'], first)
+
+    def test_preload_marks_imports(self):
+        timer = StartupTimer()
+        preload(['json', 'no_such_module_here'], timer).join(5.0)
+        self.assertIn('import json', timer.marks)
+        self.assertNotIn('import no_such_module_here', timer.marks)
+        self.assertIn('json', sys.modules)
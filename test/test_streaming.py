@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+
+from ecg_core.ring_buffer import RingBuffer
+from ecg_core.streaming import FRAME_HEADER, FrameStreamer, pack_frame, read_since, unpack_frame
+
+
+class TestFrames(unittest.TestCase):
+
+    def test_pack_unpack_round_trip(self):
+        values = np.arange(12, dtype=np.float64).reshape(2, 6) / 7
+        frame = pack_frame(3, 1000, 500, values)
+        self.assertEqual(len(frame), FRAME_HEADER.size + 12 * 4)
+
+        seq, first, rate, decoded = unpack_frame(frame)
+        self.assertEqual((seq, first, rate), (3, 1000, 500))
+        np.testing.assert_allclose(decoded, values, rtol=1e-6)
+
+
+class TestReadSince(unittest.TestCase):
+
+    def test_cursor_reads(self):
+        a, b = RingBuffer(8), RingBuffer(8)
+        a.extend(np.arange(12))
+        b.extend(np.arange(12) * 10)
+
+        first, values = read_since([a, b], 9, dtype=np.float64)
+        self.assertEqual(first, 9)
+        self.assertEqual(values.dtype, np.float64)
+        np.testing.assert_array_equal(values, [[9, 10, 11], [90, 100, 110]])
+
+        # Nothing new, a cursor older than the buffers, one from before a restart
+        self.assertEqual(read_since([a, b], 12)[1].shape, (2, 0))
+        self.assertEqual(read_since([a, b], 0)[0], 4)
+        self.assertEqual(read_since([a, b], 500)[0], 4)
+
+
+class TestFrameStreamer(unittest.TestCase):
+
+    def setUp(self):
+        self.raw = RingBuffer(100)
+        self.filtered = RingBuffer(100)
+        self.sent = []
+        self.streamer = FrameStreamer(
+            lambda event, frame: self.sent.append(unpack_frame(frame)),
+            [self.raw, self.filtered], 500
+        )
+
+    def test_sends_only_new_samples(self):
+        self.assertIsNone(self.streamer.poll())
+        self.raw.extend(np.arange(10))
+        self.filtered.extend(-np.arange(10))
+        self.streamer.poll()
+        self.raw.extend(np.arange(10, 15))
+        self.filtered.extend(-np.arange(10, 15))
+        self.streamer.poll()
+
+        (seq0, first0, _, v0), (seq1, first1, _, v1) = self.sent
+        self.assertEqual((seq0, first0, seq1, first1), (0, 0, 1, 10))
+        np.testing.assert_array_equal(v1, [np.arange(10, 15), -np.arange(10, 15)])
+
+    def test_waits_for_every_buffer(self):
+        self.raw.extend(np.arange(10))
+        self.filtered.extend(np.arange(6))
+        self.streamer.poll()
+        self.filtered.extend(np.arange(6, 10))
+        self.streamer.poll()
+        self.assertEqual([frame[3].shape[1] for frame in self.sent], [6, 4])
+
+    def test_reports_gaps_when_buffers_wrap(self):
+        self.raw.extend(np.arange(250))
+        self.filtered.extend(np.arange(250))
+        self.streamer.poll()
+
+        seq, first, _, values = self.sent[0]
+        self.assertEqual(first, 150)
+        self.assertEqual(self.streamer.stats()['gaps'], 150)
+        np.testing.assert_array_equal(values[0], np.arange(150, 250))
+
+
+if __name__ == '__main__':
+    unittest.main()
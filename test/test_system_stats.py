@@ -0,0 +1,76 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from ecg_core.system_stats import SystemStatsSampler
+
+
+class TestSystemStatsSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.thermal = os.path.join(self.tmp.name, 'temp')
+        with open(self.thermal, 'w') as f:
+            f.write('45678\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_background_samples_and_history(self):
+        sampler = SystemStatsSampler(period=0.01, history_size=5, thermal_zone=self.thermal)
+        self.assertIsNone(sampler.snapshot())
+        sampler.start()
+        try:
+            time.sleep(0.2)
+        finally:
+            sampler.stop()
+
+        snapshot = sampler.snapshot()
+        self.assertIs(snapshot, sampler.history()[-1])
+        self.assertEqual(len(sampler.history()), 5)
+        self.assertEqual(sampler.history(seconds=-1), [])
+        self.assertAlmostEqual(snapshot['temperature_c'], 45.678)
+        self.assertGreater(snapshot['process']['rss_mb'], 0)
+        self.assertEqual(len(snapshot['process']['gc_collections']), 3)
+        self.assertEqual(sampler.errors, 0)
+
+    def test_temperature_is_reread_and_optional(self):
+        sampler = SystemStatsSampler(thermal_zone=self.thermal)
+        self.assertAlmostEqual(sampler.sample()['temperature_c'], 45.678)
+        with open(self.thermal, 'w') as f:
+            f.write('51000\n')
+        self.assertAlmostEqual(sampler.sample()['temperature_c'], 51.0)
+
+        missing = SystemStatsSampler(thermal_zone=os.path.join(self.tmp.name, 'none'))
+        self.assertIsNone(missing.sample()['temperature_c'])
+
+    def test_watched_thread_cpu(self):
+        busy = {'id': None}
+        done = threading.Event()
+
+        def spin():
+            busy['id'] = threading.get_native_id()
+            while not done.is_set():
+                pass
+
+        sampler = SystemStatsSampler(threads={'busy': lambda: busy['id'], 'idle': lambda: None})
+        thread = threading.Thread(target=spin)
+        thread.start()
+        try:
+            while busy['id'] is None:
+                time.sleep(0.001)
+            self.assertIsNone(sampler.sample()['threads']['busy'])  # no earlier sample yet
+            time.sleep(0.2)
+            usage = sampler.sample()['threads']
+        finally:
+            done.set()
+            thread.join()
+
+        self.assertGreater(usage['busy'], 20.0)
+        self.assertIsNone(usage['idle'])
+
+
+if __name__ == '__main__':
+    unittest.main()
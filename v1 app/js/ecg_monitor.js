@@ -17,26 +17,56 @@ function initializeApp() {
     // Démarrer les mises à jour périodiques
     setInterval(updateSystemStats, 2000);
     setInterval(updateDebugInfo, 1000);
+    setInterval(updateSignalQuality, 500);
+}
+
+// Curseur d'échantillon : le serveur ne renvoie que les points plus récents
+let dataCursor = null;
+let fetchInFlight = false;
+const chartData = {};
+Object.keys(charts).forEach(id => chartData[id] = []);
+
+// Réponse binaire (ecg_core/streaming.py) : uint32 seq, float64 premier indice,
+// float32 fréquence, uint16 points par voie, uint16 voies, puis float32 voie par voie
+function decodeFrame(buffer) {
+    const view = new DataView(buffer);
+    const n = view.getUint16(16, true);
+    const channels = [];
+    for (let ch = 0; ch < view.getUint16(18, true); ch++) {
+        channels.push(new Float32Array(buffer, 20 + ch * n * 4, n));
+    }
+    return { first: view.getFloat64(4, true), channels: channels };
+}
+
+function fetchDelta() {
+    if (fetchInFlight) return Promise.resolve();
+    fetchInFlight = true;
+    const cursor = dataCursor === null ? '' : `&cursor=${dataCursor}`;
+    return fetch(`/api/data?format=binary${cursor}`)
+        .then(response => {
+            if (!response.ok) throw new Error('Network response was not ok');
+            dataCursor = parseInt(response.headers.get('X-ECG-Cursor'), 10);
+            return response.arrayBuffer();
+        })
+        .then(buffer => {
+            const frame = decodeFrame(buffer);
+            if (frame.channels[0].length === 0) return;
+            // Même ordre de voies que DATA_CHARTS côté serveur
+            Object.keys(charts).forEach((id, ch) => {
+                const points = chartData[id].concat(Array.from(frame.channels[ch]));
+                chartData[id] = points.slice(-MAX_POINTS);
+                Plotly.update(id, {
+                    y: [chartData[id]],
+                    x: [chartData[id].map((_, i) => i)]
+                });
+            });
+        })
+        .finally(() => { fetchInFlight = false; });
 }
 
 function startDataCollection() {
     updateInterval = setInterval(() => {
-        fetch('/api/data')
-            .then(response => {
-                if (!response.ok) throw new Error('Network response was not ok');
-                return response.json();
-            })
-            .then(data => {
-                Object.entries(charts).forEach(([id, chart]) => {
-                    if (data[id]) {
-                        Plotly.update(id, {
-                            y: [data[id]],
-                            x: [...Array(data[id].length)].map((_, i) => i)
-                        });
-                    }
-                });
-            })
-            .catch(error => console.error('Erreur de mise à jour:', error));
+        fetchDelta().catch(error => console.error('Erreur de mise à jour:', error));
     }, 100);
 }
 
@@ -106,33 +136,19 @@ function fetchData() {
 }
 
 function updateCharts() {
-    fetch('/api/data')
-        .then(response => response.json())
-        .then(data => {
-            Object.entries(charts).forEach(([id, chart]) => {
-                if (data[id]) {
-                    const update = {
-                        y: [data[id]],
-                        x: [...Array(data[id].length)].map((_, i) => i)
-                    };
-                    Plotly.update(id, update, {
-                        xaxis: {
-                            range: [Math.max(0, data[id].length - MAX_POINTS), 
-                                   data[id].length]
-                        }
-                    });
-                }
-            });
-        })
-        .catch(console.error);
+    fetchDelta().catch(console.error);
 }
 
+let ecgCursor = -1;
+
 function updateData() {
     if (!isRecording) return;
 
-    fetch('/api/ecg-data')
+    // Avec un curseur, seuls les nouveaux points transitent
+    fetch(`/api/ecg-data?cursor=${ecgCursor}`)
         .then(response => response.json())
         .then(data => {
+            ecgCursor = data.cursor;
             updateCharts(data);
             
             document.getElementById('heart-rate').textContent = 
@@ -155,6 +171,19 @@ function updateSystemStats() {
         });
 }
 
+// Évaluation SignalQuality (4 par seconde côté serveur) : score du canal le plus dégradé
+function updateSignalQuality() {
+    fetch('/api/signal-quality')
+        .then(response => response.json())
+        .then(quality => {
+            if (!quality) return;
+            const leadOff = quality.lead_off.length ? ` - électrodes: ${quality.lead_off.join(', ').toUpperCase()}` : '';
+            document.getElementById('signal-quality').textContent =
+                `Qualité du signal: ${quality.score}/100 (${quality.label})${leadOff}`;
+        })
+        .catch(error => console.error('Erreur qualité:', error));
+}
+
 function updateDebugInfo() {
     fetch('/api/debug-info')
         .then(response => response.json())
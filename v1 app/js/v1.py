@@ -1,28 +1,67 @@
-import spidev
-import RPi.GPIO as GPIO
+import os
+import sys
 import numpy as np
 import time
-from flask import Flask, render_template, Response, jsonify
+from flask import Flask, render_template, Response, jsonify, request, send_file
 import json
+import tempfile
 from threading import Thread, Lock
-import psutil
 import datetime
-from collections import deque
 from flask_cors import CORS
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from ecg_core.acquisition import DrdyAcquisition
+from ecg_core.clock import SampleClock
+from ecg_core.filters import StreamingFIR, load_fir_coefficients
+from ecg_core.frames import FrameReader
+from ecg_core.qrs import PanTompkinsDetector
+from ecg_core.quality import SignalQuality
+from ecg_core.registers import RegisterMap, data_rate_config
+from ecg_core.hardware import load_backend
+from ecg_core.pyramid import MinMaxPyramid, envelope
+from ecg_core.recording import Recorder, Recording, compress_recording
+from ecg_core.ring_buffer import RingBuffer
+from ecg_core.streaming import MAX_FRAME_SAMPLES, pack_frame, read_since
+from ecg_core.system_stats import SystemStatsSampler
+
+spidev, GPIO = load_backend()  # ECG_BACKEND=sim runs on the simulated ADS1292R
+
+# Libellés de SignalQuality pour debug_info['signal_quality'] (canal 1)
+QUALITY_LABELS = {
+    'good': 'OK',
+    'fair': 'Signal moyen',
+    'noisy': 'Signal bruité',
+    'weak': 'Signal faible',
+    'flat': 'Pas de signal',
+    'saturated': 'Signal saturé',
+    'lead_off': 'Électrode déconnectée'
+}
+
 # Configuration des broches selon Data.txt aand ext
 class Configuration:
     MOSI_PIN = 10  # GPIO10 (Pin 19)
     MISO_PIN = 9   # GPIO9 (Pin 21)
     SCK_PIN = 11   # GPIO11 (Pin 23)
-    CS_PIN = 8     # GPIO8 (Pin 24)
+    CS_PIN = 8     # GPIO8 (Pin 24) - CE0, piloté par le contrôleur SPI
     DRDY_PIN = 17  # GPIO17 (Pin 11)
     PWDN_PIN = 27  # GPIO27 (Pin 13)
     START_PIN = 22 # GPIO22 (Pin 15)
+    SAMPLE_RATE = 125  # SPS, écrit dans CONFIG1 (125 à 8000)
+    FRAME_BLOCK = 5    # Trames décodées par bloc (40 ms à 125 SPS)
+    VREF = 2.4         # Tension de référence
+    FIR_COEFFS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'filter_coeffs.txt')
+    RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'recordings')
+    RECORDING_COMPRESSION = None  # 'zlib', 'bz2' ou 'lzma' : blocs compressés sans perte (plus de memmap direct)
+    HISTORY_BUCKETS = 8192  # enveloppes min/max gardées par niveau (niveau 2 : 70 min à 125 SPS)
+    STATS_PERIOD = 1.0  # secondes entre deux relevés CPU/mémoire/température
+    STATS_HISTORY = 300  # relevés gardés pour le tableau de bord
+    QUALITY_WINDOW = 2.0  # secondes de signal évaluées par SignalQuality
+    QUALITY_INTERVAL = 0.25  # secondes de signal entre deux évaluations
+    MAINS_FREQ = 50.0  # Hz, secteur
+    LEAD_OFF_DETECTION = False  # comparateurs LOFF (CONFIG2) et courant DC sur IN1P/N, IN2P/N (LOFF_SENS)
 
 
 class ECGSystem:
-    WREG = 0x40  # Define WREG as 0x40
 
     def __init__(self):
         self.spi = spidev.SpiDev()
@@ -31,26 +70,25 @@ class ECGSystem:
         self.spi.mode = 1
         
         self.signal_buffers = {
-            'raw_ch1': deque(maxlen=5000),
-            'raw_ch2': deque(maxlen=5000),
-            'filtered_ch1': deque(maxlen=5000),
-            'filtered_ch2': deque(maxlen=5000)
+            'raw_ch1': RingBuffer(5000),
+            'raw_ch2': RingBuffer(5000),
+            'filtered_ch1': RingBuffer(5000),
+            'filtered_ch2': RingBuffer(5000)
         }
         
-        # Coefficients de filtrage (repris du code Arduino)
-        self.filter_coeffs = np.array([
-            -72, 122, -31, -99, 117, 0, -121, 105, 34,
-            -137, 84, 70, -146, 55, 104, -147, 20, 135
-            # ... (utiliser les mêmes coefficients que dans le code Arduino)
-        ]) / 32768.0  # Normalisation
+        # Coefficients de filtrage (table Q15 du code Arduino, normalisée)
+        self.filter_coeffs = load_fir_coefficients(Configuration.FIR_COEFFS_FILE)
         
-        self.filter_state_ch1 = np.zeros(len(self.filter_coeffs))
-        self.filter_state_ch2 = np.zeros(len(self.filter_coeffs))
+        # Pyramide min/max des voies filtrées, pour les vues dézoomées (/api/history)
+        self.pyramid = MinMaxPyramid(channels=2, capacity=Configuration.HISTORY_BUCKETS)
         
-        # Configuration du logging
-        self.log_file = 'ecg_data.json'
-        self.last_log_time = time.time()
-        self.log_interval = 1.0  # Intervalle en secondes
+        # Filtre FIR en flux : une ligne à retard par canal, traitement par blocs
+        self.fir = StreamingFIR(self.filter_coeffs, channels=2)
+        
+        # Enregistrement binaire (ecg_core.recording) : écritures sur disque hors du thread DRDY
+        self.recorder = None
+        # Copie des registres de l'ADS1292R : écritures groupées, lectures de debug servies depuis la copie
+        self.registers = RegisterMap(self.spi)
         
         # Ajout des paramètres de sensibilité
         self.gain_settings = {
@@ -64,11 +102,11 @@ class ECGSystem:
         }
         self.current_gain = '6x'  # Gain par défaut
         
-        self.data_buffer = deque(maxlen=5000)
-        self.heart_rate_buffer = deque(maxlen=10)
         self.data_lock = Lock()
         
-        self.last_peak_time = time.time()
+        # Détection QRS en flux sur filtered_ch1 : indices d'échantillon, pas d'horloge murale
+        # (lazy : filtre en Python pur, SciPy n'est pas importé au démarrage)
+        self.qrs = PanTompkinsDetector(Configuration.SAMPLE_RATE, lazy=True)
         self.heart_rate = 0
         
         # System stats initialization
@@ -93,51 +131,53 @@ class ECGSystem:
         # Initialize hardware after all variables are set
         self.setup_gpio()
         self.initialize_ads1292r()
-
-    def get_cpu_temperature(self):
-        try:
-            with open('/sys/class/thermal/thermal_zone0/temp', 'r') as temp_file:
-                temp = float(temp_file.read()) / 1000.0
-            return temp
-        except:
-            return 0
+        
+        # Lecture cadencée par le front descendant de DRDY, décodage par blocs
+        self.frame_reader = FrameReader(
+            self.spi,
+            block_size=Configuration.FRAME_BLOCK,
+            gain=int(self.current_gain.replace('x', '')),
+            vref=Configuration.VREF
+        )
+        self.acquisition = DrdyAcquisition(
+            GPIO, Configuration.DRDY_PIN, self.read_data, Configuration.SAMPLE_RATE
+        )
+        # Horloge d'échantillonnage : droite indice de conversion -> temps, ajustée sur les fronts de DRDY
+        self.clock = SampleClock(Configuration.SAMPLE_RATE)
+        
+        # Qualité du signal sur une fenêtre glissante, bits LOFF_STAT compris
+        self.quality = self._create_quality()
+        
+        # Relevés système en arrière-plan : les requêtes ne lisent que le dernier instantané
+        self.system_sampler = SystemStatsSampler(
+            Configuration.STATS_PERIOD, Configuration.STATS_HISTORY,
+            threads={'acquisition': lambda: self.acquisition.thread_id}
+        )
+        self.system_sampler.start()
 
     def update_system_stats(self):
+        snapshot = self.system_sampler.snapshot()
         self.system_stats.update({
-            'cpu_temp': self.get_cpu_temperature(),
-            'cpu_usage': psutil.cpu_percent(),
-            'memory_usage': psutil.virtual_memory().percent,
-            'samples_collected': len(self.data_buffer),
+            'cpu_temp': snapshot['temperature_c'] or 0,
+            'cpu_usage': snapshot['cpu_percent'],
+            'memory_usage': snapshot['memory_percent'],
+            'process': snapshot['process'],
+            'threads': snapshot['threads'],
+            'samples_collected': self.signal_buffers['raw_ch1'].total,
+            'clock': self.clock.stats(),
             'uptime': str(datetime.datetime.now() - self.system_stats['start_time'])
         })
 
-    def calculate_heart_rate(self, new_value):
-        threshold = 1.0
-        if new_value > threshold:
-            current_time = time.time()
-            time_diff = current_time - self.last_peak_time
-            if time_diff > 0.4:  # Éviter les faux positifs
-                heart_rate = 60 / time_diff
-                self.heart_rate_buffer.append(heart_rate)
-                self.heart_rate = np.mean(self.heart_rate_buffer)
-                self.last_peak_time = current_time
-
     def setup_gpio(self):
         GPIO.setwarnings(False)
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(Configuration.DRDY_PIN, GPIO.IN)
         GPIO.setup(Configuration.START_PIN, GPIO.OUT)
         GPIO.setup(Configuration.PWDN_PIN, GPIO.OUT)
-        GPIO.setup(Configuration.CS_PIN, GPIO.OUT)
+        # CS (CE0) reste piloté par le contrôleur SPI matériel
         
         GPIO.output(Configuration.PWDN_PIN, GPIO.HIGH)
         GPIO.output(Configuration.START_PIN, GPIO.LOW)
-        GPIO.output(Configuration.CS_PIN, GPIO.HIGH)
-        
-    def write_register(self, address, value):
-        GPIO.output(Configuration.CS_PIN, GPIO.LOW)
-        self.spi.xfer2([self.WREG | address, 0x00, value])
-        GPIO.output(Configuration.CS_PIN, GPIO.HIGH)
         
     def initialize_ads1292r(self):
         try:
@@ -148,35 +188,26 @@ class ECGSystem:
             time.sleep(0.1)
             
             # Stop data continuous
-            GPIO.output(Configuration.CS_PIN, GPIO.LOW)
-            self.spi.xfer2([0x11])  # SDATAC command
-            GPIO.output(Configuration.CS_PIN, GPIO.HIGH)
+            self.registers.set_continuous(False)  # SDATAC command
             time.sleep(0.05)
             
-            # Configuration registres avec vérification
-            registers = [
-                (0x01, 0x00),  # CONFIG1: 125 SPS
-                (0x02, 0xA0),  # CONFIG2: Test signals disabled
-                (0x03, 0xE0),  # LOFF: Lead-off detection off
-                (0x04, 0x60),  # CH1SET: Gain 12, normal electrode input
-                (0x05, 0x60),  # CH2SET: Gain 12, normal electrode input
-                (0x06, 0x2C),  # RLD_SENS
-                (0x07, 0x00),  # LOFF_SENS
-                (0x08, 0x00),  # LOFF_STAT
-                (0x09, 0xF2),  # RESP1: Resp modulation/demod enabled
-                (0x0A, 0x03)   # RESP2: Resp modulation frequency
-            ]
-            
-            for reg_addr, reg_value in registers:
-                for _ in range(3):  # 3 tentatives par registre
-                    if self._write_verify_register(reg_addr, reg_value):
-                        break
-                    time.sleep(0.01)
+            # Configuration registres : une écriture en rafale, une relecture de vérification
+            failed = self.registers.write({
+                0x01: data_rate_config(Configuration.SAMPLE_RATE),  # CONFIG1
+                0x02: 0xE0 if Configuration.LEAD_OFF_DETECTION else 0xA0,  # CONFIG2: Test signals disabled, PDB_LOFF_COMP
+                0x03: 0xE0,  # LOFF: Lead-off detection off
+                0x04: self.gain_settings[self.current_gain],  # CH1SET: gain courant (lsb, en-tête d'enregistrement), entrée normale
+                0x05: self.gain_settings[self.current_gain],  # CH2SET: idem
+                0x06: 0x2C,  # RLD_SENS
+                0x07: 0x0F if Configuration.LEAD_OFF_DETECTION else 0x00,  # LOFF_SENS
+                0x08: 0x00,  # LOFF_STAT
+                0x09: 0xF2,  # RESP1: Resp modulation/demod enabled
+                0x0A: 0x03   # RESP2: Resp modulation frequency
+            })
+            self._check_registers(failed)
             
             # Démarrer l'acquisition continue
-            GPIO.output(Configuration.CS_PIN, GPIO.LOW)
-            self.spi.xfer2([0x10])  # RDATAC command
-            GPIO.output(Configuration.CS_PIN, GPIO.HIGH)
+            self.registers.set_continuous(True)  # RDATAC command
             time.sleep(0.01)
             
             # Start conversion
@@ -188,160 +219,138 @@ class ECGSystem:
             self.debug_info['last_error'] = f"Init error: {str(e)}"
             return False
 
-    def _write_verify_register(self, reg_addr, reg_value):
-        try:
-            # Write register
-            GPIO.output(Configuration.CS_PIN, GPIO.LOW)
-            self.spi.xfer2([0x40 | reg_addr, 0x00, reg_value])
-            GPIO.output(Configuration.CS_PIN, GPIO.HIGH)
-            time.sleep(0.001)
-            
-            # Read back for verification
-            GPIO.output(Configuration.CS_PIN, GPIO.LOW)
-            result = self.spi.xfer2([0x20 | reg_addr, 0x00, 0x00])
-            GPIO.output(Configuration.CS_PIN, GPIO.HIGH)
-            
-            if result[2] != reg_value:
-                self.debug_info['last_error'] = f"Register write failed - 0x{reg_addr:X}: expected 0x{reg_value:X}, got 0x{result[2]:X}"
-                return False
-            
-            return True
-            
-        except Exception as e:
-            self.debug_info['last_error'] = f"Register write error: {str(e)}"
-            return False
+    def _check_registers(self, failed):
+        # failed : adresses dont la relecture diffère de la valeur écrite
+        for reg_addr in failed:
+            self.debug_info['last_error'] = (
+                f"Register write failed - 0x{reg_addr:X}: got 0x{self.registers[reg_addr]:X}"
+            )
+        return not failed
 
-    def debug_registers(self):
+    def debug_registers(self, refresh=False):
+        # Valeurs de la copie ; refresh relit toute la table en une rafale (pause de l'acquisition < 1 ms)
         try:
-            # Lecture des registres importants
-            registers_to_check = {
-                'CONFIG1': 0x01,
-                'CONFIG2': 0x02,
-                'LOFF': 0x03,
-                'CH1SET': 0x04,
-                'CH2SET': 0x05,
-                'RLD_SENS': 0x06
+            if refresh:
+                self.registers.refresh()
+            self.debug_info['register_values'] = {
+                name: hex(value) for name, value in self.registers.snapshot().items()
             }
-            
-            for name, addr in registers_to_check.items():
-                GPIO.output(Configuration.CS_PIN, GPIO.LOW)
-                data = self.spi.xfer2([0x20 | addr, 0x00])  # 0x20 pour lire
-                GPIO.output(Configuration.CS_PIN, GPIO.HIGH)
-                self.debug_info['register_values'][name] = hex(data[1])
-                
             return True
         except Exception as e:
             self.debug_info['last_error'] = str(e)
             return False
 
-    def check_signal_quality(self, data_sample):
-        if data_sample is None:
-            return "Pas de signal"
-        
-        # Vérification de la plage du signal
-        if abs(data_sample) < 0.1:
-            return "Signal faible"
-        elif abs(data_sample) > 2.0:
-            return "Signal saturé"
-        
-        return "OK"
+    def _create_quality(self):
+        # La pleine échelle dépend du gain : à recréer après set_gain
+        return SignalQuality.for_reader(
+            self.frame_reader, Configuration.SAMPLE_RATE,
+            window=Configuration.QUALITY_WINDOW,
+            interval=Configuration.QUALITY_INTERVAL,
+            mains_hz=Configuration.MAINS_FREQ
+        )
 
     def read_data(self):
+        # Appelée par DrdyAcquisition juste après le front de DRDY
         try:
-            if GPIO.input(Configuration.DRDY_PIN) == 0:
-                GPIO.output(Configuration.CS_PIN, GPIO.LOW)
-                time.sleep(0.0001)
-                
-                data = self.spi.xfer2([0x00] * 9)
-                GPIO.output(Configuration.CS_PIN, GPIO.HIGH)
-                
-                status = data[0]
-                ch1_data = self._convert_24bit_to_int(data[1:4])
-                ch2_data = self._convert_24bit_to_int(data[4:7])
-                
-                # Ajustement de l'échelle et conversion en mV
-                vref = 2.4  # Tension de référence
-                gain_factor = int(self.current_gain.replace('x', ''))
-                
-                ch1_mv = (ch1_data * vref) / (gain_factor * 0x7FFFFF)
-                ch2_mv = (ch2_data * vref) / (gain_factor * 0x7FFFFF)
-                
-                self._process_and_store_data((ch1_mv, ch2_mv))
-                self.debug_info['signal_quality'] = self.check_signal_quality(ch1_mv)
-                
-                return ch1_mv, ch2_mv
-                
+            # Verrou de la table des registres : une reconfiguration ne coupe jamais une trame
+            with self.registers.lock:
+                block = self.frame_reader.read_block()
+            if block is None:
+                return None
+            
+            status, values = block
+            # Indice et instant du front de la dernière trame du bloc
+            index = self.acquisition.sample_index
+            self.clock.observe(index, self.acquisition.sample_ns)
+            self._process_and_store_data(values, status, index - len(values) + 1)
+            assessment = self.quality.update(status, values)
+            if assessment is not None:
+                self.debug_info['signal_quality'] = QUALITY_LABELS[assessment['channels'][0]['label']]
+            
+            return values
+            
         except Exception as e:
             self.debug_info['last_error'] = f"Read error: {str(e)}"
             return None
 
-    def apply_filter(self, data, state):
-        # Implémentation du filtre FIR
-        filtered = np.convolve(data, self.filter_coeffs, mode='valid')
-        return filtered[-1]
-
-    def _process_and_store_data(self, data):
-        if data is None or not isinstance(data, (list, tuple)) or len(data) != 2:
+    def _process_and_store_data(self, data, status=None, first_index=None):
+        # data : bloc (n, 2) de tensions, une colonne par canal ; first_index : indice de conversion de sa 1re trame
+        if data is None or np.ndim(data) != 2 or np.shape(data)[1] != 2:
             return
         
-        ch1, ch2 = data
         with self.data_lock:
+            # Copie dans le bloc d'enregistrement en cours, le thread d'écriture fait le reste
+            if self.recorder is not None and status is not None:
+                # Heures des trames calculées en bloc par le modèle d'horloge
+                times = self.clock.wall_times(first_index, len(data)) if first_index is not None else None
+                self.recorder.write(status, data, times)
+            
             # Stockage données brutes
-            self.signal_buffers['raw_ch1'].append(ch1)
-            self.signal_buffers['raw_ch2'].append(ch2)
+            self.signal_buffers['raw_ch1'].extend(data[:, 0])
+            self.signal_buffers['raw_ch2'].extend(data[:, 1])
             
-            # Application du filtrage
-            filtered_ch1 = self.apply_filter(
-                np.array(list(self.signal_buffers['raw_ch1'])[-161:]), 
-                self.filter_state_ch1
-            )
-            filtered_ch2 = self.apply_filter(
-                np.array(list(self.signal_buffers['raw_ch2'])[-161:]), 
-                self.filter_state_ch2
-            )
+            # Application du filtrage sur tout le bloc
+            filtered = self.fir.process(data)
             
-            self.signal_buffers['filtered_ch1'].append(filtered_ch1)
-            self.signal_buffers['filtered_ch2'].append(filtered_ch2)
+            self.signal_buffers['filtered_ch1'].extend(filtered[:, 0])
+            self.signal_buffers['filtered_ch2'].extend(filtered[:, 1])
+            self.pyramid.update(filtered)
             
             # Détection QRS et calcul du rythme cardiaque
-            self.detect_qrs_and_calculate_hr(filtered_ch1)
-
-    def _convert_24bit_to_int(self, data_bytes):
-        # Conversion des données 24-bit en entier signé
-        value = (data_bytes[0] << 16) | (data_bytes[1] << 8) | data_bytes[2]
-        if value & 0x800000:
-            value -= 0x1000000
-        return value
+            if self.qrs.process(filtered[:, 0]):
+                self.heart_rate = self.qrs.heart_rate() or 0
 
     def set_gain(self, gain):
         if gain not in self.gain_settings:
             return False
         
         self.current_gain = gain
-        # Mettre à jour les deux canaux
-        success1 = self._write_verify_register(0x04, self.gain_settings[gain])
-        success2 = self._write_verify_register(0x05, self.gain_settings[gain])
-        return success1 and success2
-
-    def detect_qrs_and_calculate_hr(self, filtered_data):
-        # Implémentation simple de la détection QRS
-        threshold = 0.5  # Ajustez ce seuil selon vos besoins
-        peaks = []
-
-        for i in range(1, len(filtered_data) - 1):
-            if filtered_data[i] > threshold and filtered_data[i] > filtered_data[i - 1] and filtered_data[i] > filtered_data[i + 1]:
-                peaks.append(i)
-
-        # Calculer le rythme cardiaque basé sur les pics détectés
-        if len(peaks) > 1:
-            intervals = np.diff(peaks)  # Intervalles entre les pics
-            if len(intervals) > 0:
-                avg_interval = np.mean(intervals) * 0.002  # Convertir en secondes (500Hz)
-                if avg_interval > 0:
-                    self.heart_rate = 60 / avg_interval  # Calculer le rythme cardiaque
-                    self.heart_rate_buffer.append(self.heart_rate)
-                    if len(self.heart_rate_buffer) > 10:
-                        self.heart_rate_buffer.popleft()  # Limiter la taille du buffer
+        self.frame_reader.set_gain(int(gain.replace('x', '')))
+        self.quality = self._create_quality()
+        # Les deux canaux en une transaction (CH1SET et CH2SET se suivent)
+        success = self._check_registers(self.registers.write({
+            'CH1SET': self.gain_settings[gain],
+            'CH2SET': self.gain_settings[gain]
+        }))
+        # L'en-tête d'un enregistrement fixe le gain : on en commence un nouveau
+        if self.recorder is not None and self.recorder.running:
+            self.stop_recording()
+            self.start_recording()
+        return success
+
+    def set_lead_off(self, enabled):
+        # Comparateurs (CONFIG2) et courants (LOFF_SENS) en une seule écriture de 0x02 à 0x07
+        return self._check_registers(self.registers.write({
+            'CONFIG2': 0xE0 if enabled else 0xA0,
+            'LOFF_SENS': 0x0F if enabled else 0x00
+        }))
+
+    def start_recording(self):
+        if self.recorder is not None and self.recorder.running:
+            return self.recorder
+        # Millisecondes : un changement de gain relance l'enregistrement dans la même seconde
+        name = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')[:-3] + '.ecg'
+        gain = int(self.current_gain.replace('x', ''))
+        recorder = Recorder(
+            os.path.join(Configuration.RECORDINGS_DIR, name),
+            Configuration.SAMPLE_RATE,
+            self.frame_reader.lsb,
+            gain=(gain, gain),
+            vref=Configuration.VREF,
+            registers=self.registers.shadow,
+            compression=Configuration.RECORDING_COMPRESSION
+        )
+        # Sous le verrou : le premier échantillon enregistré est exactement raw_ch1.total
+        with self.data_lock:
+            recorder.start(first_index=self.signal_buffers['raw_ch1'].total)
+            self.recorder = recorder
+        return recorder
+
+    def stop_recording(self):
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.stop()
+        return recorder
 
 # Application Flask
 app = Flask(__name__)
@@ -363,18 +372,103 @@ def system_stats():
     ecg_system.update_system_stats()
     return jsonify(ecg_system.system_stats)
 
-@app.route('/api/ecg-data')
-def ecg_data():
+@app.route('/api/system-stats/history')
+def system_stats_history():
+    """Relevés des ?seconds= dernières secondes (tout l'historique par défaut)"""
+    return jsonify(ecg_system.system_sampler.history(request.args.get('seconds', type=float)))
+
+# Voies renvoyées par /api/data, dans l'ordre des canaux du format binaire
+DATA_CHARTS = (
+    ('raw-ch1-chart', 'raw_ch1'),
+    ('raw-ch2-chart', 'raw_ch2'),
+    ('filtered-ch1-chart', 'filtered_ch1'),
+    ('filtered-ch2-chart', 'filtered_ch2')
+)
+
+def read_delta(names, default_points=None):
+    """Échantillons d'indice >= ?cursor= (ou les default_points derniers sans curseur)"""
+    buffers = [ecg_system.signal_buffers[name] for name in names]
+    cursor = request.args.get('cursor', type=int)
+    binary = request.args.get('format') == 'binary'
+    # Sous le verrou : uniquement la copie des nouveaux échantillons, la sérialisation se fait après
     with ecg_system.data_lock:
-        data = {
-            'ecg_data': list(ecg_system.data_buffer),
-            'heart_rate': ecg_system.heart_rate
-        }
+        if cursor is None:
+            cursor = buffers[0].total - default_points if default_points else 0
+        first, values = read_since(buffers, cursor, dtype=np.float32 if binary else np.float64)
+        heart_rate = ecg_system.heart_rate
+        # Les pics R sont connus avec un retard : on renvoie les dix derniers indices
+        r_peaks = [int(peak) for peak in ecg_system.qrs.peaks[-10:]]
+    return first, values, heart_rate, r_peaks, binary
+
+def delta_response(first, values, keys, binary, **fields):
+    cursor = first + values.shape[1]
+    if binary:
+        # En-tête de 20 octets puis float32 voie par voie (ecg_core.streaming.pack_frame)
+        headers = {'X-ECG-Cursor': str(cursor)}
+        for key, value in fields.items():
+            value = ','.join(map(str, value)) if isinstance(value, list) else str(value)
+            headers[f"X-ECG-{key.replace('_', '-')}"] = value
+        return Response(pack_frame(0, first, Configuration.SAMPLE_RATE, values),
+                        mimetype='application/octet-stream', headers=headers)
+    data = {'first': first, 'cursor': cursor}
+    data.update(zip(keys, values.tolist()))
+    data.update(fields)
+    return jsonify(data)
+
+def envelope_response(first, step, mins, maxs, keys, binary, sample_rate, **fields):
+    """Enveloppe min/max : une paire de voies <clé>_min / <clé>_max par voie, step échantillons par point"""
+    values = np.empty((2 * len(keys), mins.shape[1]), dtype=np.float32 if binary else np.float64)
+    values[0::2] = mins
+    values[1::2] = maxs
+    names = [f'{key}_{side}' for key in keys for side in ('min', 'max')]
+    sample_rate = sample_rate / step
+    if binary:
+        headers = {'X-ECG-Step': str(step), 'X-ECG-Channels': ','.join(names)}
+        headers.update({f"X-ECG-{key.replace('_', '-')}": str(value) for key, value in fields.items()})
+        return Response(pack_frame(0, first, sample_rate, values),
+                        mimetype='application/octet-stream', headers=headers)
+    data = {'first': first, 'step': step, 'sample_rate': sample_rate}
+    data.update(zip(names, values.tolist()))
+    data.update(fields)
     return jsonify(data)
 
+def requested_width():
+    # Largeur du graphique en pixels : un point min/max par pixel
+    return min(max(request.args.get('width', 1000, type=int), 1), MAX_FRAME_SAMPLES)
+
+@app.route('/api/history')
+def history():
+    """Les ?seconds= dernières secondes des voies filtrées, au niveau de pyramide adapté à ?width="""
+    width = requested_width()
+    buffers = [ecg_system.signal_buffers['filtered_ch1'], ecg_system.signal_buffers['filtered_ch2']]
+    with ecg_system.data_lock:
+        end = buffers[0].total
+        start = max(0, end - int(request.args.get('seconds', 60.0, type=float) * Configuration.SAMPLE_RATE))
+        level = ecg_system.pyramid.choose_level(end - start, width)
+        if level == 0 or start >= buffers[0].oldest:
+            # Tout est encore dans les tampons : échantillons bruts
+            first, values = read_since(buffers, start, dtype=np.float64)
+            mins = maxs = values.T
+            size = 1
+        else:
+            first, mins, maxs = ecg_system.pyramid.read(level, start, end)
+            mins, maxs = mins.copy(), maxs.copy()
+            size = ecg_system.pyramid.bucket(level)
+            first *= size
+    group, mins, maxs = envelope(mins, maxs, width)
+    return envelope_response(first, size * group, mins.T, maxs.T, ['filtered_ch1', 'filtered_ch2'],
+                             request.args.get('format') == 'binary', Configuration.SAMPLE_RATE, end=end)
+
+@app.route('/api/ecg-data')
+def ecg_data():
+    first, values, heart_rate, r_peaks, binary = read_delta(['filtered_ch1'])
+    return delta_response(first, values, ['ecg_data'], binary, heart_rate=heart_rate, r_peaks=r_peaks)
+
 @app.route('/api/debug-info')
 def get_debug_info():
     try:
+        # Registres depuis la copie ; ?refresh=1 les relit sur le bus SPI
+        ecg_system.debug_registers(refresh=request.args.get('refresh') == '1')
         return jsonify({
             'debug_info': {
                 'drdy_status': GPIO.input(Configuration.DRDY_PIN) == 0,
@@ -382,7 +476,9 @@ def get_debug_info():
                 'signal_quality': ecg_system.debug_info['signal_quality'],
                 'last_error': ecg_system.debug_info['last_error'],
                 'register_values': ecg_system.debug_info['register_values'],
-                'raw_data': list(ecg_system.signal_buffers['raw_ch1'])[-10:]  # Derniers points
+                'register_stats': ecg_system.registers.stats(),
+                'raw_data': ecg_system.signal_buffers['raw_ch1'].latest(10).tolist(),  # Derniers points
+                'acquisition': ecg_system.acquisition.stats()
             }
         })
     except Exception as e:
@@ -397,20 +493,157 @@ def get_debug_info():
             }
         })
 
+@app.route('/api/signal-quality')
+def signal_quality():
+    """Dernière évaluation (score 0-100, libellé, métriques et électrodes déconnectées par canal)"""
+    return jsonify(ecg_system.quality.latest)
+
 @app.route('/api/set-gain/<gain>')
 def set_gain_route(gain):
     success = ecg_system.set_gain(gain)
     return jsonify({'success': success, 'current_gain': ecg_system.current_gain})
 
+@app.route('/api/set-lead-off/<state>')
+def set_lead_off_route(state):
+    success = ecg_system.set_lead_off(state == 'on')
+    return jsonify({'success': success, 'lead_off': state == 'on'})
+
+@app.route('/api/registers')
+def registers_route():
+    """Table des registres (copie) ; ?refresh=1 la relit d'abord en une rafale"""
+    if request.args.get('refresh') == '1':
+        try:
+            ecg_system.registers.refresh()
+        except Exception as e:
+            ecg_system.debug_info['last_error'] = str(e)
+            return jsonify({'error': f"Register read failed: {str(e)}"}), 500
+    return jsonify({
+        'registers': {name: hex(value) for name, value in ecg_system.registers.snapshot().items()},
+        'stats': ecg_system.registers.stats()
+    })
+
 @app.route('/api/data')
 def get_data():
-    with ecg_system.data_lock:
-        return jsonify({
-            'raw-ch1-chart': list(ecg_system.signal_buffers['raw_ch1'])[-100:],
-            'raw-ch2-chart': list(ecg_system.signal_buffers['raw_ch2'])[-100:],
-            'filtered-ch1-chart': list(ecg_system.signal_buffers['filtered_ch1'])[-100:],
-            'filtered-ch2-chart': list(ecg_system.signal_buffers['filtered_ch2'])[-100:]
-        })
+    first, values, _, _, binary = read_delta([name for _, name in DATA_CHARTS], default_points=100)
+    return delta_response(first, values, [key for key, _ in DATA_CHARTS], binary)
+
+@app.route('/api/recording/<action>', methods=['GET', 'POST'])
+def recording_route(action):
+    if action == 'start':
+        recorder = ecg_system.start_recording()
+    elif action == 'stop':
+        recorder = ecg_system.stop_recording()
+    elif action == 'status':
+        recorder = ecg_system.recorder
+    else:
+        return jsonify({'error': f"Action inconnue : {action}"}), 404
+    return jsonify(recorder.stats() if recorder is not None else {'running': False})
+
+@app.route('/api/recordings')
+def list_recordings():
+    recordings = []
+    if os.path.isdir(Configuration.RECORDINGS_DIR):
+        for name in sorted(os.listdir(Configuration.RECORDINGS_DIR)):
+            if not name.endswith('.ecg'):
+                continue
+            try:
+                recording = Recording(os.path.join(Configuration.RECORDINGS_DIR, name))
+            except (OSError, ValueError):
+                continue
+            recordings.append({
+                'id': name[:-len('.ecg')],
+                'start_time': recording.start_time / 1e9,
+                'sample_rate': recording.sample_rate,
+                'frames': len(recording),
+                'duration': recording.duration
+            })
+    return jsonify({'recordings': recordings})
+
+def open_recording(rec_id):
+    path = os.path.join(Configuration.RECORDINGS_DIR, f'{rec_id}.ecg')
+    if os.path.basename(rec_id) != rec_id or not os.path.isfile(path):
+        return None
+    return Recording(path)
+
+def parse_position(value, recording, default):
+    """Indice d'échantillon pour ?start= / ?end= : secondes depuis le début, ou heure ISO 8601 / HH:MM:SS"""
+    if not value:
+        return default
+    try:
+        return min(max(int(round(float(value) * recording.sample_rate)), 0), len(recording))
+    except ValueError:
+        pass
+    started = datetime.datetime.fromtimestamp(recording.start_time / 1e9)
+    try:
+        moment = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        moment = datetime.datetime.combine(started.date(), datetime.time.fromisoformat(value))
+        if moment < started - datetime.timedelta(hours=12):  # heure du lendemain (après minuit)
+            moment += datetime.timedelta(days=1)
+    # Heure -> indice par l'index des blocs, pas par la fréquence nominale
+    return recording.index_at(int(moment.timestamp() * 1e9))
+
+@app.route('/api/recordings/<rec_id>/range')
+def recording_range(rec_id):
+    recording = open_recording(rec_id)
+    if recording is None:
+        return jsonify({'error': f"Enregistrement inconnu : {rec_id}"}), 404
+    try:
+        start = parse_position(request.args.get('start'), recording, 0)
+        end = max(start, parse_position(request.args.get('end'), recording, len(recording)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    channel = request.args.get('channel', type=int)  # 1 ou 2, les deux par défaut
+    keys = ['ch1', 'ch2']
+    binary = request.args.get('format') == 'binary'
+    start_time = recording.time_at(start) / 1e9
+    
+    # ?width= : enveloppe min/max lue au niveau de pyramide adapté à la largeur en pixels
+    if 'width' in request.args:
+        first, step, mins, maxs = recording.envelope(start, end, requested_width())
+        if channel in (1, 2):
+            mins, maxs, keys = mins[channel - 1:channel], maxs[channel - 1:channel], keys[channel - 1:channel]
+        return envelope_response(first, step, mins, maxs, keys, binary, recording.sample_rate,
+                                 end=end, start_time=start_time)
+    
+    # Décimation côté serveur : au plus ?points= valeurs par voie (moyenne par groupes)
+    points = min(max(request.args.get('points', MAX_FRAME_SAMPLES, type=int), 1), MAX_FRAME_SAMPLES)
+    step, values = recording.read(start, end, max_points=points)
+    if channel in (1, 2):
+        values, keys = values[channel - 1:channel], keys[channel - 1:channel]
+    
+    sample_rate = recording.sample_rate / step
+    if binary:
+        headers = {'X-ECG-End': str(end), 'X-ECG-Step': str(step), 'X-ECG-Start-Time': str(start_time)}
+        return Response(pack_frame(0, start, sample_rate, values),
+                        mimetype='application/octet-stream', headers=headers)
+    data = {'id': rec_id, 'first': start, 'end': end, 'step': step,
+            'sample_rate': sample_rate, 'start_time': start_time}
+    data.update(zip(keys, values.tolist()))
+    return jsonify(data)
+
+@app.route('/api/recordings/<rec_id>/export')
+def export_recording(rec_id):
+    """Copie compressée sans perte (?compression=zlib|bz2|lzma), lisible par ecg_core.recording.Recording"""
+    recording = open_recording(rec_id)
+    if recording is None:
+        return jsonify({'error': f"Enregistrement inconnu : {rec_id}"}), 404
+    # Copie propre à chaque requête (avec ses fichiers d'index et de pyramide), supprimée une fois envoyée
+    export_dir = tempfile.TemporaryDirectory(prefix='ecg-export-')
+    path = os.path.join(export_dir.name, os.path.basename(recording.path) + 'z')
+    try:
+        compress_recording(recording.path, path, request.args.get('compression', 'zlib'))
+        response = send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                             download_name=os.path.basename(path))
+    except ValueError as e:
+        export_dir.cleanup()
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        export_dir.cleanup()
+        raise
+    response.call_on_close(export_dir.cleanup)
+    return response
 
 @app.route('/api/raw-signals')
 def get_raw_signals():
@@ -423,9 +656,8 @@ def get_raw_signals():
     })
 
 def data_collection_thread():
-    while True:
-        ecg_system.read_data()
-        time.sleep(0.002)  # 500Hz sampling rate
+    # Bloque sur DRDY au lieu de dormir : une trame par conversion
+    ecg_system.acquisition.run()
 
 if __name__ == '__main__':
     Thread(target=data_collection_thread, daemon=True).start()
@@ -1,11 +1,21 @@
 import logging
+import os
+import sys
 import time
-import numpy as np
-from flask import Flask, render_template
+from flask import Flask, render_template, request
 from flask_socketio import SocketIO
-import spidev
-import RPi.GPIO as GPIO
-from scipy.signal import butter, lfilter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ecg_core.acquisition import DrdyAcquisition
+from ecg_core.broadcast import BroadcastHub
+from ecg_core.filters import SosFilterChain, design_sos
+from ecg_core.frames import FrameReader
+from ecg_core.hardware import load_backend
+from ecg_core.registers import data_rate_config
+from ecg_core.ring_buffer import RingBuffer
+from ecg_core.streaming import FrameStreamer
+
+spidev, GPIO = load_backend()  # ECG_BACKEND=sim runs on the simulated ADS1292R
 
 # Configuration
 SPI_BUS = 0
@@ -13,6 +23,10 @@ SPI_DEVICE = 0
 SAMPLE_RATE = 500  # Hz
 BUFFER_SIZE = 1000
 ECG_CHANNEL = 1  # Use channel 1 for ECG
+FRAME_BLOCK = 20  # Frames decoded per block (40 ms at 500 SPS, one stream frame)
+STREAM_RATE = 25  # Binary 'ecg_frame' messages per second
+CLIENT_QUEUE = 50  # Messages queued per viewer before it counts as lagging
+LAGGARD_POLICY = 'degrade'  # 'drop', 'degrade' (decimate its stream) or 'disconnect'
 
 # GPIO Pins (BCM numbering)
 GPIO_CONFIG = {
@@ -29,16 +43,29 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 class ECGMonitor:
     def __init__(self):
         self.running = False
-        self.buffer = np.zeros(BUFFER_SIZE)
-        self.filter_coeffs = self._create_bandpass_filter()
+        self.buffer = RingBuffer(BUFFER_SIZE)
+        self.filtered = RingBuffer(BUFFER_SIZE)
+        self.filter_chain = self._create_bandpass_filter()
+        self._last_emit = 0.0
+        self.frame_reader = None
+        self.acquisition = DrdyAcquisition(
+            GPIO, GPIO_CONFIG['DRDY'], self._read_ecg, SAMPLE_RATE
+        )
+        # Every viewer gets its own send queue and thread; publishing never waits on a socket
+        self.hub = BroadcastHub(
+            lambda event, payload, sid: socketio.emit(event, payload, to=sid),
+            CLIENT_QUEUE, LAGGARD_POLICY,
+            disconnect=lambda sid: socketio.server.disconnect(sid)
+        )
+        # Channel 0: raw, channel 1: filtered
+        self.streamer = FrameStreamer(
+            self.hub.publish_frame,
+            [self.buffer, self.filtered], SAMPLE_RATE, frame_rate=STREAM_RATE
+        )
         self.initialize_hardware()
 
     def _create_bandpass_filter(self):
-        nyq = 0.5 * SAMPLE_RATE
-        low = 0.5 / nyq
-        high = 40.0 / nyq
-        b, a = butter(2, [low, high], btype='band')
-        return (b, a)
+        return SosFilterChain(design_sos(SAMPLE_RATE, bandpass=(0.5, 40.0)), channels=1)
 
     def initialize_hardware(self):
         try:
@@ -51,6 +78,10 @@ class ECGMonitor:
             self.spi.open(SPI_BUS, SPI_DEVICE)
             self.spi.max_speed_hz = 2000000
             self.spi.mode = 0b01
+            # VREF = 4.5V, Gain=6
+            self.frame_reader = FrameReader(
+                self.spi, block_size=FRAME_BLOCK, gain=6, vref=4.5, rdata=True
+            )
 
             self._reset_ads()
             self._configure_ads()
@@ -74,10 +105,10 @@ class ECGMonitor:
             raise RuntimeError(f"Invalid device ID: 0x{device_id:02x}")
 
         # Configure registers
-        self._write_reg(0x01, 0x02)  # CONFIG1: 500 SPS
+        self._write_reg(0x01, data_rate_config(SAMPLE_RATE))  # CONFIG1
         self._write_reg(0x04, 0x40)  # CH1SET: Gain=6, enabled
         self._write_reg(0x05, 0x00)  # CH2SET: Disabled
-        self._write_reg(0x0E, 0x04)  # RLD_SENS: RLD enabled
+        self._write_reg(0x06, 0x04)  # RLD_SENS: RLD enabled
 
     def _read_reg(self, reg):
         return self.spi.xfer2([0x20 | reg, 0x00, 0x00])[2]
@@ -86,47 +117,47 @@ class ECGMonitor:
         self.spi.xfer2([0x40 | reg, 0x00, value])
 
     def _read_ecg(self):
-        while GPIO.input(GPIO_CONFIG['DRDY']):
-            pass
-        data = self.spi.xfer2([0x12] + [0]*6)
-        raw = (data[3] << 16) | (data[4] << 8) | data[5]
-        return self._convert_raw_value(raw)
-
-    def _convert_raw_value(self, raw):
-        # Convert 24-bit two's complement to voltage (VREF = 4.5V)
-        value = raw - (1 << 24) if (raw & (1 << 23)) else raw
-        return (value * 4.5) / (0x7FFFFF * 6)  # Gain=6
+        # Called by DrdyAcquisition right after the DRDY falling edge
+        return self.frame_reader.read_block()
 
     def _process_data(self, data):
-        return lfilter(*self.filter_coeffs, data)
+        # Filter state carries over between blocks: each sample is filtered once
+        return self.filter_chain.process(data)
 
     def start(self):
         self.running = True
         GPIO.output(GPIO_CONFIG['START'], GPIO.HIGH)
         logging.info("Data acquisition started")
 
-        while self.running:
-            try:
-                ecg = self._read_ecg()
-                self.buffer = np.roll(self.buffer, -1)
-                self.buffer[-1] = ecg
-
-                # Send filtered data every 50ms
-                if time.time() % 0.05 < 0.001:
-                    filtered = self._process_data(self.buffer)
-                    socketio.emit('ecg_update', {
-                        'raw': ecg,
-                        'filtered': filtered[-1],
-                        'buffer': filtered.tolist()
-                    })
-
-            except Exception as e:
-                logging.error(f"Data error: {str(e)}")
-                self.stop()
-                break
+        self.streamer.start()
+        try:
+            self.acquisition.run(self._handle_block)
+        except Exception as e:
+            logging.error(f"Data error: {str(e)}")
+            self.stop()
+        finally:
+            self.streamer.stop()
+
+    def _handle_block(self, block):
+        status, values = block
+        ecg = values[:, ECG_CHANNEL - 1]
+        self.buffer.extend(ecg)
+        self.filtered.extend(self._process_data(ecg))
+
+        # Samples go out as binary frames from the streamer thread;
+        # only the (small) status message is sent from here, once a second
+        now = time.monotonic()
+        if now - self._last_emit >= 1.0:
+            self._last_emit = now
+            self.hub.publish('ecg_status', {
+                'acquisition': self.acquisition.stats(),
+                'stream': self.streamer.stats(),
+                'clients': self.hub.stats()
+            })
 
     def stop(self):
         self.running = False
+        self.acquisition.stop()
         GPIO.output(GPIO_CONFIG['START'], GPIO.LOW)
         logging.info("Data acquisition stopped")
 
@@ -141,6 +172,14 @@ ecg_monitor = ECGMonitor()
 def index():
     return render_template('index.html')
 
+@socketio.on('connect')
+def handle_connect():
+    ecg_monitor.hub.subscribe(request.sid)
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    ecg_monitor.hub.unsubscribe(request.sid)
+
 @socketio.on('control')
 def handle_control(command):
     if command == 'start':
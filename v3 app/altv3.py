@@ -1,16 +1,28 @@
 import logging
+import os
+import sys
 import time
 import numpy as np
 from functools import wraps
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, request
 from flask_socketio import SocketIO
-import spidev
-import RPi.GPIO as GPIO
-from scipy.signal import butter, lfilter, iirnotch
 import json
-import psutil
 from threading import Lock
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ecg_core.acquisition import DrdyAcquisition
+from ecg_core.broadcast import BroadcastHub
+from ecg_core.filters import SosFilterChain, design_sos
+from ecg_core.frames import FrameReader
+from ecg_core.hardware import load_backend
+from ecg_core.pipeline import Pipeline, Stage
+from ecg_core.registers import data_rate_config
+from ecg_core.ring_buffer import RingBuffer
+from ecg_core.streaming import FrameStreamer
+from ecg_core.system_stats import SystemStatsSampler
+
+spidev, GPIO = load_backend()  # ECG_BACKEND=sim runs on the simulated ADS1292R
+
 # Configuration
 CONFIG = {
     "hardware": {
@@ -18,22 +30,38 @@ CONFIG = {
         "spi_device": 0,
         "gpio": {"drdy": 24, "start": 25, "reset": 23, "cs": 8},
         "sample_rate": 500,
+        "frame_block": 20,  # 40 ms at 500 SPS
         "expected_device_id": 0x73
     },
     "filters": {
         "bandpass": [0.5, 40.0],
         "notch_freq": 50.0,
-        "notch_q": 30.0
+        "notch_q": 30.0,
+        "baseline_cutoff": None
     },
     "buffer": {
         "size": 1000,
         "warning_threshold": 0.8
     },
+    "pipeline": {
+        # Blocks queued between stages, and what to do when a queue is full
+        "process_queue": 50,
+        "broadcast_queue": 10,
+        "overflow_policy": "drop_oldest"
+    },
+    "stream": {
+        "frame_rate": 25,  # binary 'ecg_frame' messages per second
+        "stats_interval": 1.0,  # seconds between 'system_stats' messages
+        "client_queue": 50,  # messages queued per viewer before it counts as lagging
+        "laggard_policy": "degrade"  # "drop", "degrade" (decimate its stream) or "disconnect"
+    },
     "system": {
         "max_retries": 5,
         "retry_delay": 0.1,
         "max_voltage": 4.5,
-        "safe_gain_range": (1, 12)
+        "safe_gain_range": (1, 12),
+        "stats_period": 1.0,  # seconds between CPU/memory/temperature samples
+        "stats_history": 300  # samples kept for the dashboard
     }
 }
 
@@ -76,9 +104,36 @@ class ECGSensor:
 
     def _initialize(self):
         self.running = False
-        self.buffer = np.zeros(CONFIG['buffer']['size'])
-        self.filter_state = None
-        self.notch_state = None
+        self.buffer = RingBuffer(CONFIG['buffer']['size'])
+        self.filter_chain = None
+        self.acquisition = DrdyAcquisition(
+            GPIO, CONFIG['hardware']['gpio']['drdy'], self._read_ecg, CONFIG['hardware']['sample_rate']
+        )
+        self.pipeline = Pipeline(
+            Stage('process', self._process_block,
+                  CONFIG['pipeline']['process_queue'], CONFIG['pipeline']['overflow_policy'],
+                  on_error=self._process_error),
+            Stage('broadcast', self._broadcast,
+                  CONFIG['pipeline']['broadcast_queue'], CONFIG['pipeline']['overflow_policy'])
+        )
+        # Every viewer gets its own send queue and thread; publishing never waits on a socket
+        self.hub = BroadcastHub(
+            lambda event, payload, sid: socketio.emit(event, payload, to=sid),
+            CONFIG['stream']['client_queue'], CONFIG['stream']['laggard_policy'],
+            disconnect=lambda sid: socketio.server.disconnect(sid)
+        )
+        self.streamer = FrameStreamer(
+            self.hub.publish_frame,
+            [self.buffer], CONFIG['hardware']['sample_rate'],
+            frame_rate=CONFIG['stream']['frame_rate']
+        )
+        # Sampled in the background; stats messages only read the latest snapshot
+        self.system = SystemStatsSampler(
+            CONFIG['system']['stats_period'], CONFIG['system']['stats_history'],
+            threads={'acquisition': lambda: self.acquisition.thread_id}
+        )
+        self.system.start()
+        self._last_stats = 0.0
         self._init_hardware()
         self._init_filters()
         self._last_heartbeat = time.time()
@@ -88,11 +143,20 @@ class ECGSensor:
     def _init_hardware(self):
         try:
             GPIO.setmode(GPIO.BCM)
-            for pin in CONFIG['hardware']['gpio'].values():
-                GPIO.setup(pin, GPIO.OUT if pin != CONFIG['hardware']['gpio']['drdy'] else GPIO.IN)
+            for name, pin in CONFIG['hardware']['gpio'].items():
+                if name == 'cs':
+                    continue  # CE0 stays under SPI controller
+                GPIO.setup(pin, GPIO.OUT if name != 'drdy' else GPIO.IN)
 
             self.spi = spidev.SpiDev()
             self._spi_connect()
+            self.frame_reader = FrameReader(
+                self.spi,
+                block_size=CONFIG['hardware']['frame_block'],
+                gain=6,
+                vref=CONFIG['system']['max_voltage'],
+                rdata=True
+            )
             self._verify_device()
             self._configure_sensor()
             logging.info("Hardware initialized successfully")
@@ -121,15 +185,15 @@ class ECGSensor:
             raise ValueError(f"Invalid device ID: 0x{device_id:02x} (expected 0x{CONFIG['hardware']['expected_device_id']:02x})")
 
     def _init_filters(self):
-        # Bandpass filter
-        nyq = 0.5 * CONFIG['hardware']['sample_rate']
-        low = CONFIG['filters']['bandpass'][0] / nyq
-        high = CONFIG['filters']['bandpass'][1] / nyq
-        self.b, self.a = butter(2, [low, high], btype='band')
-
-        # Notch filter
-        notch_freq = CONFIG['filters']['notch_freq'] / nyq
-        self.notch_b, self.notch_a = iirnotch(notch_freq, CONFIG['filters']['notch_q'])
+        # Bandpass + notch (+ optional baseline high-pass) as one SOS cascade
+        sos = design_sos(
+            CONFIG['hardware']['sample_rate'],
+            bandpass=CONFIG['filters']['bandpass'],
+            notch=CONFIG['filters']['notch_freq'],
+            notch_q=CONFIG['filters']['notch_q'],
+            baseline=CONFIG['filters']['baseline_cutoff']
+        )
+        self.filter_chain = SosFilterChain(sos, channels=1)
 
     @handle_errors
     def _read_reg(self, reg):
@@ -156,40 +220,23 @@ class ECGSensor:
 
     @handle_errors
     def _configure_sensor(self):
-        self._write_reg(0x01, 0x02)  # CONFIG1
+        self._write_reg(0x01, data_rate_config(CONFIG['hardware']['sample_rate']))  # CONFIG1
         self._write_reg(0x04, 0x40)  # CH1SET
         self._write_reg(0x05, 0x00)  # CH2SET
-        self._write_reg(0x0D, 0x24)  # CONFIG3
-        self._write_reg(0x0E, 0x04)  # RLD_SENS
+        self._write_reg(0x06, 0x04)  # RLD_SENS
 
-    @handle_errors
     def _read_ecg(self):
-        for _ in range(10):  # Timeout protection
-            if not GPIO.input(CONFIG['hardware']['gpio']['drdy']):
-                data = self._spi_transaction([0x12] + [0]*6)
-                raw = (data[3] << 16) | (data[4] << 8) | data[5]
-                return self._convert_raw_value(raw)
-            time.sleep(0.001)
-        raise TimeoutError("ECG data ready timeout")
-
-    def _convert_raw_value(self, raw):
-        # Validate raw value before conversion
-        if not (0 <= raw <= 0xFFFFFF):
-            raise ValueError(f"Invalid raw value: 0x{raw:06x}")
-
-        value = raw - (1 << 24) if (raw & (1 << 23)) else raw
-        voltage = (value * CONFIG['system']['max_voltage']) / (0x7FFFFF * 6)
-        
-        if abs(voltage) > 4.5:
-            raise ValueError(f"Voltage out of safe range: {voltage:.2f}V")
-            
-        return voltage
+        # Called by DrdyAcquisition right after the DRDY falling edge, and only reads:
+        # DRDY timeouts are counted there as missed edges, blocks are validated by the 'process' stage
+        return self.frame_reader.read_block()
+
+    def _validate_block(self, values):
+        peak = np.abs(values).max()
+        if peak > 4.5:
+            raise ValueError(f"Voltage out of safe range: {peak:.2f}V")
 
-    @handle_errors
     def _process_data(self, data):
-        filtered, self.filter_state = lfilter(self.b, self.a, [data[-1]], zi=self.filter_state)
-        notch_filtered, self.notch_state = lfilter(self.notch_b, self.notch_a, filtered, zi=self.notch_state)
-        return notch_filtered[0]
+        return self.filter_chain.process(data)
 
     @handle_errors
     def start_acquisition(self):
@@ -200,59 +247,85 @@ class ECGSensor:
             socketio.start_background_task(target=self._acquisition_loop)
 
     def _acquisition_loop(self):
-        buffer_warned = False
-        while self.running:
-            try:
-                # Read and process data
-                raw_ecg = self._read_ecg()
-                processed_ecg = self._process_data([raw_ecg])
-
-                # Update buffer
-                with self.data_lock:
-                    self.buffer = np.roll(self.buffer, -1)
-                    self.buffer[-1] = processed_ecg
-
-                # Check buffer health
-                buffer_usage = np.count_nonzero(self.buffer) / len(self.buffer)
-                if buffer_usage > CONFIG['buffer']['warning_threshold'] and not buffer_warned:
-                    socketio.emit('system_warning', {'message': 'Buffer approaching capacity'})
-                    buffer_warned = True
-                elif buffer_usage < CONFIG['buffer']['warning_threshold']:
-                    buffer_warned = False
-
-                # Emit data
-                socketio.emit('ecg_update', {
-                    'timestamp': time.time(),
-                    'value': processed_ecg,
-                    'buffer': self.buffer.tolist(),
-                    'system_stats': self._get_system_stats()
-                })
-
-                # Thread management
-                time.sleep(1/CONFIG['hardware']['sample_rate'])
+        # Only SPI reads happen here; processing and emits run as pipeline stages
+        self._buffer_warned = False
+        self.pipeline.start()
+        self.streamer.start()
+        try:
+            self.acquisition.run(self.pipeline.put)
+        except Exception as e:
+            logging.error(f"Acquisition error: {str(e)}")
+            self.stop_acquisition()
+            self.hub.publish('system_error', {'message': str(e)})
+        finally:
+            self.streamer.stop()
+            self.pipeline.stop()
+
+    def _process_block(self, block):
+        status, values = block
+        # A block out of range raises: counted as a stage error and reported by _process_error
+        self._validate_block(values)
+        processed = self._process_data(values[:, 0])
+
+        # Update buffer; the streamer sends new samples from it
+        with self.data_lock:
+            self.buffer.extend(processed)
+
+        # Check buffer health
+        warning = None
+        buffer_usage = len(self.buffer) / self.buffer.capacity
+        if buffer_usage > CONFIG['buffer']['warning_threshold'] and not self._buffer_warned:
+            warning = 'Buffer approaching capacity'
+            self._buffer_warned = True
+        elif buffer_usage < CONFIG['buffer']['warning_threshold']:
+            self._buffer_warned = False
+
+        now = time.monotonic()
+        send_stats = now - self._last_stats >= CONFIG['stream']['stats_interval']
+        if send_stats:
+            self._last_stats = now
+        if warning is None and not send_stats:
+            return None
+        return warning, send_stats, None
 
-            except Exception as e:
-                logging.error(f"Acquisition error: {str(e)}")
-                self.stop_acquisition()
-                break
+    def _process_error(self, block, error):
+        # Runs on the 'process' thread; the broadcast stage emits it
+        return None, False, str(error)
+
+    def _broadcast(self, item):
+        warning, send_stats, error = item
+        if error is not None:
+            self.hub.publish('system_error', {'message': error})
+        if warning is not None:
+            self.hub.publish('system_warning', {'message': warning})
+        if send_stats:
+            self.hub.publish('system_stats', self._get_system_stats())
 
     def _get_system_stats(self):
+        system = self.system.snapshot()
         return {
-            'cpu': psutil.cpu_percent(),
-            'memory': psutil.virtual_memory().percent,
+            'cpu': system['cpu_percent'],
+            'memory': system['memory_percent'],
+            'system': system,
             'buffer': len(self.buffer),
-            'uptime': time.time() - self._last_heartbeat
+            'uptime': time.time() - self._last_heartbeat,
+            'acquisition': self.acquisition.stats(),
+            'pipeline': self.pipeline.stats(),
+            'stream': self.streamer.stats(),
+            'clients': self.hub.stats()
         }
 
     @handle_errors
     def stop_acquisition(self):
         if self.running:
             self.running = False
+            self.acquisition.stop()
             GPIO.output(CONFIG['hardware']['gpio']['start'], GPIO.LOW)
             logging.info("Data acquisition stopped")
 
     def _emergency_shutdown(self):
         self.stop_acquisition()
+        self.system.stop()
         self.spi.close()
         GPIO.cleanup()
 
@@ -265,6 +338,22 @@ def index():
 def get_config():
     return jsonify(CONFIG)
 
+@app.route('/system', methods=['GET'])
+def get_system():
+    sampler = ECGSensor().system
+    return jsonify({
+        'latest': sampler.snapshot(),
+        'history': sampler.history(request.args.get('seconds', type=float))
+    })
+
+@socketio.on('connect')
+def handle_connect():
+    ECGSensor().hub.subscribe(request.sid)
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    ECGSensor().hub.unsubscribe(request.sid)
+
 @socketio.on('control')
 def handle_control(command):
     sensor = ECGSensor()
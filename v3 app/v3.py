@@ -1,29 +1,59 @@
 # ecg_server.py
 import logging
 import time
-import numpy as np
-from flask import Flask, render_template, jsonify
-from flask_socketio import SocketIO
-import spidev
-import RPi.GPIO as GPIO
-from scipy.signal import butter, lfilter, find_peaks
 from dataclasses import dataclass
-from threading import Lock
+from threading import Event, Lock, Thread
 import signal
 import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from ecg_core.startup import StartupTimer, preload
+from ecg_core.acquisition import DrdyAcquisition
+from ecg_core.broadcast import BroadcastHub
+from ecg_core.clock import SampleClock
+from ecg_core.decimation import PolyphaseDecimator
+from ecg_core.filters import SosFilterChain, design_sos
+from ecg_core.frames import FrameReader
+from ecg_core.hardware import load_backend
+from ecg_core.hrv import HrvEngine
+from ecg_core.latency import LatencyTracker, prometheus_metric
+from ecg_core.pipeline import DROP_OLDEST, Pipeline, Stage
+from ecg_core.qrs import PanTompkinsDetector
+from ecg_core.quality import SignalQuality
+from ecg_core.registers import DATA_RATES, RegisterMap, data_rate_config
+from ecg_core.ring_buffer import RingBuffer
+from ecg_core.streaming import FrameStreamer
+
+spidev, GPIO = load_backend()  # ECG_BACKEND=sim runs on the simulated ADS1292R
+# flask, flask_socketio and scipy.signal are not imported above: see create_app() and FAST_START
+startup = StartupTimer()
+startup.mark('imports')
 
 # Configuration
 @dataclass
 class Config:
     SPI_BUS: int = 0
     SPI_DEVICE: int = 0
-    SAMPLE_RATE: int = 500
+    SAMPLE_RATE: int = 500  # processing and streaming rate
+    DATA_RATE: int = 500  # ADS1292R conversions per second (125-8000), decimated to SAMPLE_RATE
+    FULL_RATE_SECONDS: float = 2.0  # channel 1 kept at DATA_RATE, e.g. for pacemaker spikes
     BUFFER_SIZE: int = 2000
     GPIO_CONFIG: dict = None
     FILTER_RANGE: tuple = (0.5, 40.0)
+    NOTCH_FREQ: float = None  # Hz, e.g. 50.0 to remove mains hum
+    BASELINE_CUTOFF: float = None  # Hz, extra high-pass for baseline wander
     MAX_RETRIES: int = 5
     RETRY_DELAY: float = 0.1
-    HEART_RATE_WINDOW: int = 10  # seconds
+    FRAME_BLOCK: int = 20  # frames decoded per block at SAMPLE_RATE (40 ms; times the decimation factor)
+    PROCESS_QUEUE: int = 50  # blocks (2 s at 500 SPS) between acquisition and processing
+    BROADCAST_QUEUE: int = 10  # status messages waiting to be emitted
+    STREAM_RATE: int = 25  # binary 'ecg_frame' messages per second
+    HRV_WINDOW: int = 300  # R-R intervals (about 5 minutes) behind the HRV metrics
+    CLIENT_QUEUE: int = 50  # messages (2 s of frames) queued per viewer before it counts as lagging
+    LAGGARD_POLICY: str = 'degrade'  # 'drop', 'degrade' (decimate its stream) or 'disconnect'
+    FILTER_CACHE: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')  # designed filter sections
+    FAST_START: bool = False  # acquire from boot; the web layer and SciPy load while samples come in
 
 config = Config(
     GPIO_CONFIG={
@@ -34,10 +64,9 @@ config = Config(
     }
 )
 
-# Initialize Flask and SocketIO
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'ecg_secret!'
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Flask and SocketIO, set up by create_app()
+app = None
+socketio = None
 
 class ECGSensorError(Exception):
     """Base class for ECG sensor errors"""
@@ -67,17 +96,49 @@ class ECGMonitor:
             return
             
         self.running = False
-        self.buffer = np.zeros(config.BUFFER_SIZE)
-        self.filter_coeffs = self._create_bandpass_filter()
-        self.heart_rate_history = []
+        self.raw = RingBuffer(config.BUFFER_SIZE)
+        self.buffer = RingBuffer(config.BUFFER_SIZE)
+        self.filter_chain = self._create_filter_chain()
+        self.qrs = PanTompkinsDetector(config.SAMPLE_RATE, lazy=True)
+        self.hrv = HrvEngine(config.SAMPLE_RATE, config.HRV_WINDOW)
+        # Per-stage latency from the DRDY edge on; each stage thread records into its own histograms
+        self.latency = LatencyTracker()
+        self._latency = {stage: self.latency.histogram(stage) for stage in (
+            'read', 'decode', 'queue', 'filter', 'qrs', 'buffer', 'drdy_to_buffer'
+        )}
+        self._last_latency = 0.0
+        self._index_offset = 0
         self.spi = None
-        self._filter_state = None
+        self.frame_reader = None
         self._last_update = time.time()
+        # Read path, clock and decimator at the ADC data rate; see set_data_rate()
+        self._rate_lock = Lock()
+        self._idle = Event()  # set while start_acquisition() is not running
+        self._idle.set()
+        self._setup_data_rate(config.DATA_RATE)
+        # The DRDY thread only reads and decodes; filtering and emits run on their own threads
+        self.pipeline = Pipeline(
+            Stage('process', self._process_block, config.PROCESS_QUEUE, DROP_OLDEST),
+            Stage('broadcast', self._broadcast, config.BROADCAST_QUEUE, DROP_OLDEST)
+        )
+        # Every viewer gets its own send queue and thread; publishing never waits on a socket
+        self.hub = BroadcastHub(
+            lambda event, payload, sid: socketio.emit(event, payload, to=sid),
+            config.CLIENT_QUEUE, config.LAGGARD_POLICY,
+            disconnect=lambda sid: socketio.server.disconnect(sid), latency=self.latency
+        )
+        # Channel 0: raw, channel 1: filtered (mV)
+        self.streamer = FrameStreamer(
+            self.hub.publish_frame,
+            [self.raw, self.buffer], config.SAMPLE_RATE, frame_rate=config.STREAM_RATE,
+            latency=self.latency
+        )
         self._initialized = True
         self._setup_signal_handlers()
         
         try:
             self._initialize_hardware()
+            startup.mark('hardware')
             logging.info("ECG Monitor initialized successfully")
         except ECGSensorError as e:
             logging.critical(f"Failed to initialize ECG Monitor: {str(e)}")
@@ -93,12 +154,16 @@ class ECGMonitor:
         self.cleanup()
         sys.exit(0)
 
-    def _create_bandpass_filter(self):
-        nyq = 0.5 * config.SAMPLE_RATE
-        low = config.FILTER_RANGE[0] / nyq
-        high = config.FILTER_RANGE[1] / nyq
-        b, a = butter(2, [low, high], btype='band')
-        return (b, a)
+    def _create_filter_chain(self):
+        sos = design_sos(
+            config.SAMPLE_RATE,
+            bandpass=config.FILTER_RANGE,
+            notch=config.NOTCH_FREQ,
+            baseline=config.BASELINE_CUTOFF,
+            cache_dir=config.FILTER_CACHE
+        )
+        # Lazy, like the QRS detector: plain Python until scipy.signal is imported (preloaded on FAST_START)
+        return SosFilterChain(sos, channels=1, lazy=True)
 
     def _initialize_hardware(self):
         self._setup_gpio()
@@ -123,24 +188,84 @@ class ECGMonitor:
             self.spi.open(config.SPI_BUS, config.SPI_DEVICE)
             self.spi.max_speed_hz = 2000000
             self.spi.mode = 0b01
-            self.spi.no_cs = True  # Manual CS control
+            # Frames are read with RDATA, so the chip is kept out of RDATAC (see _verify_sensor)
+            self.registers = RegisterMap(self.spi, continuous=False)
+            self._create_frame_reader()
+            # Channel 1 only (CH2 is powered down); assessed 4 times a second, on the decimated signal
+            self.quality = SignalQuality.for_reader(
+                self.frame_reader, config.SAMPLE_RATE, channels=1, mains_hz=config.NOTCH_FREQ or 50.0
+            )
         except Exception as e:
             raise ECGSensorCommunicationError(f"SPI initialization failed: {str(e)}")
 
+    def _create_frame_reader(self):
+        # VREF = 4.5V, Gain=6, values in mV; blocks span the same time at any data rate
+        self.frame_reader = FrameReader(
+            self.spi, block_size=config.FRAME_BLOCK * self.decimator.factor,
+            gain=6, vref=4.5, scale=1000.0, rdata=True
+        )
+
+    @staticmethod
+    def _decimation_factor(data_rate):
+        if data_rate not in DATA_RATES.values() or data_rate % config.SAMPLE_RATE:
+            raise ECGSensorConfigurationError(
+                f"Data rate {data_rate} SPS is not an ADS1292R rate that is a multiple of {config.SAMPLE_RATE} SPS"
+            )
+        return data_rate // config.SAMPLE_RATE
+
+    def _setup_data_rate(self, data_rate):
+        """Size the read path, the sample clock and the decimator for data_rate conversions per second."""
+        self.decimator = PolyphaseDecimator(self._decimation_factor(data_rate))
+        self.data_rate = data_rate
+        # Conversion index -> time model, fitted on the DRDY edge times; the buffers lag it by the overruns
+        self.clock = SampleClock(data_rate)
+        self.full_rate = RingBuffer(int(config.FULL_RATE_SECONDS * data_rate))
+        self.acquisition = DrdyAcquisition(
+            GPIO, config.GPIO_CONFIG['DRDY'], self._read_ecg_data, data_rate
+        )
+        if self.spi is not None:
+            self._create_frame_reader()
+
+    def set_data_rate(self, data_rate):
+        """Switch the ADC to data_rate SPS, restarting the acquisition if it was running."""
+        self._decimation_factor(data_rate)
+        with self._rate_lock:
+            was_running = self.running
+            if was_running:
+                self.stop_acquisition()
+                # The decimator, buffers and clock must not change under a loop still running
+                if not self._idle.wait(2.0):
+                    raise ECGSensorError(
+                        f"Acquisition did not stop within 2 s; data rate left at {self.data_rate} SPS"
+                    )
+            previous = self.data_rate
+            self._setup_data_rate(data_rate)
+            try:
+                self._configure_sensor()
+            except ECGSensorError:
+                self._setup_data_rate(previous)
+                raise
+            logging.info(f"Data rate {previous} -> {data_rate} SPS (decimation by {self.decimator.factor})")
+        if was_running:
+            Thread(target=self.start_acquisition, name='ecg-acquisition', daemon=True).start()
+
     def _verify_sensor(self):
         for attempt in range(config.MAX_RETRIES):
             try:
-                device_id = self._read_reg(0x00)
-                if device_id != 0x73:
-                    raise ECGSensorConfigurationError(
-                        f"Unexpected device ID: 0x{device_id:02x} (expected 0x73)"
-                    )
-                return
-            except ECGSensorCommunicationError:
+                # RDATAC is the power-up mode, and it ignores register commands
+                self.registers.set_continuous(False)
+                device_id = self.registers.refresh()['ID']
+            except Exception as e:
                 if attempt == config.MAX_RETRIES - 1:
-                    raise
+                    raise ECGSensorCommunicationError(f"Register read failed: {str(e)}")
                 time.sleep(config.RETRY_DELAY)
                 self._hard_reset()
+                continue
+            if device_id != 0x73:
+                raise ECGSensorConfigurationError(
+                    f"Unexpected device ID: 0x{device_id:02x} (expected 0x73)"
+                )
+            return
 
     def _hard_reset(self):
         GPIO.output(config.GPIO_CONFIG['RESET'], GPIO.LOW)
@@ -150,125 +275,140 @@ class ECGMonitor:
 
     def _configure_sensor(self):
         register_settings = {
-            0x01: 0x02,  # CONFIG1: 500 SPS
+            0x01: data_rate_config(self.data_rate),  # CONFIG1
             0x04: 0x40,  # CH1SET: Gain=6, enabled
             0x05: 0x00,  # CH2SET: Disabled
-            0x0E: 0x04   # RLD_SENS: RLD enabled
+            0x06: 0x04   # RLD_SENS: RLD enabled
         }
         
-        for reg, value in register_settings.items():
-            self._write_reg(reg, value)
-            read_back = self._read_reg(reg)
-            if read_back != value:
-                raise ECGSensorConfigurationError(
-                    f"Register 0x{reg:02x} configuration failed "
-                    f"(wrote 0x{value:02x}, read 0x{read_back:02x})"
-                )
-
-    def _read_reg(self, reg):
+        # One burst over CONFIG1..RLD_SENS and one read-back
         try:
-            GPIO.output(config.GPIO_CONFIG['CS'], GPIO.LOW)
-            response = self.spi.xfer2([0x20 | reg, 0x00, 0x00])
-            GPIO.output(config.GPIO_CONFIG['CS'], GPIO.HIGH)
-            return response[2]
-        except Exception as e:
-            raise ECGSensorCommunicationError(f"Register read failed: {str(e)}")
-
-    def _write_reg(self, reg, value):
-        try:
-            GPIO.output(config.GPIO_CONFIG['CS'], GPIO.LOW)
-            self.spi.xfer2([0x40 | reg, 0x00, value])
-            GPIO.output(config.GPIO_CONFIG['CS'], GPIO.HIGH)
+            failed = self.registers.write(register_settings)
         except Exception as e:
             raise ECGSensorCommunicationError(f"Register write failed: {str(e)}")
+        if failed:
+            reg = failed[0]
+            raise ECGSensorConfigurationError(
+                f"Register 0x{reg:02x} configuration failed "
+                f"(wrote 0x{register_settings[reg]:02x}, read 0x{self.registers[reg]:02x})"
+            )
 
     def _read_ecg_data(self):
+        edge = self.acquisition.sample_ns
         try:
-            GPIO.output(config.GPIO_CONFIG['CS'], GPIO.LOW)
-            data = self.spi.xfer2([0x12] + [0]*6)
-            GPIO.output(config.GPIO_CONFIG['CS'], GPIO.HIGH)
-            raw = (data[3] << 16) | (data[4] << 8) | data[5]
-            return self._convert_raw_value(raw)
+            with self.registers.lock:
+                complete = self.frame_reader.read()
+            read = time.monotonic_ns()
+            self._latency['read'].record(read - edge)
+            if not complete:
+                return None
+            status, values = self.frame_reader.drain()
         except Exception as e:
             raise ECGSensorCommunicationError(f"ECG read failed: {str(e)}")
-
-    def _convert_raw_value(self, raw):
-        # Convert 24-bit two's complement to voltage (VREF = 4.5V)
-        value = raw - (1 << 24) if (raw & (1 << 23)) else raw
-        voltage = (value * 4.5) / (0x7FFFFF * 6)  # Gain=6
-        return voltage * 1000  # Convert to mV
+        decoded = time.monotonic_ns()
+        startup.mark('first_sample')
+        self._latency['decode'].record(decoded - read)
+        return status, values, edge, decoded, self.acquisition.sample_index
 
     def _process_ecg_data(self, data):
-        filtered, self._filter_state = lfilter(
-            self.filter_coeffs[0],
-            self.filter_coeffs[1],
-            [data],
-            zi=self._filter_state
-        )
-        return filtered[0]
-
-    def _calculate_heart_rate(self, signal_window):
-        try:
-            peaks, _ = find_peaks(signal_window, height=0.5, distance=int(config.SAMPLE_RATE*0.3))
-            if len(peaks) < 2:
-                return None
-            intervals = np.diff(peaks) / config.SAMPLE_RATE
-            return 60 / np.mean(intervals)
-        except Exception as e:
-            logging.warning(f"Heart rate calculation failed: {str(e)}")
-            return None
+        return self.filter_chain.process(data)
 
     def start_acquisition(self):
         if self.running:
             return
             
         self.running = True
+        self._idle.clear()
         GPIO.output(config.GPIO_CONFIG['START'], GPIO.HIGH)
         logging.info("Data acquisition started")
         
-        while self.running:
-            try:
-                raw_value = self._read_ecg_data()
-                filtered_value = self._process_ecg_data(raw_value)
-                
-                # Update buffer
-                self.buffer = np.roll(self.buffer, -1)
-                self.buffer[-1] = filtered_value
-                
-                # Calculate metrics
-                current_time = time.time()
-                if current_time - self._last_update >= 1:
-                    window = self.buffer[-config.SAMPLE_RATE*config.HEART_RATE_WINDOW:]
-                    heart_rate = self._calculate_heart_rate(window)
-                    if heart_rate:
-                        self.heart_rate_history.append(heart_rate)
-                        self.heart_rate_history = self.heart_rate_history[-10:]  # Keep last 10 readings
-                    
-                    socketio.emit('system_status', {
-                        'timestamp': current_time,
-                        'buffer_level': len(self.buffer),
-                        'heart_rate': np.mean(self.heart_rate_history) if self.heart_rate_history else None,
-                        'processing_latency': time.time() - current_time
-                    })
-                    self._last_update = current_time
-                
-                socketio.emit('ecg_data', {
-                    'timestamp': time.time(),
-                    'raw': raw_value,
-                    'filtered': filtered_value
-                })
-                
-            except ECGSensorCommunicationError as e:
-                logging.error(f"Data acquisition error: {str(e)}")
-                self.stop_acquisition()
-                socketio.emit('system_error', {'message': str(e)})
-                break
-                
-            time.sleep(1/config.SAMPLE_RATE)
+        self.clock.reset()  # conversion indices restart from 0
+        self.decimator.reset()
+        self.pipeline.start()
+        self.streamer.start()
+        try:
+            self.acquisition.run(self.pipeline.put)
+        except ECGSensorCommunicationError as e:
+            logging.error(f"Data acquisition error: {str(e)}")
+            self.stop_acquisition()
+            self.hub.publish('system_error', {'message': str(e)})
+        finally:
+            self.streamer.stop()
+            self.pipeline.stop()
+            self._idle.set()
+
+    def _process_block(self, block):
+        status, values, edge, decoded, index = block
+        latency = self._latency
+        started = time.monotonic_ns()
+        latency['queue'].record(started - decoded)
+        decimator = self.decimator
+        if decimator.factor > 1:
+            self.full_rate.extend(values[:, 0])
+            status = status[decimator.positions(len(values))]
+        # Anti-aliased and down to SAMPLE_RATE before anything else runs on it
+        raw_values = decimator.process(values[:, 0])
+        filtered_values = self._process_ecg_data(raw_values)
+        filtered = time.monotonic_ns()
+        latency['filter'].record(filtered - started)
+        
+        # Update buffers; the streamer sends new samples from them
+        self.raw.extend(raw_values)
+        self.buffer.extend(filtered_values)
+        buffered = time.monotonic_ns()
+        latency['buffer'].record(buffered - filtered)
+        self.clock.observe(index, edge)
+        # Conversion index of buffer sample b: b * factor + offset (decimator delay removed)
+        factor = decimator.factor
+        first = self.raw.total - (decimator.total + factor - 1) // factor  # buffer index of its first output
+        self._index_offset = index + 1 - decimator.total - first * factor - decimator.delay
+        # From the conversion of the block's last frame to its samples being streamable
+        self._last_latency = (buffered - edge) / 1e9
+        latency['drdy_to_buffer'].record(buffered - edge)
+        
+        # QRS detection runs on each new block once; peaks are buffer sample indices
+        messages = []
+        r_peaks = self.qrs.process(filtered_values)
+        latency['qrs'].record(time.monotonic_ns() - buffered)
+        quality = self.quality.update(status, raw_values[:, None])
+        if quality is not None:
+            messages.append(('signal_quality', quality))
+        if r_peaks:
+            self.hrv.update(r_peaks)
+            messages.append(('r_peaks', {
+                'indices': r_peaks,
+                'times': [self.clock.wall_time_ns(peak * factor + self._index_offset) / 1e9 for peak in r_peaks],
+                'heart_rate': self.qrs.heart_rate()
+            }))
+        
+        # Calculate metrics
+        current_time = time.time()
+        if current_time - self._last_update >= 1:
+            messages.append(('system_status', {
+                'timestamp': self.clock.wall_time_ns(index) / 1e9,  # of the newest sample
+                'buffer_level': len(self.buffer),
+                'heart_rate': self.qrs.heart_rate(),
+                'hrv': self.hrv.metrics(),
+                'processing_latency': self._last_latency,
+                'latency': self.latency.stats(),
+                'acquisition': self.acquisition.stats(),
+                'clock': self.clock.stats(),
+                'pipeline': self.pipeline.stats(),
+                'stream': self.streamer.stats(),
+                'clients': self.hub.stats()
+            }))
+            self._last_update = current_time
+        
+        return messages or None
+
+    def _broadcast(self, messages):
+        for event, payload in messages:
+            self.hub.publish(event, payload)
 
     def stop_acquisition(self):
         if self.running:
             self.running = False
+            self.acquisition.stop()
             GPIO.output(config.GPIO_CONFIG['START'], GPIO.LOW)
             logging.info("Data acquisition stopped")
 
@@ -279,33 +419,125 @@ class ECGMonitor:
         GPIO.cleanup()
         logging.info("ECG Monitor resources cleaned up")
 
-# Web Interface Routes
-@app.route('/')
-def index():
-    return render_template('dashboard.html')
-
-@app.route('/status')
-def system_status():
-    monitor = ECGMonitor()
-    return jsonify({
-        'running': monitor.running,
-        'buffer_size': len(monitor.buffer),
-        'heart_rate': np.mean(monitor.heart_rate_history) if monitor.heart_rate_history else None,
-        'sample_rate': config.SAMPLE_RATE
-    })
-
-@socketio.on('control')
-def handle_control(command):
-    monitor = ECGMonitor()
-    try:
-        if command == 'start':
-            if not monitor.running:
-                socketio.start_background_task(target=monitor.start_acquisition)
-        elif command == 'stop':
-            monitor.stop_acquisition()
-    except Exception as e:
-        logging.error(f"Control command failed: {str(e)}")
-        socketio.emit('system_error', {'message': str(e)})
+def create_app():
+    """Import the web layer, create app and socketio, and register the routes and socket handlers."""
+    global app, socketio
+    if app is not None:
+        return app
+    from flask import Flask, Response, render_template, jsonify, request
+    from flask_socketio import SocketIO
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'ecg_secret!'
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+
+    # Web Interface Routes
+    @app.route('/')
+    def index():
+        return render_template('dashboard.html')
+
+    @app.route('/status')
+    def system_status():
+        monitor = ECGMonitor()
+        return jsonify({
+            'running': monitor.running,
+            'buffer_size': len(monitor.buffer),
+            'heart_rate': monitor.qrs.heart_rate(),
+            'hrv': monitor.hrv.metrics(),
+            'signal_quality': monitor.quality.latest,
+            'sample_rate': config.SAMPLE_RATE,
+            'data_rate': monitor.data_rate,
+            'acquisition': monitor.acquisition.stats(),
+            'clock': monitor.clock.stats(),
+            'pipeline': monitor.pipeline.stats(),
+            'stream': monitor.streamer.stats(),
+            'clients': monitor.hub.stats(),
+            'registers': monitor.registers.stats(),
+            'startup': startup.stats()
+        })
+
+    @app.route('/registers')
+    def registers():
+        """Register values from the shadow copy; ?refresh=1 rereads them all in one burst first"""
+        monitor = ECGMonitor()
+        if request.args.get('refresh') == '1':
+            try:
+                monitor.registers.refresh()
+            except Exception as e:
+                return jsonify({'error': f"Register read failed: {str(e)}"}), 500
+        return jsonify({
+            'registers': {name: f'0x{value:02x}' for name, value in monitor.registers.snapshot().items()},
+            'stats': monitor.registers.stats()
+        })
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus text exposition: stage latency quantiles and acquisition counters"""
+        monitor = ECGMonitor()
+        acquisition = monitor.acquisition.stats()
+        pipeline = monitor.pipeline.stats()
+        text = monitor.latency.prometheus() + ''.join([
+            prometheus_metric('ecg_frames_total', 'counter', 'Frames read since acquisition start',
+                              [({}, acquisition['frames'])]),
+            prometheus_metric('ecg_overruns_total', 'counter', 'Conversions overwritten before they were read',
+                              [({}, acquisition['overruns'])]),
+            prometheus_metric('ecg_pipeline_dropped_total', 'counter', 'Items dropped by full pipeline queues',
+                              [({'stage': name}, stage['dropped']) for name, stage in pipeline.items()]),
+            prometheus_metric('ecg_clients', 'gauge', 'Connected stream clients', [({}, len(monitor.hub))]),
+            prometheus_metric('ecg_startup_seconds', 'gauge', 'Time from process start to each startup milestone',
+                              [({'milestone': name}, value) for name, value in startup.marks.items()])
+        ])
+        return Response(text, mimetype='text/plain; version=0.0.4')
+
+    @app.route('/data_rate', methods=['GET', 'POST'])
+    def data_rate():
+        """GET: the ADC data rate; POST {"data_rate": SPS}: switch to it"""
+        monitor = ECGMonitor()
+        if request.method == 'POST':
+            try:
+                monitor.set_data_rate(int(request.get_json(force=True)['data_rate']))
+            except (KeyError, TypeError, ValueError, ECGSensorError) as e:
+                return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'data_rate': monitor.data_rate,
+            'sample_rate': config.SAMPLE_RATE,
+            'decimation': monitor.decimator.factor,
+            'supported': sorted(rate for rate in DATA_RATES.values() if rate % config.SAMPLE_RATE == 0)
+        })
+
+    @app.route('/full_rate')
+    def full_rate():
+        """The latest ?seconds= of channel 1 at the ADC data rate, before decimation (mV)"""
+        monitor = ECGMonitor()
+        if monitor.decimator.factor == 1:
+            values = monitor.raw.latest(int(request.args.get('seconds', 1.0, type=float) * config.SAMPLE_RATE))
+        else:
+            values = monitor.full_rate.latest(int(request.args.get('seconds', 1.0, type=float) * monitor.data_rate))
+        return jsonify({'sample_rate': monitor.data_rate, 'values': values.tolist()})
+
+    @socketio.on('connect')
+    def handle_connect():
+        ECGMonitor().hub.subscribe(request.sid)
+
+    @socketio.on('disconnect')
+    def handle_disconnect():
+        ECGMonitor().hub.unsubscribe(request.sid)
+
+    @socketio.on('control')
+    def handle_control(command):
+        monitor = ECGMonitor()
+        try:
+            if command == 'start':
+                if not monitor.running:
+                    socketio.start_background_task(target=monitor.start_acquisition)
+            elif command == 'stop':
+                monitor.stop_acquisition()
+        except Exception as e:
+            logging.error(f"Control command failed: {str(e)}")
+            socketio.emit('system_error', {'message': str(e)})
+
+    startup.mark('web')
+    return app
 
 if __name__ == '__main__':
     logging.basicConfig(
@@ -318,7 +550,12 @@ if __name__ == '__main__':
     )
     
     try:
-        ECGMonitor()  # Initialize early to catch hardware issues
+        monitor = ECGMonitor()  # Initialize early to catch hardware issues
+        if config.FAST_START:
+            # Capture first: the filter chain runs without SciPy until the preload has imported it
+            Thread(target=monitor.start_acquisition, name='ecg-acquisition', daemon=True).start()
+            preload(['scipy.signal'], startup)
+        create_app()
         socketio.run(app, host='0.0.0.0', port=5000, debug=False, use_reloader=False)
     except Exception as e:
         logging.critical(f"Fatal initialization error: {str(e)}")